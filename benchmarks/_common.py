@@ -0,0 +1,60 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+# Shared setup of the benchmarks. Importing this module makes the SDK use the
+# fake native library, see pexae.fakelib, unless PEXAE_REAL_LIB is set.
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+if os.getenv("PEXAE_REAL_LIB") is None:
+    os.environ.setdefault("PEXAE_FAKE_LIB", "1")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import pexae  # noqa: E402
+from pexae.lib import _lib as lib  # noqa: E402
+
+
+def parser(description):
+    p = argparse.ArgumentParser(description=description)
+    p.add_argument("--repeat", type=int, default=5,
+                   help="number of measurements of each benchmark")
+    p.add_argument("--latency", type=float, default=None,
+                   help="latency of network operations of the fake library")
+    return p
+
+
+def configure(args, **attrs):
+    # Sets attributes of the fake library, ignored with the real one.
+    if not hasattr(lib, "latency"):
+        return
+    if args.latency is not None:
+        attrs.setdefault("latency", args.latency)
+    for name, value in attrs.items():
+        setattr(lib, name, value)
+
+
+def client():
+    return pexae.Mockserver.new_client("client01", "secret01")
+
+
+def bench(name, fn, number, repeat):
+    """
+    Run fn number times, repeat times over, and print the median time per
+    call and the number of calls per second.
+    """
+    fn()  # warm up
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+
+    median = statistics.median(times)
+    print("{:<48} {:>12.1f} us/op {:>12.1f} op/s".format(
+        name, median * 1e6, 1 / median if median else float("inf")))
+    return median
@@ -0,0 +1,43 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+"""
+Asset retrieval with network latency: eager vs. lazy decoding, batching and
+caching.
+"""
+
+from _common import parser, configure, client, bench
+
+
+def main():
+    p = parser(__doc__)
+    p.add_argument("--assets", type=int, default=64,
+                   help="number of distinct assets per measurement")
+    p.add_argument("--territories", type=int, default=250,
+                   help="number of territories with licensors of each asset")
+    args = p.parse_args()
+    configure(args, licensor_territories=args.territories,
+              latency=args.latency if args.latency is not None else 0.01)
+
+    c = client()
+    ids = list(range(1, args.assets + 1))
+    library = c.asset_library
+
+    bench("get_asset", lambda: library.get_asset(1), 50, args.repeat)
+    bench("get_asset(lazy=True)", lambda: library.get_asset(1, lazy=True),
+          50, args.repeat)
+    bench("get_asset(lazy=True).metadata.title",
+          lambda: library.get_asset(1, lazy=True).metadata.title, 50, args.repeat)
+
+    bench("get_asset x{} sequential".format(len(ids)),
+          lambda: [library.get_asset(i) for i in ids], 1, args.repeat)
+    bench("get_assets x{}".format(len(ids)),
+          lambda: library.get_assets(ids, concurrency=16), 1, args.repeat)
+
+    library.enable_cache(max_size=len(ids))
+    bench("get_asset x{} cached".format(len(ids)),
+          lambda: [library.get_asset(i) for i in ids], 1, args.repeat)
+    library.disable_cache()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+"""
+Conversion of native search results into Python objects. The fake library
+has no latency here, so only the Python layer is measured.
+"""
+
+from _common import pexae, parser, configure, client, bench
+
+
+def main():
+    p = parser(__doc__)
+    p.add_argument("--policies", type=int, default=250,
+                   help="number of territories in a license search result")
+    p.add_argument("--matches", type=int, default=100,
+                   help="number of matches in a metadata search result")
+    p.add_argument("--segments", type=int, default=100,
+                   help="number of segments in each match")
+    args = p.parse_args()
+    configure(args, latency=0.0, policies=args.policies, matches=args.matches,
+              segments=args.segments)
+
+    c = client()
+    ft = pexae.Fingerprint.from_buffer(b"content")
+    license_req = pexae.LicenseSearchRequest(ft)
+    metadata_req = pexae.MetadataSearchRequest(ft)
+
+    res = c.license_search.start(license_req).get()
+    bench("license result, {} policies".format(args.policies),
+          lambda: c.license_search.start(license_req).get(), 200, args.repeat)
+    bench("license result .policies",
+          lambda: pexae.LicenseSearchResult._from_bits(
+              res.lookup_id, res._blocked, res._allowed).policies,
+          2000, args.repeat)
+    territories = pexae.TerritorySet(["US", "GB", "DE", "FR"])
+    bench("license result .is_blocked", lambda: res.is_blocked(territories),
+          100000, args.repeat)
+
+    size = "{}x{} segments".format(args.matches, args.segments)
+    bench("metadata result, " + size,
+          lambda: c.metadata_search.start(metadata_req).get(), 5, args.repeat)
+    bench("metadata result compact, " + size,
+          lambda: c.metadata_search.start(metadata_req).get(compact=True),
+          5, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
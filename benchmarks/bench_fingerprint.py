@@ -0,0 +1,53 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+"""
+Fingerprint generation and (de)serialization throughput.
+"""
+
+import io
+import os
+import tempfile
+
+from _common import pexae, parser, configure, bench
+
+
+def main():
+    p = parser(__doc__)
+    p.add_argument("--size", type=int, default=1 << 20,
+                   help="size of the media content in bytes")
+    p.add_argument("--files", type=int, default=32,
+                   help="number of files fingerprinted in a batch")
+    args = p.parse_args()
+    configure(args)
+
+    content = os.urandom(args.size)
+    bench("Fingerprint.from_buffer(bytes)",
+          lambda: pexae.Fingerprint.from_buffer(content), 20, args.repeat)
+    view = memoryview(bytearray(content))
+    bench("Fingerprint.from_buffer(memoryview)",
+          lambda: pexae.Fingerprint.from_buffer(view), 20, args.repeat)
+    bench("Fingerprint.from_stream",
+          lambda: pexae.Fingerprint.from_stream(io.BytesIO(content)), 20, args.repeat)
+
+    ft = pexae.Fingerprint.from_buffer(content)
+    data = ft.dump()
+    bench("Fingerprint.dump", ft.dump, 1000, args.repeat)
+    bench("Fingerprint.dump_view", ft.dump_view, 1000, args.repeat)
+    bench("Fingerprint.load", lambda: pexae.Fingerprint.load(data), 1000, args.repeat)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(args.files):
+            path = os.path.join(tmp, "{}.bin".format(i))
+            with open(path, "wb") as fp:
+                fp.write(content[i:] + content[:i])
+            paths.append(path)
+
+        bench("Fingerprint.from_file x{}".format(args.files),
+              lambda: [pexae.Fingerprint.from_file(p) for p in paths], 1, args.repeat)
+        bench("Fingerprint.from_files x{}".format(args.files),
+              lambda: pexae.Fingerprint.from_files(paths), 1, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+"""
+Search fan-out: many searches in flight at once with network latency.
+"""
+
+import concurrent.futures
+
+from _common import pexae, parser, configure, client, bench
+
+
+def main():
+    p = parser(__doc__)
+    p.add_argument("--searches", type=int, default=64,
+                   help="number of searches per measurement")
+    args = p.parse_args()
+    configure(args, latency=args.latency if args.latency is not None else 0.01)
+
+    c = client()
+    fts = [pexae.Fingerprint.from_buffer(str(i).encode()) for i in range(args.searches)]
+    n = len(fts)
+
+    def sequential():
+        for ft in fts:
+            c.license_search.start(pexae.LicenseSearchRequest(ft)).get()
+
+    def start_all_then_get():
+        futs = [c.license_search.start(pexae.LicenseSearchRequest(ft)) for ft in fts]
+        pexae.wait(futs)
+
+    def threads():
+        with concurrent.futures.ThreadPoolExecutor(max_workers=16) as executor:
+            list(executor.map(lambda ft: c.license_search.start(
+                pexae.LicenseSearchRequest(ft)).get(), fts))
+
+    def combined():
+        for ft in fts[:8]:
+            c.search(ft).get()
+
+    def separate():
+        for ft in fts[:8]:
+            c.license_search.start(pexae.LicenseSearchRequest(ft)).get()
+            c.metadata_search.start(pexae.MetadataSearchRequest(ft)).get()
+
+    def pipeline():
+        sp = pexae.SearchPipeline(c.license_search, start_workers=16, get_workers=16)
+        for _ in sp.run(fts):
+            pass
+
+    bench("license search x{} sequential".format(n), sequential, 1, args.repeat)
+    bench("license search x{} start all, wait".format(n), start_all_then_get, 1, args.repeat)
+    bench("license search x{} 16 threads".format(n), threads, 1, args.repeat)
+    bench("license search x{} SearchPipeline".format(n), pipeline, 1, args.repeat)
+    bench("license + metadata x8 separate", separate, 1, args.repeat)
+    bench("license + metadata x8 Client.search", combined, 1, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
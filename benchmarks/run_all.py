@@ -0,0 +1,29 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+# Runs all the benchmarks with their default settings.
+
+import os
+import subprocess
+import sys
+
+BENCHMARKS = [
+    "bench_fingerprint.py",
+    "bench_search.py",
+    "bench_extract.py",
+    "bench_assets.py",
+]
+
+
+def main():
+    here = os.path.dirname(os.path.abspath(__file__))
+    failed = False
+    for name in BENCHMARKS:
+        print("# " + name)
+        ret = subprocess.call([sys.executable, os.path.join(here, name)] + sys.argv[1:])
+        failed = failed or ret != 0
+        print()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
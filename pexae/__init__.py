@@ -1,9 +1,84 @@
 # Copyright 2020 Pexeso Inc. All rights reserved.
 
-from pexae.fingerprint import *
-from pexae.client import *
-from pexae.license_search import *
-from pexae.metadata_search import *
-from pexae.asset_library import *
-from pexae.errors import *
-from pexae.mockserver import *
+import importlib
+
+# Maps the public names of the package to the submodules that define them.
+# Submodules are only imported once one of their names is first accessed, and
+# the native library is only loaded once it's first used, so importing pexae
+# is cheap.
+_EXPORTS = {
+    "Fingerprint": "fingerprint",
+    "FingerprintBuilder": "fingerprint",
+    "FingerprintPool": "fingerprint",
+    "FingerprintResult": "fingerprint",
+    "Client": "client",
+    "ClientConfig": "client",
+    "ClientPool": "client_pool",
+    "BasicPolicy": "license_search",
+    "LicenseSearch": "license_search",
+    "LicenseSearchFuture": "license_search",
+    "LicenseSearchRequest": "license_search",
+    "LicenseSearchResult": "license_search",
+    "CompactMetadataSearchResult": "metadata_search",
+    "MetadataSearch": "metadata_search",
+    "MetadataSearchFuture": "metadata_search",
+    "MetadataSearchMatch": "metadata_search",
+    "MetadataSearchRequest": "metadata_search",
+    "MetadataSearchResult": "metadata_search",
+    "Segment": "common",
+    "Asset": "asset_library",
+    "AssetLibrary": "asset_library",
+    "AssetMetadata": "asset_library",
+    "AssetType": "asset_library",
+    "Deadline": "deadline",
+    "ALL_COMPLETED": "futures",
+    "FIRST_COMPLETED": "futures",
+    "FIRST_EXCEPTION": "futures",
+    "as_completed": "futures",
+    "wait": "futures",
+    "RetryPolicy": "retry",
+    "SearchFuture": "search",
+    "SearchResult": "search",
+    "PipelineResult": "pipeline",
+    "SearchPipeline": "pipeline",
+    "LRUCache": "cache",
+    "FingerprintCache": "fingerprint_cache",
+    "TerritorySet": "territory",
+    "Event": "instrumentation",
+    "OpenTelemetryAdapter": "instrumentation",
+    "PrometheusAdapter": "instrumentation",
+    "add_listener": "instrumentation",
+    "remove_listener": "instrumentation",
+    "AEError": "errors",
+    "Code": "errors",
+    "Mockserver": "mockserver",
+    "Arena": "arena",
+    "init": "runtime",
+    "shutdown": "runtime",
+}
+
+# Submodules that used to be imported along with the package, so they can
+# still be accessed as attributes without importing them first.
+_SUBMODULES = frozenset([
+    "aio", "arena", "asset_library", "cache", "client", "client_pool",
+    "common", "deadline", "errors", "fingerprint", "fingerprint_cache",
+    "futures", "instrumentation", "lib", "license_search", "metadata_search",
+    "mockserver", "pipeline", "retry", "runtime", "search", "territory",
+])
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        if name in _SUBMODULES:
+            return importlib.import_module("." + name, __name__)
+        raise AttributeError("module 'pexae' has no attribute '{}'".format(name))
+    value = getattr(importlib.import_module("pexae." + module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS) | _SUBMODULES)
@@ -0,0 +1,7 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+from pexae.aio.fingerprint import *
+from pexae.aio.client import *
+from pexae.aio.license_search import *
+from pexae.aio.metadata_search import *
+from pexae.aio.asset_library import *
@@ -0,0 +1,34 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+import asyncio
+import functools
+
+
+class AsyncAssetLibrary(object):
+    """
+    Awaitable counterpart of :class:`~pexae.AssetLibrary`. Instead of
+    instantiating the class directly, :attr:`AsyncClient.asset_library`
+    should be used.
+    """
+
+    def __init__(self, library, executor):
+        self._library = library
+        self._executor = executor
+
+    async def get_asset(self, asset_id, lazy=False, timeout=None, deadline=None):
+        """
+        Retrieve information about an asset based on an asset ID. See
+        :meth:`pexae.AssetLibrary.get_asset`.
+
+        :param int asset_id: ID of the asset whose information we're trying to retrieve.
+        :param bool lazy: see :meth:`pexae.AssetLibrary.get_asset`.
+        :param float timeout: see :meth:`pexae.AssetLibrary.get_asset`.
+        :param ~pexae.Deadline deadline: see :meth:`pexae.AssetLibrary.get_asset`.
+        :raise: :class:`~pexae.AEError` if the asset cannot be retrieved.
+        :rtype: ~pexae.Asset
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            functools.partial(self._library.get_asset, asset_id, lazy=lazy,
+                              timeout=timeout, deadline=deadline))
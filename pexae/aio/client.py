@@ -0,0 +1,105 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+import asyncio
+import concurrent.futures
+
+from pexae.client import Client
+from pexae.aio.license_search import AsyncLicenseSearch
+from pexae.aio.metadata_search import AsyncMetadataSearch
+from pexae.aio.asset_library import AsyncAssetLibrary
+
+
+class AsyncClient(object):
+    """
+    An asyncio-friendly wrapper around :class:`~pexae.Client`. Starting
+    searches and retrieving assets block in the native library, so they're
+    executed on a dedicated, bounded thread pool so that they never block
+    the event loop. The size of the pool limits how many of them can be in
+    progress at the same time, additional calls are queued until a thread
+    becomes available. Search results are awaited without holding a thread
+    of the pool, so any number of searches can be in flight without holding
+    up other calls.
+
+    The client can be used as an async context manager, which calls
+    :meth:`close` on exit.
+    """
+
+    def __init__(self, client, max_workers=64):
+        self._client = client
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="pexae-aio")
+        self._asset_library = AsyncAssetLibrary(
+            client.asset_library, self._executor)
+        self._license_search = AsyncLicenseSearch(
+            client.license_search, self._executor)
+        self._metadata_search = AsyncMetadataSearch(
+            client.metadata_search, self._executor)
+
+    @staticmethod
+    async def with_credentials(client_id, client_secret, max_workers=64,
+                               timeout=None, deadline=None):
+        """
+        Creates a new instance of the class using provided credentials for
+        authentication. See :meth:`pexae.Client.with_credentials`.
+
+        :param string client_id: this will be provided to you by Pex.
+        :param string client_secret: this will be provided to you by Pex.
+        :param int max_workers: the maximum number of concurrent search starts
+            and asset retrievals.
+        :param float timeout: see :meth:`pexae.Client.with_credentials`.
+        :param ~pexae.Deadline deadline: see
+            :meth:`pexae.Client.with_credentials`.
+        :raise: :class:`~pexae.AEError` if the connection cannot be established
+                or the provided authentication credentials are invalid.
+        """
+        loop = asyncio.get_running_loop()
+        client = await loop.run_in_executor(
+            None, Client.with_credentials, client_id, client_secret, timeout,
+            deadline)
+        return AsyncClient(client, max_workers=max_workers)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.close)
+
+    def close(self):
+        """
+        Shut down the thread pool used by the client and close the wrapped
+        client, see :meth:`pexae.Client.close`. This blocks until the calls
+        that were already submitted finish, as the client can't be closed
+        while they're in progress, so it shouldn't be called from a
+        coroutine. Use the client as an async context manager instead.
+        """
+        self._executor.shutdown(wait=True)
+        self._client.close()
+
+    @property
+    def client(self):
+        """
+        The wrapped :class:`~pexae.Client`.
+        """
+        return self._client
+
+    @property
+    def asset_library(self):
+        """
+        An instance of the :class:`AsyncAssetLibrary` class.
+        """
+        return self._asset_library
+
+    @property
+    def license_search(self):
+        """
+        An instance of the :class:`AsyncLicenseSearch` class.
+        """
+        return self._license_search
+
+    @property
+    def metadata_search(self):
+        """
+        An instance of the :class:`AsyncMetadataSearch` class.
+        """
+        return self._metadata_search
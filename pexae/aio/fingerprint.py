@@ -0,0 +1,40 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+import asyncio
+
+from pexae.fingerprint import Fingerprint
+
+
+class AsyncFingerprint(object):
+    """
+    Awaitable counterparts of the :class:`~pexae.Fingerprint` constructors.
+    Generating a fingerprint is CPU bound, so the work is done in an executor
+    to keep the event loop responsive. If no executor is passed, the default
+    executor of the running loop is used.
+    """
+
+    @staticmethod
+    async def from_file(path, executor=None):
+        """
+        Awaitable version of :meth:`pexae.Fingerprint.from_file`.
+
+        :param str path: path to the media file we're trying to fingerprint.
+        :param executor: a :class:`concurrent.futures.Executor` to run in.
+        :raise: :class:`~pexae.AEError` if the media file is missing or invalid.
+        :rtype: ~pexae.Fingerprint
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, Fingerprint.from_file, path)
+
+    @staticmethod
+    async def from_buffer(buf, executor=None):
+        """
+        Awaitable version of :meth:`pexae.Fingerprint.from_buffer`.
+
+        :param bytes buf: A byte buffer holding a media file.
+        :param executor: a :class:`concurrent.futures.Executor` to run in.
+        :raise: :class:`~pexae.AEError` if the buffer holds invalid data.
+        :rtype: ~pexae.Fingerprint
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, Fingerprint.from_buffer, buf)
@@ -0,0 +1,25 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+import asyncio
+
+from pexae.errors import AEError, Code
+from pexae.deadline import _deadline
+
+
+async def _wait(fut, timeout, deadline):
+    # Waits for the result of an SDK future without holding a thread of the
+    # client's executor, so that waiting for many results doesn't hold up
+    # other calls. The result is retrieved in the background like with
+    # pexae.wait, and returned without being converted.
+    if timeout is None and deadline is None:
+        deadline = fut._deadline
+    deadline = _deadline(timeout, deadline, fut._default_timeout)
+    timeout = deadline.remaining() if deadline is not None else None
+
+    fut._submit()
+    # The shield keeps a timeout from cancelling the SDK future itself.
+    waiter = asyncio.shield(asyncio.wrap_future(fut._fut))
+    try:
+        return await asyncio.wait_for(waiter, timeout)
+    except asyncio.TimeoutError:
+        raise AEError(Code.DEADLINE_EXCEEDED, "deadline exceeded") from None
@@ -0,0 +1,75 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+import asyncio
+
+from pexae.aio.futures import _wait
+
+
+class AsyncMetadataSearchFuture(object):
+    """
+    This object is returned by the :meth:`AsyncMetadataSearch.start` method.
+    It can be awaited directly, which is equivalent to awaiting :meth:`get`,
+    and used as an async context manager, which calls :meth:`close` on exit.
+    """
+
+    def __init__(self, fut):
+        self._fut = fut
+
+    def __await__(self):
+        return self.get().__await__()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        Release the native resources held by the future, see
+        :meth:`pexae.MetadataSearchFuture.close`. This doesn't block.
+        """
+        self._fut.close()
+
+    async def get(self, timeout=None, deadline=None, *, compact=False):
+        """
+        Waits until the search result is ready and then returns it, without
+        blocking the event loop.
+
+        :param float timeout: see :meth:`pexae.MetadataSearchFuture.get`.
+        :param ~pexae.Deadline deadline: see
+            :meth:`pexae.MetadataSearchFuture.get`.
+        :param bool compact: see :meth:`pexae.MetadataSearchFuture.get`.
+        :raise: :class:`~pexae.AEError` if the search couldn't be performed,
+                e.g. because of network issues.
+        :rtype: ~pexae.MetadataSearchResult
+        """
+        return self._fut._convert(await _wait(self._fut, timeout, deadline), compact)
+
+
+class AsyncMetadataSearch(object):
+    """
+    Awaitable counterpart of :class:`~pexae.MetadataSearch`. Instead of
+    instantiating the class directly, :attr:`AsyncClient.metadata_search`
+    should be used.
+    """
+
+    def __init__(self, search, executor):
+        self._search = search
+        self._executor = executor
+
+    async def start(self, req, timeout=None, deadline=None):
+        """
+        Starts a metadata search. See :meth:`pexae.MetadataSearch.start`.
+
+        :param ~pexae.MetadataSearchRequest req: search parameters.
+        :param float timeout: see :meth:`pexae.MetadataSearch.start`.
+        :param ~pexae.Deadline deadline: see :meth:`pexae.MetadataSearch.start`.
+        :raise: :class:`~pexae.AEError` if the search couldn’t be initiated,
+                e.g. because of network issues.
+        :rtype: AsyncMetadataSearchFuture
+        """
+        loop = asyncio.get_running_loop()
+        fut = await loop.run_in_executor(
+            self._executor, self._search.start, req, timeout, deadline)
+        return AsyncMetadataSearchFuture(fut)
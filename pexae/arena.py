@@ -0,0 +1,63 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+
+class Arena(object):
+    """
+    Collects objects that hold native resources, e.g. fingerprints, futures
+    and lazy assets, and closes all of them at once when the arena is
+    closed. This makes it easy to release the temporaries of a unit of work
+    deterministically rather than whenever they're garbage collected, which
+    keeps the memory usage flat under sustained load:
+
+    .. code-block:: python
+
+        with pexae.Arena() as arena:
+            ft = arena.add(pexae.Fingerprint.from_file(path))
+            fut = arena.add(client.license_search.start(pexae.LicenseSearchRequest(ft)))
+            res = fut.get()
+        # ft and fut are closed here, res can still be used
+
+    Objects are closed in the reverse order in which they were added. The
+    arena can be used again after it's closed.
+    """
+
+    def __init__(self):
+        self._objects = []
+
+    def add(self, obj):
+        """
+        Add an object to the arena.
+
+        :param obj: an object with a close method.
+        :return: obj
+        """
+        self._objects.append(obj)
+        return obj
+
+    def close(self):
+        """
+        Close all the objects in the arena. If closing any of them raises an
+        exception, the rest are closed anyway and the first exception is
+        raised afterwards.
+        """
+        error = None
+        while self._objects:
+            try:
+                self._objects.pop().close()
+            except Exception as err:
+                if error is None:
+                    error = err
+        if error is not None:
+            raise error
+
+    def __len__(self):
+        return len(self._objects)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __repr__(self):
+        return "Arena(objects={})".format(len(self))
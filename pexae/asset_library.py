@@ -1,12 +1,20 @@
 # Copyright 2020 Pexeso Inc. All rights reserved.
 
+import concurrent.futures
 import ctypes
+import itertools
+import types
 from collections import namedtuple
 from enum import Enum
 
 from pexae.lib import _lib, _AE_Status,  _AE_Asset, _AE_AssetMetadata, \
-        _AE_AssetLicensors
+        _AE_AssetLicensors, _collect_strings, _collect_licensors, _decode_all, \
+        _CloseOnError
 from pexae.errors import AEError
+from pexae.cache import LRUCache
+from pexae.deadline import _deadline
+from pexae.retry import _invoke
+from pexae.instrumentation import _span
 
 
 class AssetType(Enum):
@@ -44,14 +52,38 @@ class AssetMetadata(object):
     Metadata associated with an asset. It comes as part of the :class:`Asset`
     class which can be retrieved using the :meth:`AssetLibrary.get_asset`
     method.
+
+    Metadata are immutable and hashable, two instances are equal if all their
+    fields are equal.
+
+    Metadata retrieved using :meth:`AssetLibrary.get_asset` with lazy=True
+    hold on to the native data and decode each field the first time it is
+    accessed. The native data are released once all the fields are decoded,
+    or when :meth:`close` is called.
     """
 
+    __slots__ = ("_isrc", "_title", "_artists", "_upcs", "_licensors",
+                 "_c_handles")
+
     def __init__(self, isrc, title, artists, upcs, licensors):
         self._isrc = isrc
         self._title = title
-        self._artists = artists
-        self._upcs = upcs
-        self._licensors = licensors
+        self._artists = tuple(artists)
+        self._upcs = tuple(upcs)
+        self._licensors = _freeze_licensors(licensors)
+        self._c_handles = None
+
+    @staticmethod
+    def _lazy(c_asset, c_metadata):
+        metadata = AssetMetadata.__new__(AssetMetadata)
+        metadata._isrc = _UNSET
+        metadata._title = _UNSET
+        metadata._artists = _UNSET
+        metadata._upcs = _UNSET
+        metadata._licensors = _UNSET
+        # The asset is kept alive in case the metadata point into it.
+        metadata._c_handles = (c_asset, c_metadata)
+        return metadata
 
     @property
     def isrc(self):
@@ -59,28 +91,36 @@ class AssetMetadata(object):
         An international standard code for uniquely identifying sound
         recordings and music video recordings.
         """
-        return self._isrc
+        return self._decode("_isrc", lambda c_metadata: _lib.AE_AssetMetadata_GetISRC(
+            c_metadata.get()).decode())
 
     @property
     def title(self):
         """
         The name of the track recording for a given ISRC.
         """
-        return self._title
+        return self._decode("_title", lambda c_metadata: _lib.AE_AssetMetadata_GetTitle(
+            c_metadata.get()).decode())
 
     @property
     def artists(self):
         """
         The names of the recording artists for a given ISRC.
+
+        :type: tuple
         """
-        return self._artists
+        return self._decode("_artists", lambda c_metadata: tuple(
+            _extract_artists(c_metadata)))
 
     @property
     def upcs(self):
         """
         The unique codes associated with the sale of a recording.
+
+        :type: tuple
         """
-        return self._upcs
+        return self._decode("_upcs", lambda c_metadata: tuple(
+            _extract_upcs(c_metadata)))
 
     @property
     def licensors(self):
@@ -88,23 +128,119 @@ class AssetMetadata(object):
         The entities that own the rights to the given intellectual property and
         are entitled to license its use and collect royalties.
 
-        It is a dictionary where the key is a territory code that conforms to
-        the ISO 3166-1 alpha-2 standard. For more information visit
+        It is a read-only dictionary where the key is a territory code that
+        conforms to the ISO 3166-1 alpha-2 standard and the value is a tuple
+        of licensor names. For more information visit
         https://en.wikipedia.org/wiki/ISO_3166-1_alpha-2.
         """
-        return self._licensors
+        return self._decode("_licensors", lambda c_metadata: _freeze_licensors(
+            _extract_licensors(c_metadata)))
+
+    def licensors_for(self, territory):
+        """
+        Return the licensors for a single territory. Unlike
+        ``metadata.licensors.get(territory)``, this doesn't decode the
+        licensors of all the other territories if the metadata are lazy.
+
+        :param str territory: an ISO 3166-1 alpha-2 territory code.
+        :return: A tuple of licensor names or None if there are none for the
+            territory.
+        :rtype: tuple
+        """
+        handles = self._c_handles
+        if handles is None or self._licensors is not _UNSET:
+            return self.licensors.get(territory)
+        return _extract_territory_licensors(handles[1], territory.encode())
+
+    def _decode(self, name, decode):
+        value = getattr(self, name)
+        if value is not _UNSET:
+            return value
+
+        handles = self._c_handles
+        if handles is None:
+            # Another thread decoded the last field in the meantime, unless
+            # the metadata were closed.
+            value = getattr(self, name)
+            if value is _UNSET:
+                raise ValueError("operation on closed metadata")
+            return value
+
+        value = decode(handles[1])
+        setattr(self, name, value)
+        if _UNSET not in (self._isrc, self._title, self._artists, self._upcs,
+                          self._licensors):
+            self._c_handles = None
+        return value
+
+    def close(self):
+        """
+        Release the native data held by lazy metadata. Fields that weren't
+        decoded yet can't be accessed afterwards and raise
+        :class:`ValueError`. This must not be called while another thread
+        is accessing the fields. Metadata that aren't lazy aren't affected.
+        """
+        handles, self._c_handles = self._c_handles, None
+        if handles is not None:
+            for c_handle in reversed(handles):
+                c_handle.close()
+
+    def to_tuple(self):
+        """
+        Convert the metadata into a tuple.
+
+        :return: (isrc, title, artists, upcs, ((territory, licensors), ...))
+            with the licensors sorted by territory.
+        :rtype: tuple
+        """
+        return (self.isrc, self.title, self.artists, self.upcs,
+                tuple(sorted(self.licensors.items())))
+
+    def to_dict(self):
+        """
+        Convert the metadata into a dict keyed by the property names.
+
+        :rtype: dict
+        """
+        return {
+            "isrc": self.isrc,
+            "title": self.title,
+            "artists": list(self.artists),
+            "upcs": list(self.upcs),
+            "licensors": {t: list(names) for t, names in self.licensors.items()},
+        }
+
+    def __eq__(self, other):
+        if not isinstance(other, AssetMetadata):
+            return NotImplemented
+        return self.to_tuple() == other.to_tuple()
+
+    def __hash__(self):
+        return hash(self.to_tuple())
+
+    def __reduce__(self):
+        return (AssetMetadata, (self.isrc, self.title, self.artists, self.upcs,
+                                dict(self.licensors)))
 
     def __repr__(self):
         return "AssetMetadata(isrc={},title={},artists={},upcs={},licensors={})".format(
-                self.isrc, self.title, self.artists, self.upcs, self.licensors)
+                self.isrc, self.title, list(self.artists), list(self.upcs),
+                {t: list(names) for t, names in self.licensors.items()})
 
 
 class Asset(object):
     """
     This class represents an asset and the data associated with it. You can use
     :meth:`AssetLibrary.get_asset` to retrieve an asset.
+
+    Assets are immutable and hashable, two assets are equal if they have the
+    same type and metadata.
+
+    Assets can be used as context managers, which call :meth:`close` on exit.
     """
 
+    __slots__ = ("_type", "_metadata")
+
     def __init__(self, typ, metadata):
         self._type = typ
         self._metadata = metadata
@@ -126,6 +262,48 @@ class Asset(object):
         """
         return self._metadata
 
+    def close(self):
+        """
+        Release the native data held by the metadata of the asset, see
+        :meth:`AssetMetadata.close`. Assets served from the cache of
+        :class:`AssetLibrary` are fully decoded, so closing them has no
+        effect and doesn't affect other callers.
+        """
+        self._metadata.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def to_tuple(self):
+        """
+        Convert the asset into a tuple, the metadata are converted using
+        :meth:`AssetMetadata.to_tuple`.
+
+        :return: (type, metadata)
+        :rtype: tuple
+        """
+        return (self._type, self._metadata.to_tuple())
+
+    def to_dict(self):
+        """
+        Convert the asset into a dict keyed by the property names, the
+        metadata are converted using :meth:`AssetMetadata.to_dict`.
+
+        :rtype: dict
+        """
+        return {"type": self._type, "metadata": self._metadata.to_dict()}
+
+    def __eq__(self, other):
+        if not isinstance(other, Asset):
+            return NotImplemented
+        return self._type == other._type and self._metadata == other._metadata
+
+    def __hash__(self):
+        return hash((self._type, self._metadata))
+
     def __repr__(self):
         return "Asset(type={},metadata=...)".format(self._type)
 
@@ -139,79 +317,170 @@ class AssetLibrary(object):
 
     def __init__(self, library):
         self._c_library = library
+        self._cache = None
+        self._default_timeout = None
+        self._retry_policy = None
+
+    @property
+    def cache(self):
+        """
+        The cache used by :meth:`get_asset` or None if caching is disabled.
+
+        :type: LRUCache
+        """
+        return self._cache
+
+    def enable_cache(self, max_size=1024, ttl=300):
+        """
+        Cache assets retrieved by :meth:`get_asset` in memory. Concurrent
+        requests for an asset that isn't cached yet result in a single
+        retrieval. The cached :class:`Asset` instances are shared between
+        callers. Assets retrieved with lazy=True aren't cached.
+
+        :param int max_size: the maximum number of assets to keep.
+        :param float ttl: the number of seconds after which a cached asset
+            expires, or None if assets should never expire.
+        :return: The new cache.
+        :rtype: LRUCache
+        """
+        self._cache = LRUCache(max_size=max_size, ttl=ttl)
+        return self._cache
+
+    def disable_cache(self):
+        """
+        Stop caching assets and drop all the cached ones.
+        """
+        self._cache = None
 
-    def get_asset(self, asset_id):
+    def get_asset(self, asset_id, lazy=False, timeout=None, deadline=None):
         """
-        Retrieve information about an asset based on an asset ID.
+        Retrieve information about an asset based on an asset ID. If caching
+        was enabled using :meth:`enable_cache`, the asset may be served from
+        the cache.
 
         :param int asset_id: ID of the asset whose information we're trying to retrieve.
-        :raise: :class:`AEError` if the asset cannot be retrieved.
+        :param bool lazy: defer decoding of the metadata fields until they're
+            accessed, see :class:`AssetMetadata`. This is significantly cheaper
+            if only some of the fields are used. Lazy assets hold on to
+            native data, so they're never served from or stored in the cache.
+        :param float timeout: the maximum number of seconds to wait for the
+            asset, defaults to :attr:`Client.default_timeout`.
+        :param Deadline deadline: the deadline by which the asset must be
+            retrieved, can't be combined with timeout.
+        :raise: :class:`AEError` if the asset cannot be retrieved, e.g.
+            because the deadline passed.
         :return: An asset.
         :rtype: Asset
         """
 
-        c_status = _AE_Status.new(_lib)
-        c_asset = _AE_Asset.new(_lib)
+        deadline = _deadline(timeout, deadline)
+
+        def load():
+            return _invoke(self._retry_policy, deadline, self._default_timeout,
+                           self._get_asset, asset_id, lazy)
+
+        cache = self._cache
+        if cache is not None and not lazy:
+            wait = deadline or _deadline(None, None, self._default_timeout)
+            return cache.get_or_load(asset_id, load, deadline=wait)
+        return load()
+
+    def get_assets(self, asset_ids, concurrency=8, timeout=None, deadline=None):
+        """
+        Retrieve information about multiple assets at once. Duplicate IDs are
+        only retrieved once and up to concurrency assets are retrieved in
+        parallel. A failure to retrieve one of the assets doesn't affect the
+        others, the error is returned in place of the asset instead.
+
+        :param asset_ids: an iterable of asset IDs.
+        :param int concurrency: the maximum number of parallel retrievals.
+        :param float timeout: the maximum number of seconds to wait for all
+            the assets. Assets that aren't retrieved in time are returned as
+            :class:`AEError` with :attr:`Code.DEADLINE_EXCEEDED`. If not set,
+            :attr:`Client.default_timeout` applies to each asset separately.
+        :param Deadline deadline: the deadline by which all the assets must be
+            retrieved, can't be combined with timeout.
+        :return: A dict mapping each asset ID to either an :class:`Asset` or
+            the :class:`AEError` raised while retrieving it.
+        :rtype: dict
+        """
+
+        deadline = _deadline(timeout, deadline)
+        asset_ids = list(dict.fromkeys(asset_ids))
+        if len(asset_ids) <= 1 or concurrency <= 1:
+            return {asset_id: self._get_asset_or_error(asset_id, deadline)
+                    for asset_id in asset_ids}
+
+        workers = min(concurrency, len(asset_ids))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            assets = executor.map(self._get_asset_or_error, asset_ids,
+                                  itertools.repeat(deadline))
+            return dict(zip(asset_ids, assets))
+
+    def _get_asset_or_error(self, asset_id, deadline=None):
+        try:
+            return self.get_asset(asset_id, deadline=deadline)
+        except AEError as err:
+            return err
+
+    def _get_asset(self, asset_id, lazy):
+        with _AE_Status.new(_lib) as c_status, \
+                _CloseOnError(_AE_Asset.new(_lib)) as c_asset, \
+                _CloseOnError(_AE_AssetMetadata.new(_lib)) as c_metadata:
+            with _span("asset_library.get_asset"):
+                _lib.AE_AssetLibrary_GetAsset(self._c_library.get(), asset_id,
+                                              c_asset.get(), c_status.get())
+                AEError.check_status(c_status)
+
+            _lib.AE_Asset_GetMetadata(c_asset.get(), c_metadata.get())
+            typ = AssetType(_lib.AE_Asset_GetType(c_asset.get()))
+
+        if lazy:
+            return Asset(
+                typ=typ,
+                metadata=AssetMetadata._lazy(c_asset, c_metadata),
+            )
+
+        with c_asset, c_metadata, _span("asset_library.extract"):
+            metadata = AssetMetadata(
+                isrc=_lib.AE_AssetMetadata_GetISRC(c_metadata.get()).decode(),
+                title=_lib.AE_AssetMetadata_GetTitle(c_metadata.get()).decode(),
+                artists=_extract_artists(c_metadata),
+                upcs=_extract_upcs(c_metadata),
+                licensors=_extract_licensors(c_metadata),
+            )
+
+            return Asset(typ=typ, metadata=metadata)
 
-        _lib.AE_AssetLibrary_GetAsset(self._c_library.get(), asset_id,
-                                      c_asset.get(), c_status.get())
-        AEError.check_status(c_status)
 
-        c_metadata = _AE_AssetMetadata.new(_lib)
-        _lib.AE_Asset_GetMetadata(c_asset.get(), c_metadata.get())
+_UNSET = object()
 
-        metadata = AssetMetadata(
-            isrc=_lib.AE_AssetMetadata_GetISRC(c_metadata.get()).decode(),
-            title=_lib.AE_AssetMetadata_GetTitle(c_metadata.get()).decode(),
-            artists=_extract_artists(c_metadata),
-            upcs=_extract_upcs(c_metadata),
-            licensors=_extract_licensors(c_metadata),
-        )
 
-        return Asset(
-            typ=AssetType(_lib.AE_Asset_GetType(c_asset.get())),
-            metadata=metadata,
-        )
+def _freeze_licensors(licensors):
+    return types.MappingProxyType(
+        {territory: tuple(names) for territory, names in licensors.items()})
 
 
 def _extract_artists(c_metadata):
-    artists = []
-    c_artist = ctypes.c_char_p()
-    c_artists_pos = ctypes.c_size_t(0)
-    while _lib.AE_AssetMetadata_NextArtist(c_metadata.get(),
-                                           ctypes.byref(c_artist),
-                                           ctypes.byref(c_artists_pos)):
-        artists.append(c_artist.value.decode())
-    return artists
+    return _decode_all(_collect_strings(_lib.AE_AssetMetadata_NextArtist, c_metadata))
 
 
 def _extract_upcs(c_metadata):
-    upcs = []
-    c_upc = ctypes.c_char_p()
-    c_upcs_pos = ctypes.c_size_t(0)
-    while _lib.AE_AssetMetadata_NextUPC(c_metadata.get(),
-                                        ctypes.byref(c_upc),
-                                        ctypes.byref(c_upcs_pos)):
-        upcs.append(c_upc.value.decode())
-    return upcs
+    return _decode_all(_collect_strings(_lib.AE_AssetMetadata_NextUPC, c_metadata))
 
 
 def _extract_licensors(c_metadata):
-    asset_licensors = {}
-    c_asset_licensors = _AE_AssetLicensors.new(_lib)
-    c_asset_licensors_pos = ctypes.c_size_t(0)
-    while _lib.AE_AssetMetadata_NextLicensors(
-            c_metadata.get(), c_asset_licensors.get(),
-            ctypes.byref(c_asset_licensors_pos)):
-        licensors = []
-        c_licensor = ctypes.c_char_p()
-        c_licensors_pos = ctypes.c_size_t(0)
-        while _lib.AE_AssetLicensors_NextLicensor(
-                c_asset_licensors.get(), ctypes.byref(c_licensor),
-                ctypes.byref(c_licensors_pos)):
-            licensors.append(c_licensor.value.decode())
-
-        territory = _lib.AE_AssetLicensors_GetTerritory(
-            c_asset_licensors.get()).decode()
-        asset_licensors[territory] = licensors
-    return asset_licensors
+    territories, licensors = _collect_licensors(_lib, c_metadata)
+    return dict(zip(_decode_all(territories), map(_decode_all, licensors)))
+
+
+def _extract_territory_licensors(c_metadata, territory):
+    with _AE_AssetLicensors.new(_lib) as c_asset_licensors:
+        c_asset_licensors_pos = ctypes.c_size_t(0)
+        while _lib.AE_AssetMetadata_NextLicensors(
+                c_metadata.get(), c_asset_licensors.get(),
+                ctypes.byref(c_asset_licensors_pos)):
+            if _lib.AE_AssetLicensors_GetTerritory(c_asset_licensors.get()) == territory:
+                return tuple(_decode_all(_collect_strings(
+                    _lib.AE_AssetLicensors_NextLicensor, c_asset_licensors)))
+    return None
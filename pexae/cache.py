@@ -0,0 +1,258 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+import collections
+import os
+import threading
+import time
+import weakref
+
+from pexae.deadline import _deadline, _exceeded
+
+
+class LRUCache(object):
+    """
+    A thread-safe, in-process cache with least-recently-used eviction and an
+    optional time-to-live. Concurrent misses for the same key are coalesced,
+    i.e. only one of the callers loads the value and the others wait for it.
+
+    Instances of this class are returned by the methods that enable caching,
+    e.g. :meth:`AssetLibrary.enable_cache`, and can be used to inspect and
+    invalidate the cached data.
+
+    :param int max_size: the maximum number of entries to keep.
+    :param float ttl: the number of seconds after which an entry expires, or
+        None if entries should never expire.
+    """
+
+    def __init__(self, max_size=1024, ttl=None):
+        if max_size < 1:
+            raise ValueError("max_size must be positive")
+
+        self._max_size = max_size
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._pending = {}
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._hit_age = 0.0
+        _caches.add(self)
+
+    @property
+    def hits(self):
+        """
+        The number of lookups that were served from the cache, including the
+        ones that waited for a concurrent load of the same key.
+
+        :type: int
+        """
+        return self._hits
+
+    @property
+    def misses(self):
+        """
+        The number of lookups that had to load the value.
+
+        :type: int
+        """
+        return self._misses
+
+    @property
+    def evictions(self):
+        """
+        The number of entries that were evicted because the cache was full.
+
+        :type: int
+        """
+        return self._evictions
+
+    @property
+    def expirations(self):
+        """
+        The number of entries that were dropped because their time-to-live
+        elapsed.
+
+        :type: int
+        """
+        return self._expirations
+
+    @property
+    def hit_rate(self):
+        """
+        The fraction of lookups that were served from the cache, 0.0 if there
+        were no lookups yet.
+
+        :type: float
+        """
+        total = self._hits + self._misses
+        if total == 0:
+            return 0.0
+        return self._hits / total
+
+    @property
+    def mean_hit_age(self):
+        """
+        The average number of seconds that values served from the cache had
+        been cached for. Together with ttl this describes how stale the served
+        data is. Lookups that waited for a concurrent load count as age 0.
+
+        :type: float
+        """
+        if self._hits == 0:
+            return 0.0
+        return self._hit_age / self._hits
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._lookup(key) is not _MISSING
+
+    def get_or_load(self, key, loader, timeout=None, deadline=None):
+        """
+        Return the value cached for key. If there is none, call loader, cache
+        the value it returns and return it. If loader raises an exception,
+        nothing is cached and the exception is propagated to all the callers
+        waiting for the key.
+
+        :param key: a hashable key.
+        :param loader: a function with no arguments that returns the value.
+        :param float timeout: the maximum number of seconds to wait for
+            another caller that is loading the value for the key.
+        :param Deadline deadline: the deadline by which the value loaded by
+            another caller must be ready, can't be combined with timeout.
+        :raise: :class:`AEError` with :attr:`Code.DEADLINE_EXCEEDED` if the
+            value loaded by another caller isn't ready in time.
+        """
+
+        deadline = _deadline(timeout, deadline)
+
+        with self._lock:
+            value = self._lookup(key)
+            if value is not _MISSING:
+                self._hits += 1
+                self._hit_age += time.monotonic() - self._entries[key][1]
+                return value
+
+            pending = self._pending.get(key)
+            leader = pending is None
+            if leader:
+                self._misses += 1
+                pending = self._pending[key] = _Pending()
+            else:
+                self._hits += 1
+
+        if not leader:
+            return pending.wait(deadline)
+
+        try:
+            value = loader()
+        except BaseException as err:
+            with self._lock:
+                self._pending.pop(key, None)
+            pending.fail(err)
+            raise
+
+        with self._lock:
+            if self._pending.pop(key, None) is pending:
+                self._store(key, value)
+        pending.succeed(value)
+        return value
+
+    def invalidate(self, key):
+        """
+        Remove the value cached for key. A value that is being loaded for the
+        key at the time of the call won't be cached.
+
+        :param key: a hashable key.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            self._pending.pop(key, None)
+
+    def clear(self):
+        """
+        Remove all values from the cache.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._pending.clear()
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+
+        value, stored_at, expires_at = entry
+        now = time.monotonic()
+        if expires_at is not None and expires_at <= now:
+            del self._entries[key]
+            self._expirations += 1
+            return _MISSING
+
+        self._entries.move_to_end(key)
+        return value
+
+    def _store(self, key, value):
+        now = time.monotonic()
+        expires_at = None
+        if self._ttl is not None:
+            expires_at = now + self._ttl
+
+        self._entries[key] = (value, now, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def __repr__(self):
+        return "LRUCache(size={},max_size={},ttl={},hits={},misses={},expirations={})".format(
+                len(self), self._max_size, self._ttl, self.hits, self.misses,
+                self.expirations)
+
+
+_MISSING = object()
+
+
+class _Pending(object):
+    # A value that is being loaded by one of the callers of get_or_load.
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._value = None
+        self._error = None
+
+    def succeed(self, value):
+        self._value = value
+        self._event.set()
+
+    def fail(self, error):
+        self._error = error
+        self._event.set()
+
+    def wait(self, deadline=None):
+        timeout = deadline.remaining() if deadline is not None else None
+        if not self._event.wait(timeout):
+            raise _exceeded()
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+# The caches that are alive, see _after_fork.
+_caches = weakref.WeakSet()
+
+
+def _after_fork():
+    # Loads in progress in the parent are never finished in a forked child,
+    # and the lock may have been held by one of its threads.
+    for cache in list(_caches):
+        cache._lock = threading.Lock()
+        cache._pending.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
@@ -1,11 +1,18 @@
 # Copyright 2020 Pexeso Inc. All rights reserved.
 
+import concurrent.futures
+import os
+import threading
+import weakref
+
 from .lib import _lib, _AE_Client, _AE_LicenseSearch, _AE_MetadataSearch, \
-    _AE_AssetLibrary, _AE_Status
+    _AE_AssetLibrary, _AE_Status, _CloseOnError, _SafeObject
 from pexae.license_search import LicenseSearch
 from pexae.metadata_search import MetadataSearch
 from pexae.asset_library import AssetLibrary
-from pexae.errors import AEError
+from pexae.search import _start
+from pexae.deadline import _deadline, _call
+from pexae.errors import AEError, Code
 
 
 class Client(object):
@@ -14,35 +21,97 @@ class Client(object):
     communicate with the Attribution Engine backend service. It
     automatically handles the connection and authentication with the
     service.
-    """
 
-    def __init__(self, c_client):
-        c_asset_library = _AE_AssetLibrary.new(_lib, c_client.get())
-        c_license_search = _AE_LicenseSearch.new(_lib, c_client.get())
-        c_metadata_search = _AE_MetadataSearch.new(_lib, c_client.get())
+    The connection is closed when the client is garbage collected, or as
+    soon as :meth:`close` is called. Clients can be used as context
+    managers, which call :meth:`close` on exit.
+    """
 
-        self._c_client = c_client
-        self._asset_library = AssetLibrary(c_asset_library)
-        self._license_search = LicenseSearch(c_license_search)
-        self._metadata_search = MetadataSearch(c_metadata_search)
+    def __init__(self, c_client, config=None):
+        self._config = config
+        self._asset_library = AssetLibrary(None)
+        self._license_search = LicenseSearch(None)
+        self._metadata_search = MetadataSearch(None)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._default_timeout = None
+        self._retry_policy = None
+        self._attach(c_client)
+        _clients.add(self)
 
     @staticmethod
-    def with_credentials(client_id, client_secret):
+    def with_credentials(client_id, client_secret, timeout=None, deadline=None):
         """
         Creates a new instance of the class using provided credentials for authentication.
 
         :param string client_id: this will be provided to you by Pex.
         :param string client_secret: this will be provided to you by Pex.
+        :param float timeout: the maximum number of seconds to wait for the
+            connection to be established.
+        :param Deadline deadline: the deadline by which the connection must
+            be established, can't be combined with timeout.
         :raise: :class:`AEError` if the connection cannot be established
                 or the provided authentication credentials are invalid.
         """
-        c_status = _AE_Status.new(_lib)
-        c_client = _AE_Client.new(_lib)
+        return ClientConfig(client_id, client_secret).new_client(timeout, deadline)
 
-        _lib.AE_Client_Init(c_client.get(), client_id.encode(),
-                            client_secret.encode(), c_status.get())
-        AEError.check_status(c_status)
-        return Client(c_client)
+    @property
+    def config(self):
+        """
+        The configuration of the client, including its current
+        :attr:`default_timeout` and :attr:`retry_policy`. It can be pickled
+        and used to create an equivalent client in another process. None if
+        the client wasn't created from credentials.
+
+        :type: ClientConfig
+        """
+        config = self._config
+        if config is None:
+            return None
+        return ClientConfig(config._client_id, config._client_secret,
+                            config._mockserver, self._default_timeout,
+                            self._retry_policy)
+
+    @property
+    def default_timeout(self):
+        """
+        The number of seconds after which network operations performed
+        through this client fail with :attr:`Code.DEADLINE_EXCEEDED`, unless
+        a timeout or deadline is passed to the operation itself. None, the
+        default, means operations are not bounded. The property can be set.
+
+        Bounded operations of all the clients share a pool of threads, which
+        limits how many of them can be in progress at once, see
+        :func:`init`.
+
+        :type: float
+        """
+        return self._default_timeout
+
+    @default_timeout.setter
+    def default_timeout(self, timeout):
+        self._default_timeout = timeout
+        self._asset_library._default_timeout = timeout
+        self._license_search._default_timeout = timeout
+        self._metadata_search._default_timeout = timeout
+
+    @property
+    def retry_policy(self):
+        """
+        The :class:`RetryPolicy` applied to network operations performed
+        through this client, or None, the default, if failed operations
+        aren't retried. The property can be set.
+
+        :type: RetryPolicy
+        """
+        return self._retry_policy
+
+    @retry_policy.setter
+    def retry_policy(self, policy):
+        self._retry_policy = policy
+        self._asset_library._retry_policy = policy
+        self._license_search._retry_policy = policy
+        self._metadata_search._retry_policy = policy
 
     @property
     def asset_library(self):
@@ -70,3 +139,244 @@ class Client(object):
         authentication.
         """
         return self._metadata_search
+
+    def search(self, fingerprint, license=True, metadata=True,
+               resolve_assets=False, compact=False, timeout=None, deadline=None):
+        """
+        Starts a license search and a metadata search for the same
+        fingerprint at once. Both searches are started concurrently and the
+        returned future retrieves both results concurrently too, so the
+        latency is that of the slower search rather than the sum of both.
+
+        :param Fingerprint fingerprint: the fingerprint to search for.
+        :param bool license: whether to perform a license search.
+        :param bool metadata: whether to perform a metadata search.
+        :param bool resolve_assets: whether to also retrieve the assets of
+            the metadata search matches, see
+            :meth:`MetadataSearchResult.resolve_assets`.
+        :param bool compact: whether to return the metadata search result as
+            a :class:`CompactMetadataSearchResult`.
+        :param float timeout: the maximum number of seconds for the whole
+            search, including :meth:`SearchFuture.get` and the asset
+            retrieval.
+        :param Deadline deadline: the deadline by which the whole search must
+            complete, can't be combined with timeout. Each step only gets the
+            time that is left.
+        :raise: :class:`AEError` if any of the searches couldn’t be initiated,
+                e.g. because of network issues or because the deadline passed.
+        :rtype: SearchFuture
+        """
+        asset_library = self._asset_library if resolve_assets else None
+        return _start(self._get_executor(), self._license_search,
+                      self._metadata_search, fingerprint, license, metadata,
+                      asset_library, compact, _deadline(timeout, deadline),
+                      self._default_timeout)
+
+    def close(self):
+        """
+        Close the connection to the backend service and release the native
+        resources of the client. No operations may be in progress when the
+        client is closed, and the client can't be used afterwards. Closing a
+        client more than once has no effect.
+        """
+        _clients.discard(self)
+        self._shutdown_executor(wait=False)
+        with self._lock:
+            self._asset_library._c_library.close()
+            self._license_search._c_search.close()
+            self._metadata_search._c_search.close()
+            self._c_client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=32, thread_name_prefix="pexae-search")
+            return self._executor
+
+    def _shutdown_executor(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def _attach(self, c_client):
+        self._asset_library._c_library = _AE_AssetLibrary.new(_lib, c_client.get())
+        self._license_search._c_search = _AE_LicenseSearch.new(_lib, c_client.get())
+        self._metadata_search._c_search = _AE_MetadataSearch.new(_lib, c_client.get())
+        self._c_client = c_client
+
+    def _after_fork(self):
+        # The connection inherited from the parent can't be shared with it,
+        # so the handles are replaced by stand-ins that reconnect the client
+        # on first use. The inherited handles are disowned rather than
+        # deleted, as deleting them could close the connection in the parent
+        # too.
+        self._lock = threading.Lock()
+        self._executor = None
+        for c_handle in (self._c_client, self._asset_library._c_library,
+                         self._license_search._c_search,
+                         self._metadata_search._c_search):
+            if isinstance(c_handle, _SafeObject):
+                c_handle.disown()
+        self._c_client = _Reconnect(self, self, "_c_client")
+        self._asset_library._c_library = _Reconnect(
+                self, self._asset_library, "_c_library")
+        self._license_search._c_search = _Reconnect(
+                self, self._license_search, "_c_search")
+        self._metadata_search._c_search = _Reconnect(
+                self, self._metadata_search, "_c_search")
+
+    def _reconnect(self):
+        with self._lock:
+            if not isinstance(self._c_client, _Reconnect):
+                return
+            if self._config is None:
+                raise AEError(Code.NOT_INITIALIZED,
+                              "the client can't be used in a forked process")
+            config = self._config
+            self._attach(_connect(config._client_id, config._client_secret,
+                                  config._mockserver))
+
+
+class ClientConfig(object):
+    """
+    Holds everything needed to create a :class:`Client`: the credentials and
+    the client settings. Unlike clients, configurations can be pickled, so
+    they can be passed to worker processes, each of which then creates its
+    own client:
+
+    .. code-block:: python
+
+        def init_worker(config):
+            global client
+            client = config.new_client()
+
+        config = pexae.ClientConfig(client_id, client_secret)
+        with multiprocessing.Pool(initializer=init_worker, initargs=(config,)) as pool:
+            ...
+
+    :param string client_id: this will be provided to you by Pex.
+    :param string client_secret: this will be provided to you by Pex.
+    :param bool mockserver: whether the client communicates with the
+        mockserver, see :class:`Mockserver`.
+    :param float default_timeout: see :attr:`Client.default_timeout`.
+    :param RetryPolicy retry_policy: see :attr:`Client.retry_policy`.
+    """
+
+    def __init__(self, client_id, client_secret, mockserver=False,
+                 default_timeout=None, retry_policy=None):
+        self._client_id = client_id
+        self._client_secret = client_secret
+        self._mockserver = mockserver
+        self._default_timeout = default_timeout
+        self._retry_policy = retry_policy
+
+    @property
+    def client_id(self):
+        """
+        The client ID used for authentication.
+
+        :type: str
+        """
+        return self._client_id
+
+    @property
+    def mockserver(self):
+        """
+        Whether the client communicates with the mockserver.
+
+        :type: bool
+        """
+        return self._mockserver
+
+    @property
+    def default_timeout(self):
+        """
+        The :attr:`Client.default_timeout` of the created clients.
+
+        :type: float
+        """
+        return self._default_timeout
+
+    @property
+    def retry_policy(self):
+        """
+        The :attr:`Client.retry_policy` of the created clients.
+
+        :type: RetryPolicy
+        """
+        return self._retry_policy
+
+    def new_client(self, timeout=None, deadline=None):
+        """
+        Creates a new client with this configuration.
+
+        :param float timeout: the maximum number of seconds to wait for the
+            connection to be established.
+        :param Deadline deadline: the deadline by which the connection must
+            be established, can't be combined with timeout.
+        :raise: :class:`AEError` if the connection cannot be established
+                or the provided authentication credentials are invalid.
+        :rtype: Client
+        """
+        c_client = _call(_deadline(timeout, deadline), _connect,
+                         self._client_id, self._client_secret, self._mockserver)
+        client = Client(c_client, self)
+        client.default_timeout = self._default_timeout
+        client.retry_policy = self._retry_policy
+        return client
+
+    def __repr__(self):
+        return "ClientConfig(client_id={},mockserver={})".format(
+                self.client_id, self.mockserver)
+
+
+def _connect(client_id, client_secret, mockserver):
+    init = _lib.AE_Mockserver_InitClient if mockserver else _lib.AE_Client_Init
+    with _AE_Status.new(_lib) as c_status, \
+            _CloseOnError(_AE_Client.new(_lib)) as c_client:
+        init(c_client.get(), client_id.encode(), client_secret.encode(),
+             c_status.get())
+        AEError.check_status(c_status)
+    return c_client
+
+
+class _Reconnect(object):
+    # Stands in for a native handle of a client in a forked child and
+    # reconnects the client when the handle is first used.
+
+    __slots__ = ("_client", "_owner", "_name")
+
+    def __init__(self, client, owner, name):
+        self._client = client
+        self._owner = owner
+        self._name = name
+
+    def close(self):
+        self._client = None
+
+    def get(self):
+        if self._client is None:
+            raise ValueError("operation on a closed object")
+        self._client._reconnect()
+        return getattr(self._owner, self._name).get()
+
+
+# All the live clients, so that they can be reset in forked children.
+_clients = weakref.WeakSet()
+
+
+def _after_fork():
+    for client in list(_clients):
+        client._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
@@ -0,0 +1,267 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+import threading
+import time
+
+from pexae.client import Client, _clients
+from pexae.license_search import LicenseSearch
+from pexae.metadata_search import MetadataSearch
+from pexae.asset_library import AssetLibrary
+from pexae.errors import AEError, Code
+
+
+class ClientPool(Client):
+    """
+    A pool of clients that spreads operations over multiple connections to
+    the backend service. The pool has the same interface as :class:`Client`,
+    so it can be used in its place. Each operation is performed by one of
+    the clients in the pool, which is picked either in turns
+    ("round_robin") or as the one with the fewest operations in progress
+    ("least_loaded"). A search counts as in progress until its result is
+    retrieved or its future is closed.
+
+    Clients are only created once they're needed, unless :meth:`warm_up` is
+    called. A client whose operations fail with a connection error
+    max_failures times in a row is considered unhealthy and is skipped for
+    recovery_time seconds, after which it's given another chance. If all the
+    clients are unhealthy, the one that became unhealthy first is used.
+
+    Caches, timeouts and retry policies are set on the pool, not on the
+    individual clients, and apply to all of them.
+
+    :param factory: a function with no arguments that returns a new
+        :class:`Client`, e.g.
+        ``lambda: pexae.Client.with_credentials(client_id, client_secret)``.
+    :param int size: the number of clients in the pool.
+    :param str strategy: either "round_robin" or "least_loaded".
+    :param int max_failures: the number of consecutive failures after which
+        a client is considered unhealthy.
+    :param float recovery_time: the number of seconds for which an unhealthy
+        client is skipped.
+    """
+
+    def __init__(self, factory, size=4, strategy="least_loaded",
+                 max_failures=3, recovery_time=30.0):
+        if size < 1:
+            raise ValueError("size must be positive")
+        if strategy not in ("round_robin", "least_loaded"):
+            raise ValueError('strategy must be either "round_robin" or "least_loaded"')
+
+        self._factory = factory
+        self._strategy = strategy
+        self._max_failures = max_failures
+        self._recovery_time = recovery_time
+        self._slots = [_Slot() for _ in range(size)]
+        self._next = 0
+        self._config = None
+        self._closed = False
+
+        self._asset_library = _PooledAssetLibrary(self)
+        self._license_search = _PooledLicenseSearch(self)
+        self._metadata_search = _PooledMetadataSearch(self)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._default_timeout = None
+        self._retry_policy = None
+        _clients.add(self)
+
+    @property
+    def size(self):
+        """
+        The number of clients in the pool.
+
+        :type: int
+        """
+        return len(self._slots)
+
+    @property
+    def healthy(self):
+        """
+        The number of clients that are currently considered healthy,
+        including the ones that weren't created yet.
+
+        :type: int
+        """
+        now = time.monotonic()
+        return sum(1 for slot in self._slots if slot.unhealthy_until <= now)
+
+    def warm_up(self):
+        """
+        Create all the clients of the pool now rather than when they're first
+        needed.
+
+        :raise: :class:`AEError` if any of the clients can't be created.
+        """
+        for slot in self._slots:
+            self._client(slot)
+
+    def close(self):
+        """
+        Close all the clients of the pool, see :meth:`Client.close`.
+        """
+        _clients.discard(self)
+        self._closed = True
+        self._shutdown_executor(wait=False)
+        for slot in self._slots:
+            with slot.lock:
+                client = slot.client
+            if client is not None:
+                client.close()
+
+    def _run(self, fn, hold=False):
+        # Performs fn with one of the clients and tracks the outcome. If hold
+        # is set, fn returns a native object, e.g. a search future, and the
+        # client stays busy until it's closed.
+        slot = self._checkout()
+        try:
+            value = fn(self._client(slot))
+        except AEError as err:
+            self._checkin(slot, err.code in _UNHEALTHY_CODES)
+            raise
+        except BaseException:
+            self._checkin(slot, False)
+            raise
+        self._checkin(slot, False, release=not hold)
+        if hold:
+            return _Held(value, lambda: self._release(slot))
+        return value
+
+    def _checkout(self):
+        with self._lock:
+            now = time.monotonic()
+            healthy = [i for i, slot in enumerate(self._slots)
+                       if slot.unhealthy_until <= now]
+            if not healthy:
+                slot = min(self._slots, key=lambda slot: slot.unhealthy_until)
+            elif self._strategy == "least_loaded":
+                slot = min((self._slots[i] for i in healthy),
+                           key=lambda slot: slot.in_flight)
+            else:
+                i = min(healthy, key=lambda i: (i - self._next) % len(self._slots))
+                self._next = i + 1
+                slot = self._slots[i]
+            slot.in_flight += 1
+            return slot
+
+    def _checkin(self, slot, failed, release=True):
+        with self._lock:
+            if release:
+                slot.in_flight -= 1
+            if not failed:
+                slot.failures = 0
+                return
+            slot.failures += 1
+            if slot.failures >= self._max_failures:
+                slot.failures = 0
+                slot.unhealthy_until = time.monotonic() + self._recovery_time
+
+    def _release(self, slot):
+        with self._lock:
+            # Objects held since before a fork are released after the count
+            # was reset.
+            slot.in_flight = max(slot.in_flight - 1, 0)
+
+    def _client(self, slot):
+        with slot.lock:
+            if slot.client is None:
+                if self._closed:
+                    raise ValueError("operation on a closed pool")
+                slot.client = self._factory()
+            return slot.client
+
+    def _after_fork(self):
+        # The clients in the pool reconnect themselves, see Client._after_fork.
+        self._lock = threading.Lock()
+        self._executor = None
+        for slot in self._slots:
+            slot.lock = threading.Lock()
+            slot.in_flight = 0
+
+    def __repr__(self):
+        return "ClientPool(size={},strategy={},healthy={})".format(
+                self.size, self._strategy, self.healthy)
+
+
+# Errors that suggest that something is wrong with the client itself rather
+# than with the operation it was asked to perform.
+_UNHEALTHY_CODES = frozenset((Code.CONNECTION_ERROR, Code.DEADLINE_EXCEEDED,
+                              Code.INTERNAL_ERROR, Code.NOT_INITIALIZED,
+                              Code.UNAUTHENTICATED))
+
+
+class _Slot(object):
+    __slots__ = ("lock", "client", "in_flight", "failures", "unhealthy_until")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.client = None
+        self.in_flight = 0
+        self.failures = 0
+        self.unhealthy_until = 0.0
+
+
+class _Held(object):
+    # A native object created by one of the clients of a pool, which counts
+    # as an operation in progress until the object is closed.
+
+    __slots__ = ("_obj", "_release")
+
+    def __init__(self, obj, release):
+        self._obj = obj
+        self._release = release
+
+    def __del__(self):
+        self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        release, self._release = self._release, None
+        self._obj.close()
+        if release is not None:
+            release()
+
+    def get(self):
+        return self._obj.get()
+
+
+# The pooled components only replace the native calls of their base classes,
+# so caching, timeouts and retries work the same way as with a single client.
+# A retried operation may be performed by a different client.
+
+
+class _PooledLicenseSearch(LicenseSearch):
+
+    def __init__(self, pool):
+        super().__init__(None)
+        self._pool = pool
+
+    def _start(self, req):
+        return self._pool._run(
+            lambda client: client._license_search._start(req), hold=True)
+
+
+class _PooledMetadataSearch(MetadataSearch):
+
+    def __init__(self, pool):
+        super().__init__(None)
+        self._pool = pool
+
+    def _start(self, req):
+        return self._pool._run(
+            lambda client: client._metadata_search._start(req), hold=True)
+
+
+class _PooledAssetLibrary(AssetLibrary):
+
+    def __init__(self, pool):
+        super().__init__(None)
+        self._pool = pool
+
+    def _get_asset(self, asset_id, lazy):
+        return self._pool._run(
+            lambda client: client._asset_library._get_asset(asset_id, lazy))
@@ -4,8 +4,13 @@ class Segment(object):
     """
     Segment is the range [start, end) in both the query and the asset of
     where the match was found within the asset.
+
+    Segments are immutable and hashable, two segments are equal if they
+    cover the same ranges.
     """
 
+    __slots__ = ("_query_start", "_query_end", "_asset_start", "_asset_end")
+
     def __init__(self, query_start, query_end, asset_start, asset_end):
         self._query_start = query_start
         self._query_end = query_end
@@ -48,6 +53,36 @@ class Segment(object):
         """
         return self._asset_end
 
+    def to_tuple(self):
+        """
+        Convert the segment into a tuple.
+
+        :return: (query_start, query_end, asset_start, asset_end)
+        :rtype: tuple
+        """
+        return (self._query_start, self._query_end, self._asset_start, self._asset_end)
+
+    def to_dict(self):
+        """
+        Convert the segment into a dict keyed by the property names.
+
+        :rtype: dict
+        """
+        return {
+            "query_start": self._query_start,
+            "query_end": self._query_end,
+            "asset_start": self._asset_start,
+            "asset_end": self._asset_end,
+        }
+
+    def __eq__(self, other):
+        if not isinstance(other, Segment):
+            return NotImplemented
+        return self.to_tuple() == other.to_tuple()
+
+    def __hash__(self):
+        return hash(self.to_tuple())
+
     def __repr__(self):
         return "Segment(query_start={},query_end={},asset_start={},asset_end={})".format(
                 self.query_start, self.query_end, self.asset_start, self.asset_end)
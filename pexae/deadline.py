@@ -0,0 +1,152 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+import concurrent.futures
+import os
+import threading
+import time
+
+from pexae.errors import AEError, Code
+
+
+class Deadline(object):
+    """
+    A point in time by which an operation, or a sequence of operations, must
+    complete. All network operations accept either a timeout, which only
+    applies to the operation itself, or a deadline, which can be shared by
+    several operations so that each of them only gets the remaining time.
+
+    The native library can't interrupt an operation that is in progress, so
+    when a deadline is exceeded the caller stops waiting and
+    :class:`AEError` with :attr:`Code.DEADLINE_EXCEEDED` is raised, while the
+    operation finishes in the background.
+
+    :param float timeout: the number of seconds from now.
+    """
+
+    __slots__ = ("_at",)
+
+    def __init__(self, timeout):
+        self._at = time.monotonic() + timeout
+
+    @property
+    def at(self):
+        """
+        The deadline as a value of :func:`time.monotonic`.
+
+        :type: float
+        """
+        return self._at
+
+    def remaining(self):
+        """
+        The number of seconds left until the deadline, 0 if it has passed.
+
+        :rtype: float
+        """
+        return max(self._at - time.monotonic(), 0.0)
+
+    def expired(self):
+        """
+        Return True if the deadline has passed.
+
+        :rtype: bool
+        """
+        return self._at <= time.monotonic()
+
+    def check(self):
+        """
+        Raise an error if the deadline has passed.
+
+        :raise: :class:`AEError` with :attr:`Code.DEADLINE_EXCEEDED`.
+        """
+        if self.expired():
+            raise _exceeded()
+
+    def __repr__(self):
+        return "Deadline(remaining={:.3f})".format(self.remaining())
+
+
+def _deadline(timeout, deadline, default_timeout=None):
+    # Combines the timeout and deadline parameters of an operation into a
+    # single Deadline, or None if the operation shouldn't be bounded.
+    if deadline is not None:
+        if timeout is not None:
+            raise ValueError("only one of timeout and deadline can be set")
+        return deadline
+    if timeout is None:
+        timeout = default_timeout
+    if timeout is None:
+        return None
+    return Deadline(timeout)
+
+
+def _call(deadline, fn, *args, **kwargs):
+    # Calls fn, but stops waiting for it once the deadline passes.
+    if deadline is None:
+        return fn(*args, **kwargs)
+
+    deadline.check()
+    fut = _executor().submit(fn, *args, **kwargs)
+    try:
+        return fut.result(deadline.remaining())
+    except concurrent.futures.TimeoutError:
+        # Calls that didn't start yet are dropped rather than run for nobody.
+        fut.cancel()
+        raise _Abandoned(Code.DEADLINE_EXCEEDED, "deadline exceeded") from None
+
+
+def _exceeded():
+    return AEError(Code.DEADLINE_EXCEEDED, "deadline exceeded")
+
+
+class _Abandoned(AEError):
+    # Raised by _call when it stops waiting for a call that's still running.
+    pass
+
+
+_executor_lock = threading.Lock()
+_executor_instance = None
+_max_workers = 64
+
+
+def _executor():
+    # Native calls block a thread for as long as the operation runs, so this
+    # pool is sized for waiting rather than for CPU work. It only runs native
+    # calls, which never wait for other work submitted to it.
+    global _executor_instance
+    with _executor_lock:
+        if _executor_instance is None:
+            _executor_instance = concurrent.futures.ThreadPoolExecutor(
+                max_workers=_max_workers, thread_name_prefix="pexae-wait")
+        return _executor_instance
+
+
+def _set_max_workers(max_workers):
+    # The current pool, if any, finishes the calls submitted to it, the next
+    # call creates a pool of the new size.
+    global _max_workers
+    if max_workers < 1:
+        raise ValueError("max_bounded_calls must be positive")
+    with _executor_lock:
+        _max_workers = max_workers
+    _shutdown_executor(wait=False)
+
+
+def _shutdown_executor(wait=True):
+    global _executor_instance
+    with _executor_lock:
+        executor, _executor_instance = _executor_instance, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+def _after_fork():
+    # The threads of the pool don't exist in a forked child, so a new pool is
+    # created on first use.
+    global _executor_lock, _executor_instance
+    _executor_lock = threading.Lock()
+    _executor_instance = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
@@ -43,6 +43,11 @@ class AEError(RuntimeError):
         self._code = Code(code)
         self._message = message
 
+    def __reduce__(self):
+        # Allows errors to be sent across process boundaries, e.g. by
+        # FingerprintPool when running in process mode.
+        return (AEError, (self._code, self._message))
+
     @property
     def code(self):
         """
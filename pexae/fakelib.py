@@ -0,0 +1,479 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+import ctypes
+import hashlib
+import itertools
+import os
+import random
+import threading
+import time
+
+from pexae.territory import _TERRITORIES
+
+
+class _FakeFunction(object):
+    # Accepts the argtypes and restype attributes set by _load_lib.
+
+    def __init__(self, fn):
+        self._fn = fn
+        self.argtypes = None
+        self.restype = None
+
+    def __call__(self, *args):
+        return self._fn(*args)
+
+
+def _out(ref, value):
+    ref._obj.value = value
+
+
+class FakeLibrary(object):
+    """
+    A pure-Python stand-in for the native library that implements the AE_*
+    functions used by the SDK without a backend service. It's loaded instead
+    of the native library when the PEXAE_FAKE_LIB environment variable is
+    set, and is meant for testing and benchmarking the Python layer of the
+    SDK.
+
+    Fingerprints are derived from a hash of the content and search results
+    from a hash of the fingerprint, so they're deterministic. The attributes
+    can be changed at any time to configure the library, e.g. through
+    ``pexae.lib._lib.latency = 0.05``.
+
+    :param float latency: seconds each network operation takes.
+    :param float fingerprint_latency: seconds generating a fingerprint takes.
+    :param int policies: number of territories in a license search result.
+    :param int matches: number of matches in a metadata search result.
+    :param int segments: number of segments in each match.
+    :param int artists: number of artists of each asset.
+    :param int upcs: number of UPCs of each asset.
+    :param int licensor_territories: number of territories with licensors of
+        each asset.
+    :param float error_rate: probability that a network operation fails with
+        a connection error.
+    :param int seed: seed of the random number generator used for errors.
+    """
+
+    OK = 0
+    INVALID_INPUT = 5
+    CONNECTION_ERROR = 9
+
+    def __init__(self, latency=0.0, fingerprint_latency=0.0, policies=250,
+                 matches=10, segments=20, artists=3, upcs=3,
+                 licensor_territories=250, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.fingerprint_latency = fingerprint_latency
+        self.policies = policies
+        self.matches = matches
+        self.segments = segments
+        self.artists = artists
+        self.upcs = upcs
+        self.licensor_territories = licensor_territories
+        self.error_rate = error_rate
+        self.calls = {}
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._objects = {}
+        self._lookup_ids = itertools.count(1)
+
+        for name in dir(self):
+            if name.startswith("AE_"):
+                setattr(self, name, _FakeFunction(self._counted(name, getattr(self, name))))
+
+    @staticmethod
+    def from_env():
+        """
+        Create an instance configured by environment variables named after
+        the parameters, e.g. PEXAE_FAKE_LATENCY or PEXAE_FAKE_ERROR_RATE.
+
+        :rtype: FakeLibrary
+        """
+        kwargs = {}
+        for name, typ in _PARAMS.items():
+            value = os.getenv("PEXAE_FAKE_" + name.upper())
+            if value is not None:
+                kwargs[name] = typ(value)
+        return FakeLibrary(**kwargs)
+
+    def _counted(self, name, fn):
+        def call(*args):
+            with self._lock:
+                self.calls[name] = self.calls.get(name, 0) + 1
+            return fn(*args)
+        return call
+
+    # Handles
+
+    def _new(self, **state):
+        with self._lock:
+            handle = next(self._ids)
+            self._objects[handle] = state
+        return ctypes.c_void_p(handle)
+
+    def _delete(self, ref):
+        with self._lock:
+            self._objects.pop(ref._obj.value, None)
+
+    def _get(self, handle):
+        return self._objects[handle.value]
+
+    def _fail(self, c_status):
+        with self._lock:
+            fail = self.error_rate and self._random.random() < self.error_rate
+        if fail:
+            self._set_status(c_status, self.CONNECTION_ERROR, b"injected failure")
+        return fail
+
+    def _set_status(self, c_status, code, message):
+        status = self._get(c_status)
+        status["code"] = code
+        status["message"] = message
+
+    # AE_Init
+
+    def AE_Init(self, c_status):
+        # Called again in forked children, where the lock may have been held
+        # by another thread of the parent.
+        self._lock = threading.Lock()
+        self._set_status(c_status, self.OK, b"")
+
+    # AE_Status
+
+    def AE_Status_New(self):
+        return self._new(code=self.OK, message=b"")
+
+    def AE_Status_Delete(self, ref):
+        self._delete(ref)
+
+    def AE_Status_OK(self, c_status):
+        return self._get(c_status)["code"] == self.OK
+
+    def AE_Status_GetCode(self, c_status):
+        return self._get(c_status)["code"]
+
+    def AE_Status_GetMessage(self, c_status):
+        return self._get(c_status)["message"]
+
+    # AE_Buffer
+
+    def AE_Buffer_New(self):
+        return self._new(data=ctypes.create_string_buffer(0), size=0)
+
+    def AE_Buffer_Delete(self, ref):
+        self._delete(ref)
+
+    def AE_Buffer_Set(self, c_buf, data, size):
+        buf = self._get(c_buf)
+        buf["data"] = ctypes.create_string_buffer(
+            ctypes.string_at(ctypes.cast(data, ctypes.c_void_p), size), size)
+        buf["size"] = size
+
+    def AE_Buffer_GetData(self, c_buf):
+        return ctypes.addressof(self._get(c_buf)["data"])
+
+    def AE_Buffer_GetSize(self, c_buf):
+        return self._get(c_buf)["size"]
+
+    # AE_Fingerprint
+
+    def AE_Fingerprint_New(self):
+        return self._new(digest=None)
+
+    def AE_Fingerprint_Delete(self, ref):
+        self._delete(ref)
+
+    def _fingerprint(self, c_ft, data, c_status):
+        if self.fingerprint_latency:
+            time.sleep(self.fingerprint_latency)
+        if len(data) == 0:
+            self._set_status(c_status, self.INVALID_INPUT, b"empty input")
+            return
+        self._get(c_ft)["digest"] = hashlib.sha256(data).digest()
+        self._set_status(c_status, self.OK, b"")
+
+    def AE_Fingerprint_FromFile(self, c_ft, path, c_status):
+        try:
+            with open(path, "rb") as fp:
+                data = fp.read()
+        except OSError:
+            self._set_status(c_status, self.INVALID_INPUT, b"failed to open file")
+            return
+        self._fingerprint(c_ft, data, c_status)
+
+    def AE_Fingerprint_FromBuffer(self, c_ft, c_buf, c_status):
+        buf = self._get(c_buf)
+        self._fingerprint(c_ft, buf["data"].raw[:buf["size"]], c_status)
+
+    def AE_Fingerprint_Dump(self, c_ft, c_buf):
+        digest = self._get(c_ft)["digest"]
+        data = b"FAKEFP" + digest * 64
+        buf = self._get(c_buf)
+        buf["data"] = ctypes.create_string_buffer(data, len(data))
+        buf["size"] = len(data)
+
+    def AE_Fingerprint_Load(self, c_ft, c_buf):
+        buf = self._get(c_buf)
+        self._get(c_ft)["digest"] = buf["data"].raw[6:38]
+
+    # AE_Client
+
+    def AE_Client_New(self):
+        return self._new()
+
+    def AE_Client_Delete(self, ref):
+        self._delete(ref)
+
+    def AE_Client_Init(self, c_client, client_id, client_secret, c_status):
+        if self.latency:
+            time.sleep(self.latency)
+        self._set_status(c_status, self.OK, b"")
+
+    def AE_Mockserver_InitClient(self, c_client, client_id, client_secret, c_status):
+        self._set_status(c_status, self.OK, b"")
+
+    # Searches
+
+    def AE_LicenseSearch_New(self, c_client):
+        return self._new()
+
+    def AE_LicenseSearch_Delete(self, ref):
+        self._delete(ref)
+
+    def AE_MetadataSearch_New(self, c_client):
+        return self._new()
+
+    def AE_MetadataSearch_Delete(self, ref):
+        self._delete(ref)
+
+    def AE_LicenseSearchRequest_New(self):
+        return self._new(digest=None)
+
+    AE_LicenseSearchRequest_Delete = _delete
+
+    def AE_MetadataSearchRequest_New(self):
+        return self._new(digest=None)
+
+    AE_MetadataSearchRequest_Delete = _delete
+
+    def _set_fingerprint(self, c_req, c_ft):
+        self._get(c_req)["digest"] = self._get(c_ft)["digest"]
+
+    AE_LicenseSearchRequest_SetFingerprint = _set_fingerprint
+    AE_MetadataSearchRequest_SetFingerprint = _set_fingerprint
+
+    def AE_LicenseSearchFuture_New(self):
+        return self._new(digest=None)
+
+    AE_LicenseSearchFuture_Delete = _delete
+
+    def AE_MetadataSearchFuture_New(self):
+        return self._new(digest=None)
+
+    AE_MetadataSearchFuture_Delete = _delete
+
+    def _start(self, c_search, c_req, c_fut, c_status):
+        if self.latency:
+            time.sleep(self.latency)
+        if self._fail(c_status):
+            return
+        self._get(c_fut)["digest"] = self._get(c_req)["digest"]
+        self._set_status(c_status, self.OK, b"")
+
+    AE_LicenseSearch_Start = _start
+    AE_MetadataSearch_Start = _start
+
+    def AE_LicenseSearchResult_New(self):
+        return self._new(lookup_id=0, policies=[])
+
+    AE_LicenseSearchResult_Delete = _delete
+
+    def AE_LicenseSearchFuture_Get(self, c_fut, c_res, c_status):
+        if self.latency:
+            time.sleep(self.latency)
+        if self._fail(c_status):
+            return
+        digest = self._get(c_fut)["digest"]
+        res = self._get(c_res)
+        res["lookup_id"] = next(self._lookup_ids)
+        res["policies"] = [
+            (_territory(i), digest[i % len(digest)] & 1)
+            for i in range(self.policies)]
+        self._set_status(c_status, self.OK, b"")
+
+    def AE_LicenseSearchResult_GetLookupID(self, c_res):
+        return self._get(c_res)["lookup_id"]
+
+    def AE_LicenseSearchResult_NextPolicy(self, c_res, territory, policy, pos):
+        policies = self._get(c_res)["policies"]
+        i = pos._obj.value
+        if i >= len(policies):
+            return False
+        _out(territory, policies[i][0])
+        _out(policy, policies[i][1])
+        _out(pos, i + 1)
+        return True
+
+    def AE_MetadataSearchResult_New(self):
+        return self._new(lookup_id=0, matches=[])
+
+    AE_MetadataSearchResult_Delete = _delete
+
+    def AE_MetadataSearchFuture_Get(self, c_fut, c_res, c_status):
+        if self.latency:
+            time.sleep(self.latency)
+        if self._fail(c_status):
+            return
+        digest = self._get(c_fut)["digest"]
+        res = self._get(c_res)
+        res["lookup_id"] = next(self._lookup_ids)
+        res["matches"] = [
+            (1 + digest[i % len(digest)] % 64,
+             [(s * 10, s * 10 + 5, s * 20, s * 20 + 5) for s in range(self.segments)])
+            for i in range(self.matches)]
+        self._set_status(c_status, self.OK, b"")
+
+    def AE_MetadataSearchResult_GetLookupID(self, c_res):
+        return self._get(c_res)["lookup_id"]
+
+    def AE_MetadataSearchResult_NextMatch(self, c_res, c_match, pos):
+        matches = self._get(c_res)["matches"]
+        i = pos._obj.value
+        if i >= len(matches):
+            return False
+        match = self._get(c_match)
+        match["asset_id"], match["segments"] = matches[i]
+        _out(pos, i + 1)
+        return True
+
+    def AE_MetadataSearchMatch_New(self):
+        return self._new(asset_id=0, segments=[])
+
+    AE_MetadataSearchMatch_Delete = _delete
+
+    def AE_MetadataSearchMatch_GetAssetID(self, c_match):
+        return self._get(c_match)["asset_id"]
+
+    def AE_MetadataSearchMatch_NextSegment(self, c_match, qs, qe, as_, ae, pos):
+        segments = self._get(c_match)["segments"]
+        i = pos._obj.value
+        if i >= len(segments):
+            return False
+        seg = segments[i]
+        _out(qs, seg[0])
+        _out(qe, seg[1])
+        _out(as_, seg[2])
+        _out(ae, seg[3])
+        _out(pos, i + 1)
+        return True
+
+    # Assets
+
+    def AE_AssetLibrary_New(self, c_client):
+        return self._new()
+
+    AE_AssetLibrary_Delete = _delete
+
+    def AE_AssetLibrary_GetAsset(self, c_library, asset_id, c_asset, c_status):
+        if self.latency:
+            time.sleep(self.latency)
+        if self._fail(c_status):
+            return
+        if asset_id == 0:
+            self._set_status(c_status, 4, b"asset not found")
+            return
+        asset = self._get(c_asset)
+        asset["id"] = asset_id
+        self._set_status(c_status, self.OK, b"")
+
+    def AE_Asset_New(self):
+        return self._new(id=0)
+
+    AE_Asset_Delete = _delete
+
+    def AE_Asset_GetType(self, c_asset):
+        return self._get(c_asset)["id"] % 3
+
+    def AE_Asset_GetMetadata(self, c_asset, c_metadata):
+        asset_id = self._get(c_asset)["id"]
+        metadata = self._get(c_metadata)
+        metadata["isrc"] = "ISRC{:08d}".format(asset_id).encode()
+        metadata["title"] = "Title {}".format(asset_id).encode()
+        metadata["artists"] = ["Artist {}".format(i).encode() for i in range(self.artists)]
+        metadata["upcs"] = ["{:012d}".format(i).encode() for i in range(self.upcs)]
+        metadata["licensors"] = [
+            (_territory(i), [b"Licensor A", b"Licensor B"])
+            for i in range(self.licensor_territories)]
+
+    def AE_AssetMetadata_New(self):
+        return self._new()
+
+    AE_AssetMetadata_Delete = _delete
+
+    def AE_AssetMetadata_GetISRC(self, c_metadata):
+        return self._get(c_metadata)["isrc"]
+
+    def AE_AssetMetadata_GetTitle(self, c_metadata):
+        return self._get(c_metadata)["title"]
+
+    def _next_string(self, items, out, pos):
+        i = pos._obj.value
+        if i >= len(items):
+            return False
+        _out(out, items[i])
+        _out(pos, i + 1)
+        return True
+
+    def AE_AssetMetadata_NextArtist(self, c_metadata, artist, pos):
+        return self._next_string(self._get(c_metadata)["artists"], artist, pos)
+
+    def AE_AssetMetadata_NextUPC(self, c_metadata, upc, pos):
+        return self._next_string(self._get(c_metadata)["upcs"], upc, pos)
+
+    def AE_AssetMetadata_NextLicensors(self, c_metadata, c_licensors, pos):
+        items = self._get(c_metadata)["licensors"]
+        i = pos._obj.value
+        if i >= len(items):
+            return False
+        licensors = self._get(c_licensors)
+        licensors["territory"], licensors["licensors"] = items[i]
+        _out(pos, i + 1)
+        return True
+
+    def AE_AssetLicensors_New(self):
+        return self._new(territory=b"", licensors=[])
+
+    AE_AssetLicensors_Delete = _delete
+
+    def AE_AssetLicensors_GetTerritory(self, c_licensors):
+        return self._get(c_licensors)["territory"]
+
+    def AE_AssetLicensors_NextLicensor(self, c_licensors, licensor, pos):
+        return self._next_string(self._get(c_licensors)["licensors"], licensor, pos)
+
+
+_PARAMS = {
+    "latency": float,
+    "fingerprint_latency": float,
+    "policies": int,
+    "matches": int,
+    "segments": int,
+    "artists": int,
+    "upcs": int,
+    "licensor_territories": int,
+    "error_rate": float,
+    "seed": int,
+}
+
+
+# A copy, because codes unknown to pexae.territory are appended to the list.
+_CODES = [code.encode() for code in _TERRITORIES]
+
+
+def _territory(i):
+    # Real territory codes first, made up ones once they run out.
+    if i < len(_CODES):
+        return _CODES[i]
+    i -= len(_CODES)
+    return bytes([97 + (i // 26) % 26, 97 + i % 26])
@@ -1,9 +1,17 @@
 # Copyright 2020 Pexeso Inc. All rights reserved.
 
+import collections
+import concurrent.futures
 import ctypes
+import hashlib
+import mmap
+import os
+import tempfile
 
-from pexae.lib import _lib, _AE_Status, _AE_Buffer, _AE_Fingerprint
+from pexae.lib import _lib, _AE_Status, _AE_Buffer, _AE_Fingerprint, \
+    _BufferView, _CloseOnError
 from pexae.errors import AEError
+from pexae.instrumentation import _span
 
 
 class Fingerprint(object):
@@ -11,6 +19,10 @@ class Fingerprint(object):
     Fingerprint is how the SDK identifies a piece of digital content.  It can
     be generated from a media file or from a memory buffer. The content must be
     encoded in one of the supported formats and must be longer than 1 second.
+
+    The native memory held by a fingerprint is released when the fingerprint
+    is garbage collected, or as soon as :meth:`close` is called. Fingerprints
+    can be used as context managers, which call :meth:`close` on exit.
     """
 
     @staticmethod
@@ -19,58 +31,164 @@ class Fingerprint(object):
         Generate a fingerprint from a file stored on a disk. The parameter to
         the function must be a path to a valid file in supported format.
 
-        :param str path: path to the media file we're trying to fingerprint.
+        :param path: path to the media file we're trying to fingerprint, a
+            str, bytes or :class:`os.PathLike` object.
         :raise: :class:`AEError` if the media file is missing or invalid.
         :rtype: Fingerprint
         """
 
-        c_status = _AE_Status.new(_lib)
-        c_ft = _AE_Fingerprint.new(_lib)
-
-        _lib.AE_Fingerprint_FromFile(c_ft.get(), path.encode(), c_status.get())
-        AEError.check_status(c_status)
+        with _AE_Status.new(_lib) as c_status, \
+                _CloseOnError(_AE_Fingerprint.new(_lib)) as c_ft, \
+                _span("fingerprint.from_file"):
+            _lib.AE_Fingerprint_FromFile(c_ft.get(), os.fsencode(path), c_status.get())
+            AEError.check_status(c_status)
         return Fingerprint(c_ft)
 
     @staticmethod
     def from_buffer(buf):
         """
         Generate a fingerprint from a media file loaded in memory as a byte
-        buffer.
+        buffer. Any object supporting the buffer protocol, e.g. bytearray,
+        memoryview or mmap, can be passed in. The memory is handed to the
+        native library directly, without making a copy.
 
         :param bytes buf: A byte buffer holding a media file.
         :raise: :class:`AEError` if the buffer holds invalid data.
         :rtype: Fingerprint
         """
 
-        c_status = _AE_Status.new(_lib)
-        c_ft = _AE_Fingerprint.new(_lib)
-        c_buf = _AE_Buffer.new(_lib)
+        with _AE_Status.new(_lib) as c_status, _AE_Buffer.new(_lib) as c_buf, \
+                _CloseOnError(_AE_Fingerprint.new(_lib)) as c_ft, \
+                _span("fingerprint.from_buffer") as span:
+            with _BufferView(buf) as (data, size):
+                span.size = size
+                _lib.AE_Buffer_Set(c_buf.get(), data, size)
+                _lib.AE_Fingerprint_FromBuffer(c_ft.get(), c_buf.get(), c_status.get())
+            AEError.check_status(c_status)
+        return Fingerprint(c_ft)
 
-        _lib.AE_Buffer_Set(c_buf.get(), buf, len(buf))
+    @staticmethod
+    def from_mmap(path):
+        """
+        Generate a fingerprint from a file stored on a disk by mapping it into
+        memory and passing it to :meth:`from_buffer`. Unlike reading the file
+        into a byte buffer, this doesn't require allocating memory for the
+        whole file.
 
-        _lib.AE_Fingerprint_FromBuffer(c_ft.get(), c_buf.get(), c_status.get())
-        AEError.check_status(c_status)
-        return Fingerprint(c_ft)
+        :param str path: path to the media file we're trying to fingerprint.
+        :raise: :class:`AEError` if the media file is invalid.
+        :raise: :class:`OSError` if the media file can't be opened.
+        :rtype: Fingerprint
+        """
+
+        with open(path, "rb") as fp:
+            if os.fstat(fp.fileno()).st_size == 0:
+                # Empty files can't be mapped, let the native library reject it.
+                return Fingerprint.from_buffer(b"")
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return Fingerprint.from_buffer(mm)
+
+    @staticmethod
+    def from_stream(readable, chunk_size=1 << 20, spool_threshold=None):
+        """
+        Generate a fingerprint from a file-like object, e.g. an HTTP request
+        body or an object store download stream. The stream is read in chunks
+        of chunk_size bytes using a :class:`FingerprintBuilder`, see its
+        documentation for the meaning of spool_threshold.
+
+        :param readable: An object with a read method returning bytes.
+        :param int chunk_size: the number of bytes to read at once.
+        :param int spool_threshold: the number of bytes to buffer in memory
+            before spooling to a temporary file.
+        :raise: :class:`AEError` if the stream holds invalid data.
+        :rtype: Fingerprint
+        """
+
+        with FingerprintBuilder(spool_threshold=spool_threshold) as builder:
+            while True:
+                chunk = readable.read(chunk_size)
+                if not chunk:
+                    break
+                builder.feed(chunk)
+            return builder.finish()
+
+    @staticmethod
+    def from_files(paths, workers=None, ordered=True, processes=False):
+        """
+        Generate fingerprints for multiple files in parallel. This is a
+        convenience wrapper around :class:`FingerprintPool` that creates a
+        pool, processes all the files and shuts the pool down.
+
+        A failure to fingerprint one of the files doesn't abort the whole
+        batch, the error is instead captured in the corresponding
+        :class:`FingerprintResult`.
+
+        :param paths: an iterable of paths to media files.
+        :param int workers: the number of files to fingerprint concurrently,
+            defaults to the number of CPUs.
+        :param bool ordered: if True, the results are returned in the same
+            order as the paths, otherwise in the order they complete.
+        :param bool processes: use a process pool instead of a thread pool.
+        :rtype: list of FingerprintResult
+        """
+
+        with FingerprintPool(workers=workers, processes=processes) as pool:
+            return list(pool.map(paths, ordered=ordered))
 
     @staticmethod
     def load(buf):
         """
         Load a fingerprint previously serialized by the :meth:`~dump` function.
+        Like :meth:`from_buffer`, it accepts any object supporting the buffer
+        protocol without copying it.
 
         :param bytes buf: A byte buffer holding serialized fingerprint.
         :raise: :class:`AEError` if the data inside buf is invalid.
         :rtype: Fingerprint
         """
 
-        c_ft = _AE_Fingerprint.new(_lib)
-        c_buf = _AE_Buffer.new(_lib)
-
-        _lib.AE_Buffer_Set(c_buf.get(), buf, len(buf))
-        _lib.AE_Fingerprint_Load(c_ft.get(), c_buf.get())
+        with _AE_Buffer.new(_lib) as c_buf, \
+                _CloseOnError(_AE_Fingerprint.new(_lib)) as c_ft, \
+                _span("fingerprint.load") as span, _BufferView(buf) as (data, size):
+            span.size = size
+            _lib.AE_Buffer_Set(c_buf.get(), data, size)
+            _lib.AE_Fingerprint_Load(c_ft.get(), c_buf.get())
         return Fingerprint(c_ft)
 
     def __init__(self, c_ft):
         self._c_ft = c_ft
+        self._digest = None
+
+    def digest(self):
+        """
+        Return a short digest of the serialized fingerprint. Fingerprints of
+        the same content have the same digest, which makes it suitable as a
+        cache key. The digest is only computed once.
+
+        :return: A 16 byte digest.
+        :rtype: bytes
+        """
+        if self._digest is None:
+            c_buf, data, size = self._dump()
+            with c_buf:
+                self._digest = hashlib.blake2b(
+                    _view(data, size), digest_size=16).digest()
+        return self._digest
+
+    def close(self):
+        """
+        Release the native memory held by the fingerprint. The fingerprint
+        can't be used afterwards, except for :meth:`digest` if it was already
+        computed. Views returned by :meth:`dump_view` remain valid. Closing a
+        fingerprint more than once has no effect.
+        """
+        self._c_ft.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
     def dump(self):
         """
@@ -81,9 +199,329 @@ class Fingerprint(object):
         :return: A byte buffer with serialized fingerprint.
         :rtype: bytes
         """
+        c_buf, data, size = self._dump()
+        with c_buf:
+            return ctypes.string_at(data, size)
+
+    def dump_view(self):
+        """
+        Serialize the fingerprint like :meth:`dump` does, but instead of
+        copying the serialized data into a new bytes object, return a read-only
+        view of the memory allocated by the native library. The memory is
+        released once the view and all objects derived from it are released.
+
+        :return: A view of the serialized fingerprint.
+        :rtype: memoryview
+        """
+        c_buf, data, size = self._dump()
+        # Keep the native buffer alive for as long as the view.
+        return _view(data, size, c_buf).toreadonly()
+
+    def dump_into(self, buf):
+        """
+        Serialize the fingerprint directly into a caller-provided writable
+        buffer, e.g. a bytearray, a writable memoryview or an mmap.
+
+        :param buf: A writable buffer large enough to hold the data.
+        :raise: :class:`ValueError` if the buffer is too small.
+        :return: The number of bytes written.
+        :rtype: int
+        """
+        view = memoryview(buf)
+        if view.readonly:
+            raise TypeError("buffer must be writable")
+        view = view.cast("B")
+
+        c_buf, data, size = self._dump()
+        with c_buf:
+            if size > len(view):
+                raise ValueError("buffer too small, {} bytes required".format(size))
+            view[:size] = _view(data, size)
+        return size
+
+    def write_to(self, fileobj):
+        """
+        Serialize the fingerprint and write it to a file-like object opened in
+        binary mode, without making an intermediate copy of the data.
+
+        :param fileobj: An object with a write method accepting bytes-like objects.
+        :return: The number of bytes written.
+        :rtype: int
+        """
+        view = self.dump_view()
+        written = 0
+        while written < len(view):
+            written += fileobj.write(view[written:])
+        return written
+
+    def _dump(self):
         c_buf = _AE_Buffer.new(_lib)
+        with _span("fingerprint.dump") as span:
+            _lib.AE_Fingerprint_Dump(self._c_ft.get(), c_buf.get())
+            data = _lib.AE_Buffer_GetData(c_buf.get())
+            size = span.size = _lib.AE_Buffer_GetSize(c_buf.get())
+        return c_buf, data, size
+
+
+def _view(data, size, owner=None):
+    # Returns a view of native memory, which is kept alive by the owner.
+    if size == 0:
+        return memoryview(b"")
+    arr = (ctypes.c_char * size).from_address(data)
+    arr._owner = owner
+    return memoryview(arr).cast("B")
+
+
+class FingerprintBuilder(object):
+    """
+    Builds a fingerprint from media content that arrives in chunks, so that
+    it can be consumed as it's being received. The native library needs the
+    whole media file to generate a fingerprint, so the chunks are accumulated
+    into a single growing buffer, which is then passed to
+    :meth:`Fingerprint.from_buffer` without any further copies.
+
+    If spool_threshold is set and the content grows beyond it, the content is
+    moved to a temporary file and the rest of the chunks are appended to it.
+    The fingerprint is then generated using :meth:`Fingerprint.from_file` and
+    the file is removed. This caps the memory used per upload.
+
+    The builder isn't thread-safe. It can be used as a context manager, which
+    calls :meth:`close` on exit.
+
+    :param int spool_threshold: the number of bytes to buffer in memory
+        before spooling to a temporary file, or None to never spool.
+    :param str tmp_dir: the directory to create the temporary file in.
+    """
+
+    def __init__(self, spool_threshold=None, tmp_dir=None):
+        self._spool_threshold = spool_threshold
+        self._tmp_dir = tmp_dir
+        self._buf = bytearray()
+        self._file = None
+        self._size = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def size(self):
+        """
+        The number of bytes fed so far.
+
+        :type: int
+        """
+        return self._size
+
+    def feed(self, chunk):
+        """
+        Append a chunk of the media content.
+
+        :param bytes chunk: the next chunk, any bytes-like object is accepted.
+        """
+        if self._buf is None:
+            raise ValueError("builder is already finished")
+
+        if self._file is not None:
+            self._file.write(chunk)
+        else:
+            self._buf += chunk
+            if self._spool_threshold is not None and len(self._buf) > self._spool_threshold:
+                self._spool()
+        self._size += memoryview(chunk).nbytes
+
+    def finish(self):
+        """
+        Generate the fingerprint from all the chunks fed so far. The builder
+        can't be used afterwards.
+
+        :raise: :class:`AEError` if the content is invalid.
+        :rtype: Fingerprint
+        """
+        if self._buf is None:
+            raise ValueError("builder is already finished")
+
+        try:
+            if self._file is not None:
+                self._file.close()
+                return Fingerprint.from_file(self._file.name)
+            return Fingerprint.from_buffer(self._buf)
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Discard all the data fed so far and remove the temporary file if one
+        was created.
+        """
+        self._buf = None
+        if self._file is not None:
+            self._file.close()
+            try:
+                os.unlink(self._file.name)
+            except OSError:
+                pass
+            self._file = None
+
+    def _spool(self):
+        self._file = tempfile.NamedTemporaryFile(
+            prefix="pexae-", dir=self._tmp_dir, delete=False)
+        self._file.write(self._buf)
+        self._buf = bytearray()
+
+
+class FingerprintResult(object):
+    """
+    The outcome of fingerprinting a single file as part of a batch. Either
+    :attr:`fingerprint` or :attr:`error` is set, never both.
+    """
+
+    def __init__(self, path, fingerprint=None, error=None):
+        self._path = path
+        self._fingerprint = fingerprint
+        self._error = error
+
+    @property
+    def path(self):
+        """
+        The path of the file this result belongs to, as it was passed in.
+
+        :type: str
+        """
+        return self._path
+
+    @property
+    def fingerprint(self):
+        """
+        The generated fingerprint or None if fingerprinting failed.
+
+        :type: Fingerprint
+        """
+        return self._fingerprint
+
+    @property
+    def error(self):
+        """
+        The error that was raised while fingerprinting the file or None if it
+        succeeded. This is usually an :class:`AEError`, but may be any other
+        exception, e.g. a :class:`TypeError` if the path isn't valid.
+
+        :type: Exception
+        """
+        return self._error
+
+    def __repr__(self):
+        return "FingerprintResult(path={},fingerprint={},error={})".format(
+                self.path, "..." if self.fingerprint else None, self.error)
+
+
+class FingerprintPool(object):
+    """
+    Spreads fingerprinting of many files across a pool of workers. By default
+    a thread pool is used, which is sufficient because the native library
+    doesn't hold the GIL while it's generating a fingerprint. A process pool
+    can be used instead, in which case the fingerprints are serialized in the
+    worker processes and deserialized in the calling process.
+
+    The pool can be used as a context manager, which calls :meth:`close` on
+    exit.
+    """
+
+    def __init__(self, workers=None, processes=False):
+        self._workers = workers or os.cpu_count() or 1
+        self._processes = processes
+        if processes:
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self._workers)
+        else:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self._workers,
+                thread_name_prefix="pexae-fingerprint")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def map(self, paths, ordered=True):
+        """
+        Generate fingerprints for all the files in paths. The files are
+        submitted to the pool lazily, so that only a bounded number of them is
+        being processed at any given time, which makes it possible to pass in
+        very long or infinite iterables.
+
+        :param paths: an iterable of paths to media files.
+        :param bool ordered: if True, the results are yielded in the same
+            order as the paths, otherwise in the order they complete.
+        :return: a generator of :class:`FingerprintResult`.
+        """
+
+        if ordered:
+            return self._map_ordered(paths)
+        return self._map_unordered(paths)
+
+    def close(self, wait=True):
+        """
+        Shut down the pool. Files that are being fingerprinted will be
+        finished if wait is True.
+
+        :param bool wait: whether to block until the workers finish.
+        """
+        self._executor.shutdown(wait=wait)
+
+    def _map_ordered(self, paths):
+        pending = collections.deque()
+        try:
+            for path in paths:
+                pending.append((path, self._submit(path)))
+                if len(pending) >= 2 * self._workers:
+                    yield self._collect(*pending.popleft())
+            while pending:
+                yield self._collect(*pending.popleft())
+        finally:
+            for _, fut in pending:
+                fut.cancel()
+
+    def _map_unordered(self, paths):
+        pending = {}
+        try:
+            for path in paths:
+                pending[self._submit(path)] = path
+                if len(pending) >= 2 * self._workers:
+                    for res in self._collect_completed(pending):
+                        yield res
+            while pending:
+                for res in self._collect_completed(pending):
+                    yield res
+        finally:
+            for fut in pending:
+                fut.cancel()
+
+    def _collect_completed(self, pending):
+        done, _ = concurrent.futures.wait(
+            pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        return [self._collect(pending.pop(fut), fut) for fut in done]
+
+    def _submit(self, path):
+        if self._processes:
+            return self._executor.submit(_dump_from_file, path)
+        return self._executor.submit(Fingerprint.from_file, path)
+
+    def _collect(self, path, fut):
+        try:
+            ft = fut.result()
+        except Exception as err:
+            return FingerprintResult(path, error=err)
+
+        if self._processes:
+            ft = Fingerprint.load(ft)
+        return FingerprintResult(path, fingerprint=ft)
+
 
-        _lib.AE_Fingerprint_Dump(self._c_ft.get(), c_buf.get())
-        data = _lib.AE_Buffer_GetData(c_buf.get())
-        size = _lib.AE_Buffer_GetSize(c_buf.get())
-        return ctypes.string_at(data, size)
+def _dump_from_file(path):
+    # Runs in a worker process, fingerprints can't be pickled so they're
+    # passed back to the parent in their serialized form.
+    return Fingerprint.from_file(path).dump()
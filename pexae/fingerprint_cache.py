@@ -0,0 +1,196 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from pexae.fingerprint import Fingerprint
+
+
+class FingerprintCache(object):
+    """
+    A persistent cache of fingerprints stored in a local SQLite database.
+    Generating a fingerprint is expensive, so if the same content is
+    fingerprinted repeatedly, e.g. because of re-uploads or retries, the
+    cached fingerprint is loaded from the disk instead.
+
+    Files are identified either by a hash of their content ("content"), which
+    requires reading the whole file but is immune to renames and touches, or
+    by their path, size and modification time ("stat"), which doesn't require
+    reading the file at all. Buffers are always identified by a hash of their
+    content.
+
+    When the total size of the cached fingerprints exceeds max_size, the
+    least recently used ones are evicted. The cache is safe to use from
+    multiple threads and can be used as a context manager, which calls
+    :meth:`close` on exit.
+
+    :param str path: path to the database file, it is created if it doesn't
+        exist.
+    :param int max_size: the maximum total size of cached fingerprints in
+        bytes.
+    :param str key: either "content" or "stat".
+    """
+
+    def __init__(self, path, max_size=1 << 30, key="content"):
+        if key not in ("content", "stat"):
+            raise ValueError('key must be either "content" or "stat"')
+
+        self._max_size = max_size
+        self._key = key
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+        self._db = sqlite3.connect(path, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            "key BLOB PRIMARY KEY, data BLOB NOT NULL, "
+            "size INTEGER NOT NULL, accessed REAL NOT NULL)")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS fingerprints_accessed "
+            "ON fingerprints (accessed)")
+        self._size = self._total_size()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def hits(self):
+        """
+        The number of fingerprints that were loaded from the cache.
+
+        :type: int
+        """
+        return self._hits
+
+    @property
+    def misses(self):
+        """
+        The number of fingerprints that had to be generated.
+
+        :type: int
+        """
+        return self._misses
+
+    @property
+    def size(self):
+        """
+        The total size of the cached fingerprints in bytes.
+
+        :type: int
+        """
+        return self._size
+
+    def from_file(self, path):
+        """
+        Same as :meth:`Fingerprint.from_file`, but the fingerprint is loaded
+        from the cache if the file was fingerprinted before.
+
+        :param str path: path to the media file we're trying to fingerprint.
+        :raise: :class:`AEError` if the media file is missing or invalid.
+        :rtype: Fingerprint
+        """
+        try:
+            key = self._file_key(path)
+        except OSError:
+            # Let the native library report the error.
+            return Fingerprint.from_file(path)
+        return self._get_or_create(key, lambda: Fingerprint.from_file(path))
+
+    def from_buffer(self, buf):
+        """
+        Same as :meth:`Fingerprint.from_buffer`, but the fingerprint is loaded
+        from the cache if the content was fingerprinted before.
+
+        :param bytes buf: A byte buffer holding a media file.
+        :raise: :class:`AEError` if the buffer holds invalid data.
+        :rtype: Fingerprint
+        """
+        key = b"c:" + hashlib.blake2b(buf, digest_size=16).digest()
+        return self._get_or_create(key, lambda: Fingerprint.from_buffer(buf))
+
+    def clear(self):
+        """
+        Remove all fingerprints from the cache.
+        """
+        with self._lock:
+            self._db.execute("DELETE FROM fingerprints")
+            self._size = 0
+
+    def close(self):
+        """
+        Close the underlying database.
+        """
+        with self._lock:
+            self._db.close()
+
+    def _file_key(self, path):
+        if self._key == "stat":
+            st = os.stat(path)
+            ident = "{}\0{}\0{}".format(
+                os.path.abspath(path), st.st_size, st.st_mtime_ns)
+            return b"s:" + hashlib.blake2b(ident.encode(), digest_size=16).digest()
+
+        h = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as fp:
+            for chunk in iter(lambda: fp.read(1 << 20), b""):
+                h.update(chunk)
+        return b"c:" + h.digest()
+
+    def _get_or_create(self, key, create):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data FROM fingerprints WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._hits += 1
+                self._db.execute(
+                    "UPDATE fingerprints SET accessed = ? WHERE key = ?",
+                    (time.time(), key))
+            else:
+                self._misses += 1
+
+        if row is not None:
+            return Fingerprint.load(row[0])
+
+        ft = create()
+        data = ft.dump_view()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO fingerprints (key, data, size, accessed) "
+                "VALUES (?, ?, ?, ?)", (key, data, len(data), time.time()))
+            self._size += len(data)
+            if self._size > self._max_size:
+                self._evict()
+        return ft
+
+    def _evict(self):
+        # Another process may be using the same database, so the in-memory
+        # size is only a hint and the actual size is recomputed here.
+        self._size = self._total_size()
+        target = self._max_size * 0.9
+        rows = self._db.execute(
+            "SELECT key, size FROM fingerprints ORDER BY accessed").fetchall()
+        evicted = []
+        for key, size in rows:
+            if self._size <= target:
+                break
+            evicted.append((key,))
+            self._size -= size
+        self._db.executemany("DELETE FROM fingerprints WHERE key = ?", evicted)
+
+    def _total_size(self):
+        row = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM fingerprints").fetchone()
+        return row[0]
+
+    def __repr__(self):
+        return "FingerprintCache(size={},max_size={},hits={},misses={})".format(
+                self.size, self._max_size, self.hits, self.misses)
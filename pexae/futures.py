@@ -0,0 +1,265 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+import concurrent.futures
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, FIRST_EXCEPTION, ALL_COMPLETED
+
+from pexae.errors import AEError, Code
+from pexae.deadline import _deadline
+
+
+class _Future(object):
+    # Base class of the futures returned by the SDK. The native library only
+    # offers a blocking call to retrieve a result, so the result is retrieved
+    # lazily: by the first caller of get if it doesn't set a timeout, or by a
+    # background thread otherwise. Either way it's retrieved exactly once and
+    # stored in a concurrent.futures.Future.
+    #
+    # Subclasses implement _resolve, which retrieves the result, and may
+    # implement _convert, which turns it into what get returns, and _release
+    # and _close, which release native resources.
+    #
+    # The deadline passed to the operation that created the future, if any,
+    # also bounds get, otherwise the client's default timeout does.
+    #
+    # Background retrieval runs on its own pool, separate from the one that
+    # bounds native calls by deadlines. Futures resolved from other futures
+    # retrieve those in their own thread using _get_inline, rather than
+    # waiting for more work on the pool they're running on, which could
+    # starve it.
+
+    def __init__(self, deadline=None, default_timeout=None):
+        self._fut = concurrent.futures.Future()
+        self._lock = threading.Lock()
+        self._claimed = False
+        self._submitted = False
+        self._deadline = deadline
+        self._default_timeout = default_timeout
+
+    def _resolve(self):
+        raise NotImplementedError
+
+    def _convert(self, value):
+        return value
+
+    def get(self, timeout=None, deadline=None):
+        """
+        Blocks until the result is ready and then returns it.
+
+        :param float timeout: the maximum number of seconds to wait.
+        :param Deadline deadline: the deadline by which the result must be
+            ready, can't be combined with timeout.
+        :raise: :class:`AEError` with :attr:`Code.DEADLINE_EXCEEDED` if the
+            result isn't ready in time, or if the operation failed.
+        :raise: :class:`concurrent.futures.CancelledError` if the future was
+            cancelled.
+        """
+        return self._convert(self._wait(timeout, deadline))
+
+    def done(self):
+        """
+        Return True if the result is ready or the future was cancelled. The
+        first call starts retrieving the result in the background.
+
+        :rtype: bool
+        """
+        self._submit()
+        return self._fut.done()
+
+    def cancel(self):
+        """
+        Attempt to cancel the future. This is only possible if nothing has
+        started waiting for the result yet, e.g. by calling :meth:`get`,
+        :meth:`done` or :func:`wait`.
+
+        :return: True if the future was cancelled.
+        :rtype: bool
+        """
+        with self._lock:
+            if self._claimed:
+                return self._fut.cancelled()
+            self._claimed = True
+        self._release()
+        return self._fut.cancel()
+
+    def cancelled(self):
+        """
+        Return True if the future was cancelled.
+
+        :rtype: bool
+        """
+        return self._fut.cancelled()
+
+    def close(self):
+        """
+        Release the native resources held by the future. If nothing has
+        started waiting for the result yet, the future is cancelled,
+        otherwise the resources are released as soon as the result is ready.
+        Results already returned by :meth:`get` remain valid, but get
+        shouldn't be called afterwards. Futures can be used as context
+        managers, which call :meth:`close` on exit.
+        """
+        self.cancel()
+        self._close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def as_future(self):
+        """
+        Return a :class:`concurrent.futures.Future` that completes with the
+        same result as :meth:`get`, so that the future can be used with code
+        built around the standard library. The result is retrieved in the
+        background.
+
+        :rtype: concurrent.futures.Future
+        """
+        self._submit()
+        fut = concurrent.futures.Future()
+
+        def copy(src):
+            if src.cancelled():
+                fut.cancel()
+            elif fut.set_running_or_notify_cancel():
+                try:
+                    fut.set_result(self._convert(src.result()))
+                except BaseException as err:
+                    fut.set_exception(err)
+
+        self._fut.add_done_callback(copy)
+        return fut
+
+    def _wait(self, timeout, deadline):
+        if timeout is None and deadline is None:
+            deadline = self._deadline
+        deadline = _deadline(timeout, deadline, self._default_timeout)
+        timeout = deadline.remaining() if deadline is not None else None
+
+        if timeout is None:
+            self._run()
+            return self._fut.result()
+
+        self._submit()
+        try:
+            return self._fut.result(timeout)
+        except concurrent.futures.TimeoutError:
+            raise AEError(Code.DEADLINE_EXCEEDED, "deadline exceeded") from None
+
+    def _submit(self):
+        with self._lock:
+            if self._claimed or self._submitted:
+                return
+            self._submitted = True
+        _resolver().submit(self._run)
+
+    def _get_inline(self):
+        # Retrieves the result in the calling thread, unless another thread
+        # is already doing it, and returns it without converting it.
+        self._run()
+        return self._fut.result()
+
+    def _run(self):
+        with self._lock:
+            if self._claimed:
+                return
+            self._claimed = True
+
+        self._fut.set_running_or_notify_cancel()
+        try:
+            self._fut.set_result(self._resolve())
+        except BaseException as err:
+            self._fut.set_exception(err)
+        finally:
+            self._release()
+
+    def _release(self):
+        # Called once the native future isn't needed anymore.
+        pass
+
+    def _close(self):
+        # Called by close to release what the result holds on to.
+        pass
+
+
+_resolver_lock = threading.Lock()
+_resolver_instance = None
+
+
+def _resolver():
+    global _resolver_instance
+    with _resolver_lock:
+        if _resolver_instance is None:
+            _resolver_instance = concurrent.futures.ThreadPoolExecutor(
+                max_workers=64, thread_name_prefix="pexae-resolve")
+        return _resolver_instance
+
+
+def _shutdown_resolver(wait=True):
+    global _resolver_instance
+    with _resolver_lock:
+        executor, _resolver_instance = _resolver_instance, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+def _after_fork():
+    global _resolver_lock, _resolver_instance
+    _resolver_lock = threading.Lock()
+    _resolver_instance = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def wait(futures, timeout=None, return_when=ALL_COMPLETED):
+    """
+    Wait for the futures returned by the SDK, e.g. :class:`LicenseSearchFuture`
+    or :class:`MetadataSearchFuture`, to complete. This works just like
+    :func:`concurrent.futures.wait`.
+
+    :param futures: an iterable of futures.
+    :param float timeout: the maximum number of seconds to wait, or None to
+        wait indefinitely.
+    :param return_when: one of :data:`FIRST_COMPLETED`,
+        :data:`FIRST_EXCEPTION` or :data:`ALL_COMPLETED`.
+    :return: A named 2-tuple of sets, done and not_done.
+    """
+    futures = {_concurrent(fut): fut for fut in futures}
+    done, not_done = concurrent.futures.wait(futures, timeout, return_when)
+    return _DoneAndNotDone({futures[f] for f in done},
+                           {futures[f] for f in not_done})
+
+
+def as_completed(futures, timeout=None):
+    """
+    Return an iterator over the futures returned by the SDK that yields them
+    as they complete. This works just like :func:`concurrent.futures.as_completed`.
+
+    :param futures: an iterable of futures.
+    :param float timeout: the maximum number of seconds to wait for all the
+        futures, or None to wait indefinitely.
+    :raise: :class:`AEError` with :attr:`Code.DEADLINE_EXCEEDED` if not all
+        the futures complete within timeout.
+    :return: An iterator of futures.
+    """
+    futures = {_concurrent(fut): fut for fut in futures}
+    try:
+        for fut in concurrent.futures.as_completed(futures, timeout):
+            yield futures[fut]
+    except concurrent.futures.TimeoutError:
+        raise AEError(Code.DEADLINE_EXCEEDED,
+                      "futures not completed within {}s".format(timeout)) from None
+
+
+_DoneAndNotDone = namedtuple("DoneAndNotDoneFutures", "done not_done")
+
+
+def _concurrent(fut):
+    fut._submit()
+    return fut._fut
@@ -0,0 +1,261 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+import logging
+import threading
+import time
+
+from pexae.errors import AEError
+
+
+class Event(object):
+    """
+    Describes a single operation performed by the SDK. Events are passed to
+    the listeners registered with :func:`add_listener` once the operation
+    completes. The following operations are reported:
+
+    * ``fingerprint.from_file``, ``fingerprint.from_buffer``,
+      ``fingerprint.load`` and ``fingerprint.dump``, the size is the number
+      of bytes of the input or output, if known.
+    * ``license_search.start`` and ``metadata_search.start``, the time it
+      took to initiate a search.
+    * ``license_search.get`` and ``metadata_search.get``, the time spent
+      waiting for a search result in the native library.
+    * ``license_search.extract`` and ``metadata_search.extract``, the time
+      it took to convert a search result into Python objects, the size is the
+      number of territories or segments.
+    * ``asset_library.get_asset``, the time it took to retrieve an asset,
+      and ``asset_library.extract``, the time it took to convert it.
+    """
+
+    __slots__ = ("_operation", "_started", "_duration", "_size", "_error")
+
+    def __init__(self, operation, started, duration, size=None, error=None):
+        self._operation = operation
+        self._started = started
+        self._duration = duration
+        self._size = size
+        self._error = error
+
+    @property
+    def operation(self):
+        """
+        The name of the operation.
+
+        :type: str
+        """
+        return self._operation
+
+    @property
+    def started(self):
+        """
+        When the operation started, in seconds since the epoch.
+
+        :type: float
+        """
+        return self._started
+
+    @property
+    def duration(self):
+        """
+        How long the operation took in seconds.
+
+        :type: float
+        """
+        return self._duration
+
+    @property
+    def size(self):
+        """
+        The size of the payload, see :class:`Event` for its meaning for each
+        operation, or None if it doesn't apply.
+
+        :type: int
+        """
+        return self._size
+
+    @property
+    def error(self):
+        """
+        The exception raised by the operation or None if it succeeded.
+        """
+        return self._error
+
+    @property
+    def code(self):
+        """
+        The :class:`Code` of the error if the operation failed with an
+        :class:`AEError`, otherwise None.
+
+        :type: Code
+        """
+        if isinstance(self._error, AEError):
+            return self._error.code
+        return None
+
+    def __repr__(self):
+        return "Event(operation={},duration={:.6f},size={},code={})".format(
+                self.operation, self.duration, self.size, self.code)
+
+
+def add_listener(listener):
+    """
+    Register a function that is called with an :class:`Event` every time an
+    operation completes. Listeners are called synchronously in the thread
+    that performed the operation, so they should be fast. Exceptions raised
+    by listeners are logged and otherwise ignored.
+
+    While no listeners are registered, the instrumentation has next to no
+    overhead.
+
+    :param listener: a function accepting an :class:`Event`.
+    """
+    global _listeners
+    with _lock:
+        _listeners = _listeners + (listener,)
+
+
+def remove_listener(listener):
+    """
+    Unregister a function registered with :func:`add_listener`.
+
+    :param listener: the function to unregister.
+    """
+    global _listeners
+    with _lock:
+        listeners = list(_listeners)
+        listeners.remove(listener)
+        _listeners = tuple(listeners)
+
+
+class PrometheusAdapter(object):
+    """
+    A listener that records events into Prometheus metrics. The metrics are
+    only used through their ``labels`` and ``observe`` or ``inc`` methods, so
+    the ones from prometheus_client work, but the package isn't required.
+
+    .. code-block:: python
+
+        duration = prometheus_client.Histogram(
+            "pexae_operation_seconds", "...", ["operation", "code"])
+        pexae.add_listener(pexae.PrometheusAdapter(duration))
+
+    :param duration: a histogram with "operation" and "code" labels that
+        records operation durations. The code is "OK" for successful
+        operations.
+    :param size: an optional histogram with an "operation" label that records
+        payload sizes.
+    :param errors: an optional counter with "operation" and "code" labels
+        that counts failed operations.
+    """
+
+    def __init__(self, duration, size=None, errors=None):
+        self._duration = duration
+        self._size = size
+        self._errors = errors
+
+    def __call__(self, event):
+        code = _code_name(event)
+        self._duration.labels(operation=event.operation, code=code).observe(
+            event.duration)
+        if self._size is not None and event.size is not None:
+            self._size.labels(operation=event.operation).observe(event.size)
+        if self._errors is not None and event.error is not None:
+            self._errors.labels(operation=event.operation, code=code).inc()
+
+
+class OpenTelemetryAdapter(object):
+    """
+    A listener that records events as OpenTelemetry spans. Spans are created
+    after the fact with the start and end time of the operation, as children
+    of the span that is current in the thread that performed the operation.
+
+    .. code-block:: python
+
+        tracer = opentelemetry.trace.get_tracer("pexae")
+        pexae.add_listener(pexae.OpenTelemetryAdapter(tracer))
+
+    :param tracer: an OpenTelemetry tracer.
+    """
+
+    def __init__(self, tracer):
+        self._tracer = tracer
+        try:
+            from opentelemetry.trace import Status, StatusCode
+            self._error_status = Status(StatusCode.ERROR)
+        except ImportError:
+            self._error_status = None
+
+    def __call__(self, event):
+        start = int(event.started * 1e9)
+        span = self._tracer.start_span("pexae." + event.operation,
+                                       start_time=start)
+        if event.size is not None:
+            span.set_attribute("pexae.size", event.size)
+        if event.error is not None:
+            span.set_attribute("pexae.code", _code_name(event))
+            span.record_exception(event.error)
+            if self._error_status is not None:
+                span.set_status(self._error_status)
+        span.end(end_time=start + int(event.duration * 1e9))
+
+
+def _code_name(event):
+    if event.error is None:
+        return "OK"
+    code = event.code
+    if code is None:
+        return type(event.error).__name__
+    return code.name
+
+
+_log = logging.getLogger(__name__)
+_lock = threading.Lock()
+_listeners = ()
+
+
+class _Span(object):
+    # Measures an operation and reports it to the listeners. Operations
+    # create spans using _span, which returns a shared no-op span if there
+    # are no listeners. Sizes that are costly to compute should only be
+    # computed if the span is enabled.
+
+    __slots__ = ("_operation", "_started", "_counter", "size")
+    enabled = True
+
+    def __init__(self, operation):
+        self._operation = operation
+        self.size = None
+
+    def __enter__(self):
+        self._started = time.time()
+        self._counter = time.perf_counter()
+        return self
+
+    def __exit__(self, typ, err, tb):
+        event = Event(self._operation, self._started,
+                      time.perf_counter() - self._counter, self.size, err)
+        for listener in _listeners:
+            try:
+                listener(event)
+            except Exception:
+                _log.exception("pexae instrumentation listener failed")
+
+
+class _NoopSpan(object):
+    __slots__ = ("size",)
+    enabled = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, typ, err, tb):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def _span(operation):
+    if _listeners:
+        return _Span(operation)
+    return _NOOP
@@ -2,8 +2,7 @@
 
 import os
 import ctypes
-import ctypes.util
-import os
+import threading
 
 
 class _SafeObject(object):
@@ -14,11 +13,125 @@ class _SafeObject(object):
         self._delete = delete
 
     def __del__(self):
-        self._delete(ctypes.byref(self._obj))
+        self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        # Releases the native object now rather than when this object is
+        # garbage collected. Closing it more than once has no effect.
+        delete = getattr(self, "_delete", None)
+        if delete is not None:
+            self._delete = None
+            delete(ctypes.byref(self._obj))
 
     def get(self):
+        if self._delete is None:
+            raise ValueError("operation on a closed object")
+        return self._obj
+
+    def disown(self):
+        # Gives up the native object without deleting it, e.g. because it
+        # belongs to the parent of a forked process. It can't be used
+        # afterwards.
+        self._delete = None
+
+
+class _CloseOnError(object):
+    # Closes a native object if the block raises, i.e. when the object isn't
+    # going to be handed over to the caller.
+
+    __slots__ = ("_obj",)
+
+    def __init__(self, obj):
+        self._obj = obj
+
+    def __enter__(self):
         return self._obj
 
+    def __exit__(self, typ, err, tb):
+        if typ is not None:
+            self._obj.close()
+
+
+class _Py_buffer(ctypes.Structure):
+    _fields_ = [
+        ("buf", ctypes.c_void_p),
+        ("obj", ctypes.py_object),
+        ("len", ctypes.c_ssize_t),
+        ("itemsize", ctypes.c_ssize_t),
+        ("readonly", ctypes.c_int),
+        ("ndim", ctypes.c_int),
+        ("format", ctypes.c_char_p),
+        ("shape", ctypes.POINTER(ctypes.c_ssize_t)),
+        ("strides", ctypes.POINTER(ctypes.c_ssize_t)),
+        ("suboffsets", ctypes.POINTER(ctypes.c_ssize_t)),
+        ("internal", ctypes.c_void_p),
+    ]
+
+
+def _load_pythonapi():
+    try:
+        api = ctypes.pythonapi
+        api.PyObject_GetBuffer.argtypes = [
+            ctypes.py_object, ctypes.POINTER(_Py_buffer), ctypes.c_int]
+        api.PyObject_GetBuffer.restype = ctypes.c_int
+        api.PyBuffer_Release.argtypes = [ctypes.POINTER(_Py_buffer)]
+        api.PyBuffer_Release.restype = None
+        return api
+    except (AttributeError, OSError):
+        # Not running on CPython.
+        return None
+
+
+_pythonapi = _load_pythonapi()
+
+
+class _BufferView(object):
+    """
+    Exposes the memory of any object supporting the buffer protocol (bytes,
+    bytearray, memoryview, mmap, ...) to the native library without copying
+    it. Must be used as a context manager, the memory is only guaranteed to
+    stay valid until the context exits. Evaluates to a (data, size) pair that
+    can be passed to AE_Buffer_Set.
+    """
+
+    def __init__(self, buf):
+        self._buf = buf
+        self._c_view = None
+
+    def __enter__(self):
+        buf = self._buf
+        if isinstance(buf, bytes):
+            return buf, len(buf)
+
+        if _pythonapi is not None:
+            # Works for read-only buffers too, e.g. mmaps opened with
+            # ACCESS_READ. PyBUF_SIMPLE requires the memory to be contiguous.
+            self._c_view = _Py_buffer()
+            _pythonapi.PyObject_GetBuffer(buf, ctypes.byref(self._c_view), 0)
+            return self._c_view.buf, self._c_view.len
+
+        view = memoryview(buf)
+        if not view.contiguous:
+            raise BufferError("buffer must be contiguous")
+        view = view.cast("B")
+        if view.readonly:
+            # ctypes can't take the address of read-only memory without the
+            # C API, so this is the only case when the data is copied.
+            data = view.tobytes()
+            return data, len(data)
+        return (ctypes.c_char * view.nbytes).from_buffer(view), view.nbytes
+
+    def __exit__(self, *exc):
+        if self._c_view is not None:
+            _pythonapi.PyBuffer_Release(ctypes.byref(self._c_view))
+            self._c_view = None
+
 
 class _AE_Status(ctypes.Structure):
     @staticmethod
@@ -149,20 +262,123 @@ class _AE_AssetLicensors(ctypes.Structure):
             lib.AE_AssetLicensors_Delete)
 
 
+# The native library returns collections one element at a time. The helpers
+# below iterate them with the function pointers and by-reference arguments
+# prepared up front, so that the loops only do the FFI calls themselves, and
+# return the raw values so that they can be decoded in a single pass.
+
+def _collect_strings(next_fn, c_obj):
+    items = []
+    append = items.append
+    obj = c_obj.get()
+    c_item = ctypes.c_char_p()
+    c_pos = ctypes.c_size_t(0)
+    item_ref = ctypes.byref(c_item)
+    pos_ref = ctypes.byref(c_pos)
+    while next_fn(obj, item_ref, pos_ref):
+        append(c_item.value)
+    return items
+
+
+def _collect_policies(lib, c_res):
+    territories = []
+    policies = []
+    next_fn = lib.AE_LicenseSearchResult_NextPolicy
+    res = c_res.get()
+    c_territory = ctypes.c_char_p()
+    c_policy = ctypes.c_int()
+    c_pos = ctypes.c_size_t(0)
+    territory_ref = ctypes.byref(c_territory)
+    policy_ref = ctypes.byref(c_policy)
+    pos_ref = ctypes.byref(c_pos)
+    while next_fn(res, territory_ref, policy_ref, pos_ref):
+        territories.append(c_territory.value)
+        policies.append(c_policy.value)
+    return territories, policies
+
+
+def _collect_segments(lib, c_match, query_start, query_end, asset_start, asset_end):
+    # Appends to the passed in sequences, which can be lists or arrays.
+    next_fn = lib.AE_MetadataSearchMatch_NextSegment
+    match = c_match.get()
+    c_query_start = ctypes.c_int64(0)
+    c_query_end = ctypes.c_int64(0)
+    c_asset_start = ctypes.c_int64(0)
+    c_asset_end = ctypes.c_int64(0)
+    c_pos = ctypes.c_size_t(0)
+    refs = (ctypes.byref(c_query_start), ctypes.byref(c_query_end),
+            ctypes.byref(c_asset_start), ctypes.byref(c_asset_end),
+            ctypes.byref(c_pos))
+    while next_fn(match, *refs):
+        query_start.append(c_query_start.value)
+        query_end.append(c_query_end.value)
+        asset_start.append(c_asset_start.value)
+        asset_end.append(c_asset_end.value)
+
+
+def _collect_matches(lib, c_res, on_match):
+    # Calls on_match with the match handle for every match of the result.
+    next_fn = lib.AE_MetadataSearchResult_NextMatch
+    res = c_res.get()
+    with _AE_MetadataSearchMatch.new(lib) as c_match:
+        match = c_match.get()
+        c_pos = ctypes.c_size_t(0)
+        pos_ref = ctypes.byref(c_pos)
+        while next_fn(res, match, pos_ref):
+            on_match(c_match)
+
+
+def _collect_licensors(lib, c_metadata):
+    territories = []
+    licensors = []
+    next_fn = lib.AE_AssetMetadata_NextLicensors
+    get_territory = lib.AE_AssetLicensors_GetTerritory
+    next_licensor = lib.AE_AssetLicensors_NextLicensor
+    metadata = c_metadata.get()
+    with _AE_AssetLicensors.new(lib) as c_licensors:
+        obj = c_licensors.get()
+        c_pos = ctypes.c_size_t(0)
+        pos_ref = ctypes.byref(c_pos)
+        while next_fn(metadata, obj, pos_ref):
+            territories.append(get_territory(obj))
+            licensors.append(_collect_strings(next_licensor, c_licensors))
+    return territories, licensors
+
+
+def _decode_all(items):
+    # C strings can't contain NUL bytes, so they can be joined, decoded at
+    # once and split again, which is faster than decoding them one by one.
+    if not items:
+        return []
+    return b"\0".join(items).decode().split("\0")
+
+
 def _load_lib():
     if os.getenv('PEXAE_NO_CORE_LIB') is not None:
         # Defining PEXAE_NO_CORE_LIB makes this wrapper module import-able even without the shared library.
         # Useful for generating documentation.
         return ctypes.CDLL(None)
 
-    name = ctypes.util.find_library("pexae")
-    if name is None:
-        raise RuntimeError('failed to find native library')
-
-    try:
-        lib = ctypes.CDLL(name)
-    except Exception:
-        raise RuntimeError('failed to load native library')
+    if os.getenv('PEXAE_FAKE_LIB') is not None:
+        # Defining PEXAE_FAKE_LIB replaces the shared library with a pure-Python
+        # stand-in, see pexae.fakelib. Useful for testing and benchmarking.
+        from pexae.fakelib import FakeLibrary
+        lib = FakeLibrary.from_env()
+    else:
+        # Defining PEXAE_LIBRARY_PATH loads the shared library from the given
+        # path instead of searching for it, which spawns subprocesses on Linux.
+        name = os.getenv('PEXAE_LIBRARY_PATH')
+        if name is None:
+            # Imported here as it's slow to import and rarely needed.
+            from ctypes.util import find_library
+            name = find_library("pexae")
+        if name is None:
+            raise RuntimeError('failed to find native library')
+
+        try:
+            lib = ctypes.CDLL(name)
+        except Exception:
+            raise RuntimeError('failed to load native library')
 
     # AE_Init
     lib.AE_Init.argtypes = [ctypes.POINTER(_AE_Status)]
@@ -472,13 +688,69 @@ def _load_lib():
         ctypes.POINTER(ctypes.c_size_t)]
     lib.AE_AssetLicensors_NextLicensor.restype = ctypes.c_bool
 
-    # Initialize and return the library
-    c_status = _AE_Status.new(lib)
-    lib.AE_Init(c_status.get())
-
-    if not lib.AE_Status_OK(c_status.get()):
-        raise RuntimeError("failed to initialize library")
     return lib
 
 
-_lib = _load_lib()
+def _init_lib(lib):
+    if os.getenv('PEXAE_NO_CORE_LIB') is not None:
+        return
+
+    with _AE_Status.new(lib) as c_status:
+        lib.AE_Init(c_status.get())
+
+        if not lib.AE_Status_OK(c_status.get()):
+            raise RuntimeError("failed to initialize library")
+
+
+class _LazyLibrary(object):
+    # Stands in for the native library until it's first used, so that
+    # importing pexae doesn't search for the library, bind its symbols and
+    # initialize it. Functions are cached on the instance once resolved, so
+    # later calls don't go through __getattr__. Other attributes, e.g. the
+    # settings of the fake library, are read and written through.
+
+    def __init__(self):
+        object.__setattr__(self, "_library", None)
+        object.__setattr__(self, "_loaded", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def _load(self):
+        lib = self._loaded
+        if lib is None:
+            with self._lock:
+                if self._loaded is None:
+                    if self._library is None:
+                        object.__setattr__(self, "_library", _load_lib())
+                    _init_lib(self._library)
+                    object.__setattr__(self, "_loaded", self._library)
+                lib = self._loaded
+        return lib
+
+    def _after_fork(self):
+        # The native state inherited from the parent may not be usable in a
+        # forked child, so the library is initialized again on first use.
+        # It stays loaded and bound, which doesn't depend on the process.
+        for name in [name for name in self.__dict__ if name.startswith("AE_")]:
+            object.__delattr__(self, name)
+        object.__setattr__(self, "_loaded", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def __getattr__(self, name):
+        value = getattr(self._load(), name)
+        if name.startswith("AE_"):
+            object.__setattr__(self, name, value)
+        return value
+
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
+        if name in self.__dict__:
+            object.__setattr__(self, name, value)
+
+    def __repr__(self):
+        return "_LazyLibrary(loaded={})".format(self._loaded is not None)
+
+
+_lib = _LazyLibrary()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_lib._after_fork)
@@ -1,15 +1,23 @@
 # Copyright 2020 Pexeso Inc. All rights reserved.
 
-import ctypes
+import types
 from datetime import datetime
 from collections import namedtuple
 from enum import Enum
 
 from pexae.lib import _lib, _AE_Status, _AE_Fingerprint, \
-    _AE_LicenseSearchRequest, _AE_LicenseSearchResult, _AE_LicenseSearchFuture
+    _AE_LicenseSearchRequest, _AE_LicenseSearchResult, _AE_LicenseSearchFuture, \
+    _collect_policies, _CloseOnError
 from pexae.errors import AEError
+from pexae.cache import LRUCache
+from pexae.futures import _Future
+from pexae.deadline import _deadline
+from pexae.retry import _retry, _invoke, _restart
+from pexae.instrumentation import _span
 from pexae.common import Segment
 from pexae.asset_library import AssetType
+from pexae.territory import TerritorySet, _as_set, _result_bit, _bit_from_bytes, \
+    _codes
 
 
 class BasicPolicy(Enum):
@@ -30,6 +38,9 @@ class BasicPolicy(Enum):
     """
 
 
+_POLICIES = {policy.value: policy for policy in BasicPolicy}
+
+
 class LicenseSearchRequest(object):
     """
     Holds all data necessary to perform a license search. A search can only be
@@ -57,11 +68,40 @@ class LicenseSearchResult(object):
     """
     This object is returned from :meth:`LicenseSearchFuture.get` upon
     successful comptetion.
+
+    The policies are stored as a pair of :class:`TerritorySet` bitsets, one
+    for the blocked and one for the allowed territories, so that checks like
+    :meth:`is_blocked` are cheap. The :attr:`policies` dict is only built when
+    accessed.
+
+    Results are immutable and hashable, two results are equal if they have
+    the same lookup ID and policies.
     """
 
+    __slots__ = ("_lookup_id", "_blocked", "_allowed", "_policies")
+
     def __init__(self, lookup_id, policies):
+        blocked = 0
+        allowed = 0
+        for territory, policy in policies.items():
+            if policy == BasicPolicy.BLOCK:
+                blocked |= _result_bit(territory)
+            else:
+                allowed |= _result_bit(territory)
+
         self._lookup_id = lookup_id
-        self._policies = policies
+        self._blocked = blocked
+        self._allowed = allowed
+        self._policies = None
+
+    @staticmethod
+    def _from_bits(lookup_id, blocked, allowed):
+        res = LicenseSearchResult.__new__(LicenseSearchResult)
+        res._lookup_id = lookup_id
+        res._blocked = blocked
+        res._allowed = allowed
+        res._policies = None
+        return res
 
     @property
     def lookup_id(self):
@@ -76,60 +116,179 @@ class LicenseSearchResult(object):
     @property
     def policies(self):
         """
-        A dict where the key is a territory and the value is an instance of
-        :class:`BasicPolicy`. The territory codes conform to
+        A read-only dict where the key is a territory and the value is an
+        instance of :class:`BasicPolicy`. The territory codes conform to
         the ISO 3166-1 alpha-2 standard. For more information visit
         https://en.wikipedia.org/wiki/ISO_3166-1_alpha-2.
 
         :type: dict
         """
+        if self._policies is None:
+            policies = dict.fromkeys(_codes(self._allowed), BasicPolicy.ALLOW)
+            policies.update(dict.fromkeys(_codes(self._blocked), BasicPolicy.BLOCK))
+            self._policies = types.MappingProxyType(policies)
         return self._policies
 
+    def is_blocked(self, territories):
+        """
+        Check whether the content is blocked in any of the territories.
+
+        :param territories: a :class:`TerritorySet` or an iterable of
+            territory codes.
+        :rtype: bool
+        """
+        return bool(self._blocked & _as_set(territories)._bits)
+
+    def blocked_territories(self):
+        """
+        The territories in which the content is blocked.
+
+        :rtype: TerritorySet
+        """
+        return TerritorySet._from_bits(self._blocked)
+
+    def allowed_territories(self):
+        """
+        The territories in which the content is allowed.
+
+        :rtype: TerritorySet
+        """
+        return TerritorySet._from_bits(self._allowed)
+
+    def to_tuple(self):
+        """
+        Convert the result into a tuple.
+
+        :return: (lookup_id, ((territory, policy), ...)) with the policies
+            sorted by territory.
+        :rtype: tuple
+        """
+        return (self._lookup_id, tuple(sorted(self.policies.items())))
+
+    def to_dict(self):
+        """
+        Convert the result into a dict keyed by the property names.
+
+        :rtype: dict
+        """
+        return {"lookup_id": self._lookup_id, "policies": dict(self.policies)}
+
+    def __eq__(self, other):
+        if not isinstance(other, LicenseSearchResult):
+            return NotImplemented
+        return (self._lookup_id == other._lookup_id and
+                self._blocked == other._blocked and
+                self._allowed == other._allowed)
+
+    def __hash__(self):
+        return hash((self._lookup_id, self._blocked, self._allowed))
+
+    def __reduce__(self):
+        return (LicenseSearchResult, (self._lookup_id, dict(self.policies)))
+
     def __repr__(self):
         return "LicenseSearchResult(lookup_id={},policies={})".format(
-                self.lookup_id, self.policies)
+                self.lookup_id, dict(self.policies))
 
 
-class LicenseSearchFuture(object):
+class LicenseSearchFuture(_Future):
     """
     This object is returned by the :meth:`LicenseSearch.start` method
-    and is used to retrieve a search result.
+    and is used to retrieve a search result. The future can be shared, the
+    search result or error is retrieved once and then returned to all
+    callers. See :func:`wait` and :func:`as_completed` for waiting on
+    multiple futures at once.
     """
 
-    def __init__(self, c_fut):
+    def __init__(self, c_fut, on_error=None, deadline=None, default_timeout=None,
+                 retry_policy=None, restart=None):
+        super().__init__(deadline, default_timeout)
         self._c_fut = c_fut
+        self._on_error = on_error
+        self._retry_policy = retry_policy
+        self._restart = restart
 
-    def get(self):
+    def get(self, timeout=None, deadline=None):
         """
-        Blocks until the search result is ready and then returns it.
-
+        Blocks until the search result is ready and then returns it. If
+        neither timeout nor deadline is set, the deadline passed to
+        :meth:`LicenseSearch.start` applies, if any, and otherwise
+        :attr:`Client.default_timeout`.
+
+        :param float timeout: the maximum number of seconds to wait.
+        :param Deadline deadline: the deadline by which the result must be
+            ready, can't be combined with timeout.
         :raise: :class:`AEError` if the search couldn't be performed, e.g.
-                because of network issues.
+                because of network issues, or with
+                :attr:`Code.DEADLINE_EXCEEDED` if the result isn't ready
+                in time.
         :rtype: LicenseSearchResult
         """
-
-        c_status = _AE_Status.new(_lib)
-        c_res = _AE_LicenseSearchResult.new(_lib)
-
-        _lib.AE_LicenseSearchFuture_Get(self._c_fut.get(), c_res.get(),
-                                        c_status.get())
-        AEError.check_status(c_status)
-
-        policies = {}
-        c_territory = ctypes.c_char_p()
-        c_policy = ctypes.c_int()
-        c_policies_pos = ctypes.c_size_t(0)
-
-        while _lib.AE_LicenseSearchResult_NextPolicy(
-                c_res.get(),
-                ctypes.byref(c_territory),
-                ctypes.byref(c_policy),
-                ctypes.byref(c_policies_pos)):
-            policies[c_territory.value.decode()] = BasicPolicy(c_policy.value)
-
-        return LicenseSearchResult(
-            lookup_id=_lib.AE_LicenseSearchResult_GetLookupID(c_res.get()),
-            policies=policies)
+        return super().get(timeout, deadline)
+
+    def _resolve(self):
+        try:
+            return _retry(self._retry_policy, self._deadline, self._attempt)
+        except AEError:
+            if self._on_error is not None:
+                self._on_error()
+            raise
+
+    def _release(self):
+        c_fut, self._c_fut = self._c_fut, None
+        self._restart = None
+        if c_fut is not None:
+            c_fut.close()
+
+    def _attempt(self):
+        # The search is started again if a previous attempt failed.
+        c_fut, self._c_fut = self._c_fut, None
+        if c_fut is None:
+            c_fut = _restart(self._restart)
+        with c_fut:
+            return self._get(c_fut)
+
+    def _get(self, c_fut):
+        with _AE_Status.new(_lib) as c_status, \
+                _AE_LicenseSearchResult.new(_lib) as c_res:
+            with _span("license_search.get"):
+                _lib.AE_LicenseSearchFuture_Get(c_fut.get(), c_res.get(),
+                                                c_status.get())
+                AEError.check_status(c_status)
+            return self._extract(c_res)
+
+    def _extract(self, c_res):
+        # The territories are mapped to bits without being decoded.
+        with _span("license_search.extract") as span:
+            territories, values = _collect_policies(_lib, c_res)
+            span.size = len(territories)
+            blocked = 0
+            allowed = 0
+            for territory, value in zip(territories, values):
+                if _POLICIES[value] is BasicPolicy.BLOCK:
+                    blocked |= _bit_from_bytes(territory)
+                else:
+                    allowed |= _bit_from_bytes(territory)
+
+            return LicenseSearchResult._from_bits(
+                lookup_id=_lib.AE_LicenseSearchResult_GetLookupID(c_res.get()),
+                blocked=blocked, allowed=allowed)
+
+
+class _CachedLicenseSearchFuture(LicenseSearchFuture):
+    # Returned by LicenseSearch.start for cached searches. Every caller gets
+    # its own future that waits for the one in the cache, so that cancelling
+    # or closing it doesn't affect the other callers of the search.
+
+    def __init__(self, shared, deadline=None, default_timeout=None):
+        _Future.__init__(self, deadline, default_timeout)
+        self._shared = shared
+
+    def _resolve(self):
+        return self._shared._get_inline()
+
+    def _release(self):
+        self._shared = None
 
 
 class LicenseSearch(object):
@@ -141,27 +300,109 @@ class LicenseSearch(object):
 
     def __init__(self, c_search):
         self._c_search = c_search
+        self._cache = None
+        self._default_timeout = None
+        self._retry_policy = None
+
+    @property
+    def cache(self):
+        """
+        The cache used by :meth:`start` or None if caching is disabled.
+
+        :type: LRUCache
+        """
+        return self._cache
+
+    def enable_cache(self, max_size=1024, ttl=300):
+        """
+        Cache searches started by :meth:`start` in memory, keyed by the
+        :meth:`Fingerprint.digest` of the searched fingerprint. Searches for a
+        fingerprint that was searched for recently share its result, and
+        concurrent searches for the same fingerprint result in a single search
+        on the backend service. Every call still returns its own
+        :class:`LicenseSearchFuture`, which can be cancelled or closed without
+        affecting the other ones. Searches that fail are dropped from the
+        cache.
+
+        Policies may change over time, so ttl should be set to how stale the
+        returned policies are allowed to be.
+
+        :param int max_size: the maximum number of searches to keep.
+        :param float ttl: the number of seconds after which a cached search
+            expires, or None if searches should never expire.
+        :return: The new cache.
+        :rtype: LRUCache
+        """
+        self._cache = LRUCache(max_size=max_size, ttl=ttl)
+        return self._cache
+
+    def disable_cache(self):
+        """
+        Stop caching searches and drop all the cached ones.
+        """
+        self._cache = None
 
-    def start(self, req):
+    def start(self, req, timeout=None, deadline=None):
         """
         Starts a license search. This operation does not block until the
         search is finished, it does however perform a network operation to
-        initiate the search on the backend service.
+        initiate the search on the backend service. If caching was enabled
+        using :meth:`enable_cache`, the search may be served from the cache.
 
         :param LicenseSearchRequest req: search parameters.
+        :param float timeout: the maximum number of seconds to wait for the
+            search to be initiated, defaults to :attr:`Client.default_timeout`.
+        :param Deadline deadline: the deadline by which the search must be
+            initiated, can't be combined with timeout. The deadline also
+            applies to :meth:`LicenseSearchFuture.get` of the returned future.
         :raise: :class:`AEError` if the search couldn’t be initiated, e.g.
-                because of network issues.
+                because of network issues or because the deadline passed.
         :rtype: LicenseSearchFuture
         """
 
-        c_status = _AE_Status.new(_lib)
-        c_req = _AE_LicenseSearchRequest.new(_lib)
-        c_fut = _AE_LicenseSearchFuture.new(_lib)
-
-        _lib.AE_LicenseSearchRequest_SetFingerprint(
-            c_req.get(), req.fingerprint._c_ft.get())
-
-        _lib.AE_LicenseSearch_Start(self._c_search.get(), c_req.get(),
-                                    c_fut.get(), c_status.get())
-        AEError.check_status(c_status)
-        return LicenseSearchFuture(c_fut)
+        deadline = _deadline(timeout, deadline)
+        cache = self._cache
+        if cache is None:
+            return self._start_future(req, deadline, deadline)
+
+        # The cached future is shared, so it doesn't inherit the deadline, the
+        # future returned to the caller does.
+        key = req.fingerprint.digest()
+
+        def load():
+            return self._start_future(req, deadline, None,
+                                      on_error=lambda: cache.invalidate(key))
+
+        wait = deadline or _deadline(None, None, self._default_timeout)
+        shared = cache.get_or_load(key, load, deadline=wait)
+        if not _usable(shared):
+            cache.invalidate(key)
+            shared = cache.get_or_load(key, load, deadline=wait)
+        return _CachedLicenseSearchFuture(shared, deadline, self._default_timeout)
+
+    def _start_future(self, req, deadline, fut_deadline, on_error=None):
+        policy = self._retry_policy
+        c_fut = _invoke(policy, deadline, self._default_timeout, self._start, req)
+        return LicenseSearchFuture(
+            c_fut, on_error=on_error, deadline=fut_deadline,
+            default_timeout=self._default_timeout, retry_policy=policy,
+            restart=lambda: self._start(req))
+
+    def _start(self, req):
+        with _AE_Status.new(_lib) as c_status, \
+                _AE_LicenseSearchRequest.new(_lib) as c_req, \
+                _CloseOnError(_AE_LicenseSearchFuture.new(_lib)) as c_fut:
+            _lib.AE_LicenseSearchRequest_SetFingerprint(
+                c_req.get(), req.fingerprint._c_ft.get())
+
+            with _span("license_search.start"):
+                _lib.AE_LicenseSearch_Start(self._c_search.get(), c_req.get(),
+                                            c_fut.get(), c_status.get())
+                AEError.check_status(c_status)
+        return c_fut
+
+
+def _usable(fut):
+    # Cancelled and failed searches mustn't be served from the cache.
+    fut = fut._fut
+    return not fut.done() or (not fut.cancelled() and fut.exception() is None)
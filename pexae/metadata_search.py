@@ -1,14 +1,19 @@
 # Copyright 2020 Pexeso Inc. All rights reserved.
 
-import ctypes
+from array import array
+from collections.abc import Sequence
 from datetime import datetime
 from collections import namedtuple
 from enum import Enum
 
 from pexae.lib import _lib, _AE_Status, _AE_Fingerprint, \
     _AE_MetadataSearchRequest, _AE_MetadataSearchResult, \
-    _AE_MetadataSearchMatch, _AE_MetadataSearchFuture
+    _AE_MetadataSearchFuture, _collect_matches, _collect_segments, _CloseOnError
 from pexae.errors import AEError
+from pexae.futures import _Future
+from pexae.deadline import _deadline
+from pexae.retry import _retry, _invoke, _restart
+from pexae.instrumentation import _span
 from pexae.common import Segment
 from pexae.asset_library import AssetType
 
@@ -40,10 +45,17 @@ class MetadataSearchMatch(object):
     """
     Contains detailed information about the match, including information about
     the matched asset, and the matching segments.
+
+    Matches are immutable and hashable, two matches are equal if they have
+    the same asset ID and segments.
     """
 
+    __slots__ = ("_asset_id", "_segments")
+
     def __init__(self, asset_id, segments):
         self._asset_id = asset_id
+        if not isinstance(segments, _SegmentView):
+            segments = tuple(segments)
         self._segments = segments
 
     @property
@@ -60,26 +72,60 @@ class MetadataSearchMatch(object):
     @property
     def segments(self):
         """
-        A list of matching :class:`Segment` instances.
+        A sequence of matching :class:`Segment` instances.
 
-        :type: list
+        :type: tuple
         """
         return self._segments
 
+    def to_tuple(self):
+        """
+        Convert the match into nested tuples.
+
+        :return: (asset_id, ((query_start, query_end, asset_start, asset_end), ...))
+        :rtype: tuple
+        """
+        return (self._asset_id, tuple(seg.to_tuple() for seg in self._segments))
+
+    def to_dict(self):
+        """
+        Convert the match into a dict keyed by the property names, the
+        segments are converted using :meth:`Segment.to_dict`.
+
+        :rtype: dict
+        """
+        return {
+            "asset_id": self._asset_id,
+            "segments": [seg.to_dict() for seg in self._segments],
+        }
+
+    def __eq__(self, other):
+        if not isinstance(other, MetadataSearchMatch):
+            return NotImplemented
+        return self.to_tuple() == other.to_tuple()
+
+    def __hash__(self):
+        return hash(self.to_tuple())
+
     def __repr__(self):
         return "MetadataSearchMatch(asset_id={},segments={})".format(
-                self.asset_id, self.segments)
+                self.asset_id, list(self.segments))
 
 
 class MetadataSearchResult(object):
     """
     This object is returned from :meth:`MetadataSearchFuture.get` upon
     successful comptetion.
+
+    Results are immutable and hashable, two results are equal if they have
+    the same lookup ID and matches.
     """
 
+    __slots__ = ("_lookup_id", "_matches")
+
     def __init__(self, lookup_id, matches):
         self._lookup_id = lookup_id
-        self._matches = matches
+        self._matches = tuple(matches)
 
     @property
     def lookup_id(self):
@@ -94,55 +140,298 @@ class MetadataSearchResult(object):
     @property
     def matches(self):
         """
-        A list of :class:`MetadataSearchMatch`.
+        A tuple of :class:`MetadataSearchMatch`.
 
-        :type: list
+        :type: tuple
         """
         return self._matches
 
+    def to_tuple(self):
+        """
+        Convert the result into nested tuples, the matches are converted using
+        :meth:`MetadataSearchMatch.to_tuple`.
+
+        :return: (lookup_id, (match, ...))
+        :rtype: tuple
+        """
+        return (self._lookup_id, tuple(m.to_tuple() for m in self.matches))
+
+    def to_dict(self):
+        """
+        Convert the result into a dict keyed by the property names, the
+        matches are converted using :meth:`MetadataSearchMatch.to_dict`.
+
+        :rtype: dict
+        """
+        return {
+            "lookup_id": self._lookup_id,
+            "matches": [m.to_dict() for m in self.matches],
+        }
+
+    def __eq__(self, other):
+        if not isinstance(other, MetadataSearchResult):
+            return NotImplemented
+        return self.to_tuple() == other.to_tuple()
+
+    def __hash__(self):
+        return hash(self.to_tuple())
+
+    def resolve_assets(self, asset_library, concurrency=8, timeout=None,
+                       deadline=None):
+        """
+        Retrieve the assets of all the matches in parallel. This is a shortcut
+        for calling :meth:`AssetLibrary.get_assets` with the asset IDs of
+        :attr:`matches`.
+
+        :param AssetLibrary asset_library: the library to retrieve the assets
+            from, usually :attr:`Client.asset_library`.
+        :param int concurrency: the maximum number of parallel retrievals.
+        :param float timeout: see :meth:`AssetLibrary.get_assets`.
+        :param Deadline deadline: see :meth:`AssetLibrary.get_assets`.
+        :return: A dict mapping each asset ID to either an :class:`Asset` or
+            the :class:`AEError` raised while retrieving it.
+        :rtype: dict
+        """
+        return asset_library.get_assets(
+            (match.asset_id for match in self._matches),
+            concurrency=concurrency, timeout=timeout, deadline=deadline)
+
     def __repr__(self):
         return "MetadataSearchResult(lookup_id={},matches=<{} objects>)".format(
                 self.lookup_id, len(self.matches))
 
 
-class MetadataSearchFuture(object):
+class CompactMetadataSearchResult(MetadataSearchResult):
     """
-    This object is returned by the :meth:`MetadataSearch.start` method
-    and is used to retrieve a search result.
+    A memory efficient variant of :class:`MetadataSearchResult` returned by
+    :meth:`MetadataSearchFuture.get` when called with compact=True. Instead
+    of creating an object per match and per segment, the segments of all the
+    matches are stored in contiguous columns of 64-bit integers. The columns
+    are :class:`array.array` instances and support the buffer protocol, so
+    they can be wrapped without copying, e.g. using ``numpy.frombuffer``.
+
+    The :attr:`matches` property is still available for compatibility, the
+    :class:`MetadataSearchMatch` and :class:`Segment` objects are created
+    lazily when accessed. Compact results compare equal to regular results
+    with the same content.
     """
 
-    def __init__(self, c_fut):
-        self._c_fut = c_fut
+    __slots__ = ("_asset_ids", "_match_offsets", "_query_start", "_query_end",
+                 "_asset_start", "_asset_end")
 
-    def get(self):
+    def __init__(self, lookup_id, asset_ids, match_offsets, query_start,
+                 query_end, asset_start, asset_end):
+        self._lookup_id = lookup_id
+        self._asset_ids = asset_ids
+        self._match_offsets = match_offsets
+        self._query_start = query_start
+        self._query_end = query_end
+        self._asset_start = asset_start
+        self._asset_end = asset_end
+        self._matches = None
+
+    @property
+    def matches(self):
         """
-        Blocks until the search result is ready and then returns it.
+        A tuple of :class:`MetadataSearchMatch`, created on first access.
 
-        :raise: :class:`AEError` if the search couldn't be performed, e.g.
-                because of network issues.
-        :rtype: MetadataSearchResult
+        :type: tuple
+        """
+        if self._matches is None:
+            self._matches = tuple(
+                MetadataSearchMatch(asset_id, _SegmentView(
+                    self, self._match_offsets[i], self._match_offsets[i + 1]))
+                for i, asset_id in enumerate(self._asset_ids))
+        return self._matches
+
+    @property
+    def asset_ids(self):
+        """
+        The asset ID of each match.
+
+        :type: array.array
+        """
+        return self._asset_ids
+
+    @property
+    def match_offsets(self):
+        """
+        The segments of the i-th match are stored at positions
+        ``match_offsets[i]`` to ``match_offsets[i + 1]`` (exclusive) of the
+        segment columns. It has one more element than there are matches.
+
+        :type: array.array
         """
+        return self._match_offsets
 
-        c_status = _AE_Status.new(_lib)
-        c_res = _AE_MetadataSearchResult.new(_lib)
+    @property
+    def match_index(self):
+        """
+        The index of the match each segment belongs to.
+
+        :type: array.array
+        """
+        index = array("q")
+        for i in range(len(self._asset_ids)):
+            index.extend([i] * (self._match_offsets[i + 1] - self._match_offsets[i]))
+        return index
+
+    @property
+    def query_start(self):
+        """
+        The :attr:`Segment.query_start` of each segment.
+
+        :type: array.array
+        """
+        return self._query_start
+
+    @property
+    def query_end(self):
+        """
+        The :attr:`Segment.query_end` of each segment.
+
+        :type: array.array
+        """
+        return self._query_end
+
+    @property
+    def asset_start(self):
+        """
+        The :attr:`Segment.asset_start` of each segment.
+
+        :type: array.array
+        """
+        return self._asset_start
+
+    @property
+    def asset_end(self):
+        """
+        The :attr:`Segment.asset_end` of each segment.
+
+        :type: array.array
+        """
+        return self._asset_end
+
+    def resolve_assets(self, asset_library, concurrency=8, timeout=None,
+                       deadline=None):
+        """
+        Same as :meth:`MetadataSearchResult.resolve_assets`, but doesn't need
+        to create the match objects.
+        """
+        return asset_library.get_assets(self._asset_ids, concurrency=concurrency,
+                                        timeout=timeout, deadline=deadline)
+
+    def __repr__(self):
+        return "CompactMetadataSearchResult(lookup_id={},matches=<{} objects>,segments=<{} objects>)".format(
+                self.lookup_id, len(self._asset_ids), len(self._query_start))
 
-        _lib.AE_MetadataSearchFuture_Get(self._c_fut.get(), c_res.get(),
-                                         c_status.get())
-        AEError.check_status(c_status)
 
-        c_match = _AE_MetadataSearchMatch.new(_lib)
-        c_matches_pos = ctypes.c_size_t(0)
+class _SegmentView(Sequence):
+    # Segments of a single match of a CompactMetadataSearchResult.
 
-        matches = []
-        while _lib.AE_MetadataSearchResult_NextMatch(
-                c_res.get(), c_match.get(), ctypes.byref(c_matches_pos)):
-            matches.append(MetadataSearchMatch(
-                asset_id=_lib.AE_MetadataSearchMatch_GetAssetID(c_match.get()),
-                segments=_extract_metadata_search_segments(c_match)))
+    __slots__ = ("_res", "_start", "_end")
+
+    def __init__(self, res, start, end):
+        self._res = res
+        self._start = start
+        self._end = end
+
+    def __len__(self):
+        return self._end - self._start
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("segment index out of range")
+
+        i += self._start
+        res = self._res
+        return Segment(
+            query_start=res._query_start[i],
+            query_end=res._query_end[i],
+            asset_start=res._asset_start[i],
+            asset_end=res._asset_end[i])
+
+    def __repr__(self):
+        return repr(list(self))
 
-        return MetadataSearchResult(
-            lookup_id=_lib.AE_MetadataSearchResult_GetLookupID(c_res.get()),
-            matches=matches)
+
+class MetadataSearchFuture(_Future):
+    """
+    This object is returned by the :meth:`MetadataSearch.start` method
+    and is used to retrieve a search result. The future can be shared, the
+    search result or error is retrieved once and then returned to all
+    callers. See :func:`wait` and :func:`as_completed` for waiting on
+    multiple futures at once.
+    """
+
+    def __init__(self, c_fut, deadline=None, default_timeout=None,
+                 retry_policy=None, restart=None):
+        super().__init__(deadline, default_timeout)
+        self._c_fut = c_fut
+        self._retry_policy = retry_policy
+        self._restart = restart
+        self._expanded = None
+
+    def get(self, timeout=None, deadline=None, *, compact=False):
+        """
+        Blocks until the search result is ready and then returns it. If
+        neither timeout nor deadline is set, the deadline passed to
+        :meth:`MetadataSearch.start` applies, if any, and otherwise
+        :attr:`Client.default_timeout`.
+
+        :param float timeout: the maximum number of seconds to wait.
+        :param Deadline deadline: the deadline by which the result must be
+            ready, can't be combined with timeout.
+        :param bool compact: return a :class:`CompactMetadataSearchResult`,
+            which uses significantly less memory for results with many
+            segments. The result is only converted once for either value,
+            later calls return the same object.
+        :raise: :class:`AEError` if the search couldn't be performed, e.g.
+                because of network issues, or with
+                :attr:`Code.DEADLINE_EXCEEDED` if the result isn't ready
+                in time.
+        :rtype: MetadataSearchResult
+        """
+        return self._convert(self._wait(timeout, deadline), compact)
+
+    def _resolve(self):
+        return _retry(self._retry_policy, self._deadline, self._attempt)
+
+    def _release(self):
+        c_fut, self._c_fut = self._c_fut, None
+        self._restart = None
+        if c_fut is not None:
+            c_fut.close()
+
+    def _attempt(self):
+        # The search is started again if a previous attempt failed. The
+        # native result is converted into the compact result right away and
+        # released, the regular result is created from it on demand.
+        c_fut, self._c_fut = self._c_fut, None
+        if c_fut is None:
+            c_fut = _restart(self._restart)
+
+        with c_fut, _AE_Status.new(_lib) as c_status, \
+                _AE_MetadataSearchResult.new(_lib) as c_res:
+            with _span("metadata_search.get"):
+                _lib.AE_MetadataSearchFuture_Get(c_fut.get(), c_res.get(),
+                                                 c_status.get())
+                AEError.check_status(c_status)
+            with _span("metadata_search.extract") as span:
+                res = _extract_compact_result(c_res)
+                span.size = len(res.query_start)
+                return res
+
+    def _convert(self, res, compact=False):
+        if compact:
+            return res
+        if self._expanded is None:
+            self._expanded = _expand_compact_result(res)
+        return self._expanded
 
 
 class MetadataSearch(object):
@@ -154,46 +443,79 @@ class MetadataSearch(object):
 
     def __init__(self, c_search):
         self._c_search = c_search
+        self._default_timeout = None
+        self._retry_policy = None
 
-    def start(self, req):
+    def start(self, req, timeout=None, deadline=None):
         """
         Starts a metadata search. This operation does not block until the
         search is finished, it does however perform a network operation to
         initiate the search on the backend service.
 
         :param MetadataSearchRequest req: search parameters.
+        :param float timeout: the maximum number of seconds to wait for the
+            search to be initiated, defaults to :attr:`Client.default_timeout`.
+        :param Deadline deadline: the deadline by which the search must be
+            initiated, can't be combined with timeout. The deadline also
+            applies to :meth:`MetadataSearchFuture.get` of the returned
+            future.
         :raise: :class:`AEError` if the search couldn’t be initiated, e.g.
-                because of network issues.
+                because of network issues or because the deadline passed.
         :rtype: MetadataSearchFuture
         """
-        c_status = _AE_Status.new(_lib)
-        c_req = _AE_MetadataSearchRequest.new(_lib)
-        c_fut = _AE_MetadataSearchFuture.new(_lib)
-
-        _lib.AE_MetadataSearchRequest_SetFingerprint(
-            c_req.get(), req.fingerprint._c_ft.get())
-
-        _lib.AE_MetadataSearch_Start(self._c_search.get(), c_req.get(),
-                                  c_fut.get(), c_status.get())
-        AEError.check_status(c_status)
-        return MetadataSearchFuture(c_fut)
-
-
-def _extract_metadata_search_segments(c_match):
-    c_query_start = ctypes.c_int64(0)
-    c_query_end = ctypes.c_int64(0)
-    c_asset_start = ctypes.c_int64(0)
-    c_asset_end = ctypes.c_int64(0)
-    c_segments_pos = ctypes.c_size_t(0)
-
-    segments = []
-    while _lib.AE_MetadataSearchMatch_NextSegment(
-            c_match.get(), ctypes.byref(c_query_start), ctypes.byref(c_query_end),
-            ctypes.byref(c_asset_start), ctypes.byref(c_asset_end),
-            ctypes.byref(c_segments_pos)):
-        segments.append(Segment(
-            query_start=c_query_start.value,
-            query_end=c_query_end.value,
-            asset_start=c_asset_start.value,
-            asset_end=c_asset_end.value))
-    return segments
+        deadline = _deadline(timeout, deadline)
+        policy = self._retry_policy
+        c_fut = _invoke(policy, deadline, self._default_timeout, self._start, req)
+        return MetadataSearchFuture(
+            c_fut, deadline=deadline, default_timeout=self._default_timeout,
+            retry_policy=policy, restart=lambda: self._start(req))
+
+    def _start(self, req):
+        with _AE_Status.new(_lib) as c_status, \
+                _AE_MetadataSearchRequest.new(_lib) as c_req, \
+                _CloseOnError(_AE_MetadataSearchFuture.new(_lib)) as c_fut:
+            _lib.AE_MetadataSearchRequest_SetFingerprint(
+                c_req.get(), req.fingerprint._c_ft.get())
+
+            with _span("metadata_search.start"):
+                _lib.AE_MetadataSearch_Start(self._c_search.get(), c_req.get(),
+                                             c_fut.get(), c_status.get())
+                AEError.check_status(c_status)
+        return c_fut
+
+
+def _extract_compact_result(c_res):
+    asset_ids = array("Q")
+    match_offsets = array("q", [0])
+    query_start = array("q")
+    query_end = array("q")
+    asset_start = array("q")
+    asset_end = array("q")
+
+    def on_match(c_match):
+        asset_ids.append(_lib.AE_MetadataSearchMatch_GetAssetID(c_match.get()))
+        _collect_segments(_lib, c_match, query_start, query_end, asset_start, asset_end)
+        match_offsets.append(len(query_start))
+
+    _collect_matches(_lib, c_res, on_match)
+
+    return CompactMetadataSearchResult(
+        lookup_id=_lib.AE_MetadataSearchResult_GetLookupID(c_res.get()),
+        asset_ids=asset_ids,
+        match_offsets=match_offsets,
+        query_start=query_start,
+        query_end=query_end,
+        asset_start=asset_start,
+        asset_end=asset_end)
+
+
+def _expand_compact_result(res):
+    # Creates the regular result with the same content as a compact one.
+    offsets = res._match_offsets
+    matches = []
+    for i, asset_id in enumerate(res._asset_ids):
+        start, end = offsets[i], offsets[i + 1]
+        matches.append(MetadataSearchMatch(asset_id, tuple(map(
+            Segment, res._query_start[start:end], res._query_end[start:end],
+            res._asset_start[start:end], res._asset_end[start:end]))))
+    return MetadataSearchResult(lookup_id=res._lookup_id, matches=matches)
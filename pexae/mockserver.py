@@ -1,8 +1,6 @@
 # Copyright 2020 Pexeso Inc. All rights reserved.
 
-from .lib import _lib, _AE_Client, _AE_Status
-from pexae.client import Client
-from pexae.errors import AEError
+from pexae.client import ClientConfig
 
 
 class Mockserver(object):
@@ -21,11 +19,4 @@ class Mockserver(object):
         :raise: :class:`AEError` if the connection cannot be established
                 or the provided authentication credentials are invalid.
         """
-
-        c_status = _AE_Status.new(_lib)
-        c_client = _AE_Client.new(_lib)
-
-        _lib.AE_Mockserver_InitClient(c_client.get(), client_id.encode(),
-                                      client_secret.encode(), c_status.get())
-        AEError.check_status(c_status)
-        return Client(c_client)
+        return ClientConfig(client_id, client_secret, mockserver=True).new_client()
@@ -0,0 +1,260 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+import os
+import queue
+import threading
+
+from pexae.fingerprint import Fingerprint
+from pexae.license_search import LicenseSearch, LicenseSearchRequest
+from pexae.metadata_search import MetadataSearch, MetadataSearchRequest
+
+
+class PipelineResult(object):
+    """
+    The outcome of processing a single input by :class:`SearchPipeline`.
+    Either :attr:`result` or :attr:`error` is set, never both.
+    """
+
+    def __init__(self, index, input, result=None, assets=None, error=None):
+        self._index = index
+        self._input = input
+        self._result = result
+        self._assets = assets
+        self._error = error
+
+    @property
+    def index(self):
+        """
+        The position of the input in the iterable passed to
+        :meth:`SearchPipeline.run`. Results are yielded in the order they
+        complete, this can be used to restore the original order.
+
+        :type: int
+        """
+        return self._index
+
+    @property
+    def input(self):
+        """
+        The path, buffer or fingerprint this result belongs to.
+        """
+        return self._input
+
+    @property
+    def result(self):
+        """
+        The search result, an instance of :class:`LicenseSearchResult` or
+        :class:`MetadataSearchResult` depending on the search the pipeline
+        performs. None if processing failed.
+        """
+        return self._result
+
+    @property
+    def assets(self):
+        """
+        A dict mapping asset IDs of the matches to :class:`Asset` instances.
+        Only set if the pipeline was configured to look up assets. If an asset
+        couldn't be retrieved, the value is the :class:`AEError` that was
+        raised instead.
+
+        :type: dict
+        """
+        return self._assets
+
+    @property
+    def error(self):
+        """
+        The error that stopped processing of the input or None.
+        """
+        return self._error
+
+    def __repr__(self):
+        return "PipelineResult(index={},result={},error={})".format(
+                self.index, self.result, self.error)
+
+
+class SearchPipeline(object):
+    """
+    Runs searches for a stream of inputs in stages: fingerprinting, starting
+    the search, retrieving the result and, optionally, looking up the matched
+    assets. Every stage has its own pool of worker threads and the stages are
+    connected by bounded queues, so the number of inputs that are being
+    processed at any given time, and therefore also the memory used, is
+    bounded regardless of how many inputs are passed in.
+
+    :param search: either :attr:`Client.license_search` or
+        :attr:`Client.metadata_search`.
+    :param AssetLibrary asset_library: if set, assets of metadata search
+        matches are looked up as the last stage of the pipeline.
+    :param int fingerprint_workers: number of concurrent fingerprinting
+        operations, defaults to the number of CPUs.
+    :param int start_workers: number of concurrent search starts.
+    :param int get_workers: number of concurrent result retrievals.
+    :param int asset_workers: number of results whose assets are looked up
+        concurrently. Assets of a single result are looked up in parallel
+        too, see :meth:`MetadataSearchResult.resolve_assets`.
+    :param int queue_size: capacity of each queue between stages.
+    """
+
+    def __init__(self, search, asset_library=None, fingerprint_workers=None,
+                 start_workers=4, get_workers=16, asset_workers=4,
+                 queue_size=64):
+        if isinstance(search, LicenseSearch):
+            self._request_cls = LicenseSearchRequest
+        elif isinstance(search, MetadataSearch):
+            self._request_cls = MetadataSearchRequest
+        else:
+            raise TypeError("search must be a LicenseSearch or a MetadataSearch")
+
+        if asset_library is not None and self._request_cls is not MetadataSearchRequest:
+            raise ValueError("assets can only be looked up for metadata searches")
+
+        self._search = search
+        self._asset_library = asset_library
+        self._queue_size = queue_size
+
+        self._stages = [
+            (self._fingerprint, fingerprint_workers or os.cpu_count() or 1),
+            (self._start, start_workers),
+            (self._get, get_workers),
+        ]
+        if asset_library is not None:
+            self._stages.append((self._lookup_assets, asset_workers))
+
+    def run(self, inputs):
+        """
+        Process all inputs and yield the results as they complete. Each input
+        can be a path to a media file, given as a str or :class:`os.PathLike`
+        object, a byte buffer holding a media file or a :class:`Fingerprint`.
+        Unlike with :meth:`Fingerprint.from_file`, bytes are always treated
+        as a buffer. Errors are captured in the corresponding
+        :class:`PipelineResult` and don't stop the pipeline.
+
+        If the generator is closed before it's exhausted, the pipeline stops
+        accepting new work.
+
+        :param inputs: an iterable of inputs.
+        :return: a generator of :class:`PipelineResult`.
+        """
+
+        run = _Run(self._stages, inputs, self._queue_size)
+        try:
+            while True:
+                item = run.get(len(self._stages))
+                if item is _DONE:
+                    break
+                yield PipelineResult(item.index, item.input, result=item.result,
+                                     assets=item.assets, error=item.error)
+        finally:
+            run.stop()
+
+        if run.feed_error is not None:
+            raise run.feed_error
+
+    def _fingerprint(self, item):
+        if isinstance(item.input, Fingerprint):
+            item.value = item.input
+        elif isinstance(item.input, (str, os.PathLike)):
+            item.value = Fingerprint.from_file(item.input)
+        else:
+            item.value = Fingerprint.from_buffer(item.input)
+
+    def _start(self, item):
+        item.value = self._search.start(self._request_cls(item.value))
+
+    def _get(self, item):
+        item.result = item.value.get()
+        item.value = None
+
+    def _lookup_assets(self, item):
+        item.assets = item.result.resolve_assets(self._asset_library)
+
+
+_DONE = object()
+
+
+class _Item(object):
+    __slots__ = ("index", "input", "value", "result", "assets", "error")
+
+    def __init__(self, index, input):
+        self.index = index
+        self.input = input
+        self.value = None
+        self.result = None
+        self.assets = None
+        self.error = None
+
+
+class _Run(object):
+    # State of a single SearchPipeline.run invocation. Queue i feeds stage i,
+    # the last queue holds the results. Once a stage runs out of work, its
+    # last worker passes one _DONE marker to every worker of the next stage.
+
+    def __init__(self, stages, inputs, queue_size):
+        self.feed_error = None
+        self._stop = threading.Event()
+        self._queues = [queue.Queue(maxsize=queue_size)
+                        for _ in range(len(stages) + 1)]
+        self._workers = [workers for _, workers in stages] + [1]
+
+        for i, (fn, workers) in enumerate(stages):
+            remaining = [workers]
+            lock = threading.Lock()
+            for _ in range(workers):
+                self._spawn(self._work, i, fn, remaining, lock)
+        self._spawn(self._feed, inputs)
+
+    def stop(self):
+        self._stop.set()
+
+    def get(self, i):
+        while not self._stop.is_set():
+            try:
+                return self._queues[i].get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return _DONE
+
+    def _put(self, i, item):
+        while not self._stop.is_set():
+            try:
+                self._queues[i].put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _done(self, i):
+        for _ in range(self._workers[i]):
+            self._put(i, _DONE)
+
+    def _spawn(self, target, *args):
+        threading.Thread(target=target, args=args, daemon=True).start()
+
+    def _feed(self, inputs):
+        try:
+            for index, input in enumerate(inputs):
+                if self._stop.is_set():
+                    return
+                self._put(0, _Item(index, input))
+        except Exception as err:
+            self.feed_error = err
+        self._done(0)
+
+    def _work(self, i, fn, remaining, lock):
+        while True:
+            item = self.get(i)
+            if item is _DONE:
+                break
+            if item.error is None:
+                try:
+                    fn(item)
+                except Exception as err:
+                    item.value = None
+                    item.error = err
+            self._put(i + 1, item)
+
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            self._done(i + 1)
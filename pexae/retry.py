@@ -0,0 +1,201 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+import random
+import threading
+import time
+
+from pexae.errors import AEError, Code
+from pexae.deadline import _deadline, _call, _Abandoned
+
+
+class RetryPolicy(object):
+    """
+    Describes how operations that fail with a transient error are retried.
+    A policy is set on a client using :attr:`Client.retry_policy` and then
+    applies to starting searches, retrieving their results and retrieving
+    assets. A search whose result can't be retrieved is started again.
+
+    Retries are delayed by an exponential backoff with full jitter, i.e. the
+    n-th retry is delayed by a random duration between 0 and
+    ``min(max_backoff, initial_backoff * multiplier ** (n - 1))`` seconds. An
+    operation is not retried once max_attempts were made, once the next
+    attempt would start after the budget elapses, or once the deadline of the
+    operation would pass. An operation that times out before the backend
+    service responds isn't retried either, because it keeps running in the
+    background and a retry would only add to the load.
+
+    To prevent retries from amplifying the load during an outage, the policy
+    keeps a token bucket shared by all the operations it applies to. Every
+    retryable failure removes a token and every success adds token_ratio
+    tokens, up to max_tokens. While the bucket is less than half full,
+    failed operations aren't retried. A pickled policy, e.g. one sent to a
+    worker process as part of a :class:`ClientConfig`, starts with a full
+    bucket.
+
+    :param int max_attempts: the maximum number of attempts, including the
+        first one.
+    :param float initial_backoff: the maximum delay before the first retry in
+        seconds.
+    :param float max_backoff: the maximum delay before any retry in seconds.
+    :param float multiplier: the factor by which the maximum delay grows with
+        every retry.
+    :param float budget: the maximum number of seconds from the first attempt
+        to the start of the last retry, or None for no limit.
+    :param retryable_codes: the error codes that are retried, defaults to
+        :attr:`Code.CONNECTION_ERROR`, :attr:`Code.DEADLINE_EXCEEDED` and
+        :attr:`Code.INTERNAL_ERROR`.
+    :param float max_tokens: the capacity of the token bucket.
+    :param float token_ratio: the number of tokens added by a success.
+    """
+
+    def __init__(self, max_attempts=3, initial_backoff=0.1, max_backoff=5.0,
+                 multiplier=2.0, budget=None, retryable_codes=None,
+                 max_tokens=10, token_ratio=0.1):
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be positive")
+        if retryable_codes is None:
+            retryable_codes = _RETRYABLE_CODES
+
+        self._max_attempts = max_attempts
+        self._initial_backoff = initial_backoff
+        self._max_backoff = max_backoff
+        self._multiplier = multiplier
+        self._budget = budget
+        self._retryable_codes = frozenset(map(Code, retryable_codes))
+        self._max_tokens = float(max_tokens)
+        self._token_ratio = token_ratio
+        self._tokens = float(max_tokens)
+        self._lock = threading.Lock()
+        self._retries = 0
+
+    @property
+    def max_attempts(self):
+        """
+        The maximum number of attempts, including the first one.
+
+        :type: int
+        """
+        return self._max_attempts
+
+    @property
+    def retryable_codes(self):
+        """
+        The error codes that are retried.
+
+        :type: frozenset
+        """
+        return self._retryable_codes
+
+    @property
+    def retries(self):
+        """
+        The number of retries performed so far.
+
+        :type: int
+        """
+        return self._retries
+
+    @property
+    def throttled(self):
+        """
+        Whether retries are currently suppressed because too many operations
+        failed recently.
+
+        :type: bool
+        """
+        return self._tokens <= self._max_tokens / 2
+
+    def backoff(self, attempt):
+        """
+        Return a randomized delay before the given retry.
+
+        :param int attempt: the number of the retry, starting at 1.
+        :rtype: float
+        """
+        cap = self._initial_backoff * self._multiplier ** (attempt - 1)
+        return random.uniform(0, min(self._max_backoff, cap))
+
+    def _call(self, fn, deadline=None):
+        started = time.monotonic()
+        attempt = 1
+        while True:
+            try:
+                value = fn()
+            except AEError as err:
+                if err.code not in self._retryable_codes:
+                    raise
+                if not self._failed() or attempt >= self._max_attempts:
+                    raise
+                if isinstance(err, _Abandoned):
+                    raise
+
+                delay = self.backoff(attempt)
+                if self._budget is not None and \
+                        time.monotonic() + delay - started > self._budget:
+                    raise
+                if deadline is not None and deadline.remaining() <= delay:
+                    raise
+
+                with self._lock:
+                    self._retries += 1
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            self._succeeded()
+            return value
+
+    def _failed(self):
+        # Returns whether the failure may be retried.
+        with self._lock:
+            self._tokens = max(self._tokens - 1, 0.0)
+            return self._tokens > self._max_tokens / 2
+
+    def _succeeded(self):
+        with self._lock:
+            self._tokens = min(self._tokens + self._token_ratio, self._max_tokens)
+
+    def __reduce__(self):
+        # The token bucket and the counters aren't pickled, so that a policy
+        # sent to another process starts out fresh there.
+        return (RetryPolicy, (self._max_attempts, self._initial_backoff,
+                              self._max_backoff, self._multiplier,
+                              self._budget, tuple(self._retryable_codes),
+                              self._max_tokens, self._token_ratio))
+
+    def __repr__(self):
+        return "RetryPolicy(max_attempts={},retryable_codes={},retries={})".format(
+                self.max_attempts, sorted(c.name for c in self.retryable_codes),
+                self.retries)
+
+
+_RETRYABLE_CODES = (Code.CONNECTION_ERROR, Code.DEADLINE_EXCEEDED,
+                    Code.INTERNAL_ERROR)
+
+
+def _retry(policy, deadline, fn):
+    # Calls fn and retries it according to policy, which may be None.
+    if policy is None:
+        return fn()
+    return policy._call(fn, deadline)
+
+
+def _invoke(policy, deadline, default_timeout, fn, *args):
+    # Performs a network operation. Every attempt is bounded by the deadline
+    # if there is one, or by the default timeout otherwise. An attempt that
+    # exceeds it is abandoned rather than retried.
+    def attempt():
+        bound = deadline or _deadline(None, None, default_timeout)
+        return _call(bound, fn, *args)
+    return _retry(policy, deadline, attempt)
+
+
+def _restart(fn):
+    # Starts an operation again after an attempt failed. The objects it was
+    # started with, e.g. the fingerprint, may have been closed since, in which
+    # case retrying is pointless.
+    try:
+        return fn()
+    except ValueError as err:
+        raise AEError(Code.INVALID_INPUT,
+                      "can't restart the operation: {}".format(err)) from None
@@ -0,0 +1,53 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+from pexae.lib import _lib
+from pexae.client import _clients
+from pexae.deadline import _shutdown_executor, _set_max_workers
+from pexae.futures import _shutdown_resolver
+
+
+def init(max_bounded_calls=None):
+    """
+    Load and initialize the native library now rather than when it's first
+    used. Calling this function is optional, but doing it at startup reports
+    a missing or broken installation early and keeps the cost of loading the
+    library out of the first operation. Calling it more than once has no
+    effect.
+
+    The library is initialized again in processes forked from the one that
+    initialized it, on first use, and clients created in the parent
+    reconnect themselves, so it's safe to use the SDK with
+    :mod:`multiprocessing`.
+
+    Network operations bounded by a timeout or deadline, including the
+    ones bounded by :attr:`Client.default_timeout`, run on a thread pool
+    shared by all the clients in the process, so that they can be abandoned
+    once the time is up. Its size limits how many of them can be in
+    progress at once, further ones wait for a thread.
+
+    :param int max_bounded_calls: the size of that pool, defaults to 64.
+        Unlike the rest of the function, it takes effect every time it's
+        passed.
+    :raise: :class:`RuntimeError` if the library can't be loaded or
+            initialized.
+    """
+    if max_bounded_calls is not None:
+        _set_max_workers(max_bounded_calls)
+    _lib._load()
+
+
+def shutdown(wait=True):
+    """
+    Stop the worker threads used by the SDK and by all the clients. They're
+    started again when needed, so the SDK remains usable afterwards. Calling
+    this function before forking avoids forking a process with threads that
+    may hold locks, and calling it before exiting lets operations in
+    progress finish in an orderly way.
+
+    :param bool wait: whether to wait for the operations in progress to
+        finish.
+    """
+    _shutdown_executor(wait)
+    _shutdown_resolver(wait)
+    for client in list(_clients):
+        client._shutdown_executor(wait)
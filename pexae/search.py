@@ -0,0 +1,168 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+from pexae.futures import _Future
+from pexae.license_search import LicenseSearchRequest
+from pexae.metadata_search import MetadataSearchRequest
+
+
+class SearchResult(object):
+    """
+    This object is returned from :meth:`SearchFuture.get` upon successful
+    completion. It holds the results of all the searches requested in
+    :meth:`Client.search`, the ones that weren't requested are None.
+    """
+
+    __slots__ = ("_license", "_metadata", "_assets")
+
+    def __init__(self, license=None, metadata=None, assets=None):
+        self._license = license
+        self._metadata = metadata
+        self._assets = assets
+
+    @property
+    def license(self):
+        """
+        The result of the license search.
+
+        :type: LicenseSearchResult
+        """
+        return self._license
+
+    @property
+    def metadata(self):
+        """
+        The result of the metadata search.
+
+        :type: MetadataSearchResult
+        """
+        return self._metadata
+
+    @property
+    def assets(self):
+        """
+        A dict mapping asset IDs of the metadata search matches to either an
+        :class:`Asset` or the :class:`AEError` raised while retrieving it.
+        Only set if assets were requested.
+
+        :type: dict
+        """
+        return self._assets
+
+    def __repr__(self):
+        return "SearchResult(license={},metadata={},assets={})".format(
+                self.license, self.metadata, self.assets)
+
+
+class SearchFuture(_Future):
+    """
+    This object is returned by the :meth:`Client.search` method and is used
+    to retrieve the results of all the searches at once. It supports the
+    same operations as :class:`LicenseSearchFuture`.
+    """
+
+    def __init__(self, executor, license_fut, metadata_fut, asset_library,
+                 compact, deadline=None, default_timeout=None):
+        super().__init__(deadline, default_timeout)
+        self._executor = executor
+        self._license_fut = license_fut
+        self._metadata_fut = metadata_fut
+        self._asset_library = asset_library
+        self._compact = compact
+
+    def get(self, timeout=None, deadline=None):
+        """
+        Blocks until all the search results are ready and then returns them.
+        The results are retrieved concurrently. If assets were requested, they
+        are retrieved as soon as the metadata search result is ready, while
+        the license search result may still be pending. If neither timeout nor
+        deadline is set, the deadline passed to :meth:`Client.search`
+        applies, if any, and otherwise :attr:`Client.default_timeout`.
+
+        :param float timeout: the maximum number of seconds to wait.
+        :param Deadline deadline: the deadline by which the results must be
+            ready, can't be combined with timeout.
+        :raise: :class:`AEError` if any of the searches couldn't be performed,
+                e.g. because of network issues, or with
+                :attr:`Code.DEADLINE_EXCEEDED` if the results aren't ready
+                in time.
+        :rtype: SearchResult
+        """
+        return super().get(timeout, deadline)
+
+    def _close(self):
+        # The searches are closed once they aren't used to resolve this
+        # future anymore.
+        def close(_):
+            for fut in (self._license_fut, self._metadata_fut):
+                if fut is not None:
+                    fut.close()
+        self._fut.add_done_callback(close)
+
+    def _resolve(self):
+        # The searches are resolved in this thread and on the client's
+        # executor rather than waited for, see _Future. The caller of get is
+        # bounded by the deadline, the asset retrieval only gets the time
+        # that is left of it.
+        deadline = self._deadline
+        license_res = None
+        if self._license_fut is not None and self._metadata_fut is not None:
+            license_res = self._executor.submit(self._license_fut._get_inline)
+        elif self._license_fut is not None:
+            return SearchResult(license=self._license_fut._get_inline())
+
+        try:
+            metadata_res = self._metadata_fut._convert(
+                    self._metadata_fut._get_inline(), self._compact)
+            assets = None
+            if self._asset_library is not None:
+                assets = metadata_res.resolve_assets(self._asset_library,
+                                                     deadline=deadline)
+        finally:
+            # Don't leave the license search running in the background.
+            if license_res is not None:
+                license_res = license_res.result()
+
+        return SearchResult(license=license_res, metadata=metadata_res,
+                            assets=assets)
+
+
+def _start(executor, license_search, metadata_search, fingerprint,
+           license, metadata, asset_library, compact, deadline,
+           default_timeout):
+    # Starts the requested searches, concurrently if both were requested.
+    if not license and not metadata:
+        raise ValueError("at least one of license and metadata must be set")
+    if asset_library is not None and not metadata:
+        raise ValueError("assets can only be resolved for metadata searches")
+
+    license_fut = None
+    metadata_fut = None
+    if license and metadata:
+        pending = executor.submit(license_search.start,
+                                  LicenseSearchRequest(fingerprint),
+                                  deadline=deadline)
+        try:
+            metadata_fut = metadata_search.start(
+                MetadataSearchRequest(fingerprint), deadline=deadline)
+        except BaseException:
+            # Close the license search once it's started, but report the
+            # error of the metadata search rather than any of its own.
+            try:
+                pending.result().close()
+            except Exception:
+                pass
+            raise
+        try:
+            license_fut = pending.result()
+        except BaseException:
+            metadata_fut.close()
+            raise
+    elif license:
+        license_fut = license_search.start(LicenseSearchRequest(fingerprint),
+                                           deadline=deadline)
+    else:
+        metadata_fut = metadata_search.start(MetadataSearchRequest(fingerprint),
+                                             deadline=deadline)
+
+    return SearchFuture(executor, license_fut, metadata_fut, asset_library,
+                        compact, deadline, default_timeout)
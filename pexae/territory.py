@@ -0,0 +1,189 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+import threading
+
+
+# ISO 3166-1 alpha-2 codes in a fixed order, the position of a code in this
+# list is the bit it occupies in a TerritorySet. Codes returned by the
+# backend that aren't listed here are appended at runtime.
+_TERRITORIES = [
+    "AD", "AE", "AF", "AG", "AI", "AL", "AM", "AO", "AQ", "AR", "AS", "AT",
+    "AU", "AW", "AX", "AZ", "BA", "BB", "BD", "BE", "BF", "BG", "BH", "BI",
+    "BJ", "BL", "BM", "BN", "BO", "BQ", "BR", "BS", "BT", "BV", "BW", "BY",
+    "BZ", "CA", "CC", "CD", "CF", "CG", "CH", "CI", "CK", "CL", "CM", "CN",
+    "CO", "CR", "CU", "CV", "CW", "CX", "CY", "CZ", "DE", "DJ", "DK", "DM",
+    "DO", "DZ", "EC", "EE", "EG", "EH", "ER", "ES", "ET", "FI", "FJ", "FK",
+    "FM", "FO", "FR", "GA", "GB", "GD", "GE", "GF", "GG", "GH", "GI", "GL",
+    "GM", "GN", "GP", "GQ", "GR", "GS", "GT", "GU", "GW", "GY", "HK", "HM",
+    "HN", "HR", "HT", "HU", "ID", "IE", "IL", "IM", "IN", "IO", "IQ", "IR",
+    "IS", "IT", "JE", "JM", "JO", "JP", "KE", "KG", "KH", "KI", "KM", "KN",
+    "KP", "KR", "KW", "KY", "KZ", "LA", "LB", "LC", "LI", "LK", "LR", "LS",
+    "LT", "LU", "LV", "LY", "MA", "MC", "MD", "ME", "MF", "MG", "MH", "MK",
+    "ML", "MM", "MN", "MO", "MP", "MQ", "MR", "MS", "MT", "MU", "MV", "MW",
+    "MX", "MY", "MZ", "NA", "NC", "NE", "NF", "NG", "NI", "NL", "NO", "NP",
+    "NR", "NU", "NZ", "OM", "PA", "PE", "PF", "PG", "PH", "PK", "PL", "PM",
+    "PN", "PR", "PS", "PT", "PW", "PY", "QA", "RE", "RO", "RS", "RU", "RW",
+    "SA", "SB", "SC", "SD", "SE", "SG", "SH", "SI", "SJ", "SK", "SL", "SM",
+    "SN", "SO", "SR", "SS", "ST", "SV", "SX", "SY", "SZ", "TC", "TD", "TF",
+    "TG", "TH", "TJ", "TK", "TL", "TM", "TN", "TO", "TR", "TT", "TV", "TW",
+    "TZ", "UA", "UG", "UM", "US", "UY", "UZ", "VA", "VC", "VE", "VG", "VI",
+    "VN", "VU", "WF", "WS", "YE", "YT", "ZA", "ZM", "ZW",
+]
+
+_INDEX = {code: i for i, code in enumerate(_TERRITORIES)}
+_INDEX_BYTES = {code.encode(): i for i, code in enumerate(_TERRITORIES)}
+_lock = threading.Lock()
+
+
+def _bit(code):
+    # Codes that are queried for are registered too, the backend may return
+    # them later. Only well-formed codes are accepted, so that the table
+    # can't grow beyond the 676 possible ones.
+    i = _INDEX.get(code)
+    if i is None:
+        if not (isinstance(code, str) and len(code) == 2 and code.isascii()
+                and code.isalpha() and code.isupper()):
+            raise ValueError("invalid territory code: {!r}".format(code))
+        i = _register(code)
+    return 1 << i
+
+
+def _result_bit(code):
+    i = _INDEX.get(code)
+    if i is None:
+        i = _register(code)
+    return 1 << i
+
+
+def _bit_from_bytes(code):
+    i = _INDEX_BYTES.get(code)
+    if i is None:
+        i = _register(code.decode())
+    return 1 << i
+
+
+def _register(code):
+    with _lock:
+        i = _INDEX.get(code)
+        if i is None:
+            i = len(_TERRITORIES)
+            _TERRITORIES.append(code)
+            _INDEX[code] = i
+            _INDEX_BYTES[code.encode()] = i
+        return i
+
+
+def _codes(bits):
+    codes = []
+    i = 0
+    while bits:
+        if bits & 1:
+            codes.append(_TERRITORIES[i])
+        bits >>= 1
+        i += 1
+    return codes
+
+
+class TerritorySet(object):
+    """
+    An immutable set of territory codes conforming to the ISO 3166-1 alpha-2
+    standard, represented as a bitset. Membership tests and set operations
+    between instances are very cheap, so when the same group of territories
+    is checked repeatedly, it's worth creating the set once and reusing it:
+
+    .. code-block:: python
+
+        EU = pexae.TerritorySet(["AT", "BE", "BG", ...])
+        if res.is_blocked(EU):
+            pass
+
+    It supports the usual set operators: ``&``, ``|``, ``-`` and ``^``.
+
+    :param territories: an iterable of territory codes.
+    :raise: :class:`ValueError` if any of the codes isn't a two letter
+        uppercase code.
+    """
+
+    __slots__ = ("_bits",)
+
+    def __init__(self, territories=()):
+        if isinstance(territories, str):
+            territories = (territories,)
+        bits = 0
+        for code in territories:
+            bits |= _bit(code)
+        self._bits = bits
+
+    @staticmethod
+    def _from_bits(bits):
+        territories = TerritorySet.__new__(TerritorySet)
+        territories._bits = bits
+        return territories
+
+    def __contains__(self, code):
+        i = _INDEX.get(code)
+        return i is not None and bool(self._bits >> i & 1)
+
+    def __iter__(self):
+        return iter(_codes(self._bits))
+
+    def __len__(self):
+        return bin(self._bits).count("1")
+
+    def __bool__(self):
+        return self._bits != 0
+
+    def __and__(self, other):
+        return TerritorySet._from_bits(self._bits & _as_set(other)._bits)
+
+    def __or__(self, other):
+        return TerritorySet._from_bits(self._bits | _as_set(other)._bits)
+
+    def __sub__(self, other):
+        return TerritorySet._from_bits(self._bits & ~_as_set(other)._bits)
+
+    def __xor__(self, other):
+        return TerritorySet._from_bits(self._bits ^ _as_set(other)._bits)
+
+    def isdisjoint(self, other):
+        """
+        Return True if the sets have no territories in common.
+        """
+        return not self._bits & _as_set(other)._bits
+
+    def issubset(self, other):
+        """
+        Return True if all territories of this set are in other.
+        """
+        return not self._bits & ~_as_set(other)._bits
+
+    def __eq__(self, other):
+        if not isinstance(other, TerritorySet):
+            return NotImplemented
+        return self._bits == other._bits
+
+    def __hash__(self):
+        return hash(self._bits)
+
+    def __reduce__(self):
+        # The bit positions of codes that aren't in the fixed table differ
+        # between processes, so the codes are pickled instead of the bits.
+        return (_from_codes, (list(self),))
+
+    def __repr__(self):
+        return "TerritorySet({})".format(list(self))
+
+
+def _as_set(territories):
+    if isinstance(territories, TerritorySet):
+        return territories
+    return TerritorySet(territories)
+
+
+def _from_codes(codes):
+    # Unpickles a set. Its codes were returned by the backend in the process
+    # it was pickled in, so they're registered in this one.
+    bits = 0
+    for code in codes:
+        bits |= _result_bit(code)
+    return TerritorySet._from_bits(bits)
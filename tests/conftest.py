@@ -0,0 +1,38 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+# The tests run against the fake native library, see pexae.fakelib.
+
+import os
+import sys
+
+os.environ["PEXAE_FAKE_LIB"] = "1"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import pytest  # noqa: E402
+
+import pexae  # noqa: E402
+from pexae.lib import _lib  # noqa: E402
+from pexae.fakelib import _PARAMS  # noqa: E402
+
+
+@pytest.fixture
+def fake():
+    # The fake library is shared by the whole process, its settings are
+    # restored after every test.
+    lib = _lib._load()
+    saved = {name: getattr(lib, name) for name in _PARAMS if name != "seed"}
+    yield lib
+    for name, value in saved.items():
+        setattr(lib, name, value)
+
+
+@pytest.fixture
+def client(fake):
+    client = pexae.Mockserver.new_client("client01", "secret01")
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def fingerprint(fake):
+    return pexae.Fingerprint.from_buffer(b"content")
@@ -0,0 +1,87 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+import asyncio
+
+import pytest
+
+import pexae
+import pexae.aio
+
+
+def test_timeouts_are_passed_through(fake, client, fingerprint):
+    async def main():
+        aclient = pexae.aio.AsyncClient(client)
+        try:
+            fake.latency = 0.2
+            with pytest.raises(pexae.AEError) as exc_info:
+                await aclient.license_search.start(
+                    pexae.LicenseSearchRequest(fingerprint), timeout=0.05)
+            assert exc_info.value.code == pexae.Code.DEADLINE_EXCEEDED
+
+            fake.latency = 0
+            fut = await aclient.metadata_search.start(
+                pexae.MetadataSearchRequest(fingerprint),
+                deadline=pexae.Deadline(5))
+            fake.latency = 0.2
+            with pytest.raises(pexae.AEError) as exc_info:
+                await fut.get(0.05)
+            assert exc_info.value.code == pexae.Code.DEADLINE_EXCEEDED
+            res = await fut.get(deadline=pexae.Deadline(5), compact=True)
+            assert isinstance(res, pexae.CompactMetadataSearchResult)
+
+            with pytest.raises(pexae.AEError) as exc_info:
+                await aclient.asset_library.get_asset(1, timeout=0.05)
+            assert exc_info.value.code == pexae.Code.DEADLINE_EXCEEDED
+        finally:
+            aclient.close()
+
+    asyncio.run(main())
+
+
+def test_with_credentials_takes_timeout(fake):
+    async def main():
+        aclient = await pexae.aio.AsyncClient.with_credentials(
+            "client01", "secret01", timeout=5)
+        async with aclient:
+            pass
+        with pytest.raises(ValueError):
+            aclient.client.license_search.start(
+                pexae.LicenseSearchRequest(pexae.Fingerprint.from_buffer(b"x")))
+
+    asyncio.run(main())
+
+
+def test_futures_can_be_closed(fake, client, fingerprint):
+    async def main():
+        async with pexae.aio.AsyncClient(client) as aclient:
+            fake.latency = 0.05
+            async with await aclient.license_search.start(
+                    pexae.LicenseSearchRequest(fingerprint)) as fut:
+                pass
+            assert fut._fut.cancelled()
+
+            fut = await aclient.metadata_search.start(
+                pexae.MetadataSearchRequest(fingerprint))
+            async with fut:
+                assert isinstance(await fut, pexae.MetadataSearchResult)
+
+    asyncio.run(main())
+
+
+def test_pending_results_dont_hold_up_other_calls(fake, client, fingerprint):
+    async def main():
+        async with pexae.aio.AsyncClient(client, max_workers=1) as aclient:
+            futs = [await aclient.metadata_search.start(
+                        pexae.MetadataSearchRequest(fingerprint))
+                    for _ in range(4)]
+            fake.latency = 0.3
+            gets = [asyncio.ensure_future(fut.get()) for fut in futs]
+            await asyncio.sleep(0.05)
+
+            loop = asyncio.get_running_loop()
+            begin = loop.time()
+            await aclient.asset_library.get_asset(1)
+            assert loop.time() - begin < 0.6
+            await asyncio.gather(*gets)
+
+    asyncio.run(main())
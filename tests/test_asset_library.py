@@ -0,0 +1,28 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+import pexae
+
+
+def test_lazy_assets_bypass_cache(fake, client):
+    library = client.asset_library
+    cache = library.enable_cache()
+
+    eager = library.get_asset(1)
+    lazy = library.get_asset(1, lazy=True)
+    assert lazy is not eager
+    assert lazy.metadata._c_handles is not None
+    assert eager.metadata._c_handles is None
+    assert library.get_asset(1) is eager
+    assert 1 in cache and len(cache) == 1
+    lazy.close()
+
+
+def test_closing_cached_asset_keeps_it_usable(fake, client):
+    library = client.asset_library
+    library.enable_cache()
+
+    with library.get_asset(2) as asset:
+        expected = asset.to_tuple()
+    assert library.get_asset(2).to_tuple() == expected
+    assert library.get_asset(2).metadata.licensors_for("US") == \
+        asset.metadata.licensors.get("US")
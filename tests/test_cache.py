@@ -0,0 +1,59 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+import os
+import threading
+
+import pytest
+
+import pexae
+
+
+def _start_load(cache, key):
+    # Starts loading key in another thread and returns an event that
+    # finishes the load once set.
+    started = threading.Event()
+    release = threading.Event()
+
+    def load():
+        started.set()
+        release.wait()
+        return "parent"
+
+    thread = threading.Thread(target=cache.get_or_load, args=(key, load))
+    thread.start()
+    started.wait()
+    return release, thread
+
+
+def test_waiting_for_load_is_bounded():
+    cache = pexae.LRUCache()
+    release, thread = _start_load(cache, "key")
+    try:
+        with pytest.raises(pexae.AEError) as exc_info:
+            cache.get_or_load("key", lambda: "other", timeout=0.05)
+        assert exc_info.value.code == pexae.Code.DEADLINE_EXCEEDED
+    finally:
+        release.set()
+        thread.join()
+    assert cache.get_or_load("key", lambda: "other") == "parent"
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+def test_load_in_progress_is_dropped_in_forked_child():
+    cache = pexae.LRUCache()
+    release, thread = _start_load(cache, "key")
+    try:
+        with cache._lock:
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    value = cache.get_or_load("key", lambda: "child", timeout=1)
+                    os._exit(0 if value == "child" else 1)
+                except BaseException:
+                    os._exit(2)
+    finally:
+        release.set()
+        thread.join()
+
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
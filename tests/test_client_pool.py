@@ -0,0 +1,35 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+import pexae
+
+
+def _pool():
+    return pexae.ClientPool(
+        lambda: pexae.Mockserver.new_client("client01", "secret01"), size=2)
+
+
+def _in_flight(pool):
+    return [slot.in_flight for slot in pool._slots]
+
+
+def test_searches_count_until_resolved(fake, fingerprint):
+    with _pool() as pool:
+        first = pool.license_search.start(pexae.LicenseSearchRequest(fingerprint))
+        second = pool.metadata_search.start(pexae.MetadataSearchRequest(fingerprint))
+        assert _in_flight(pool) == [1, 1]
+
+        first.get()
+        assert sorted(_in_flight(pool)) == [0, 1]
+        second.close()
+        assert _in_flight(pool) == [0, 0]
+
+
+def test_least_loaded_skips_client_with_pending_search(fake, fingerprint):
+    with _pool() as pool:
+        pending = pool.license_search.start(pexae.LicenseSearchRequest(fingerprint))
+        busy = [i for i, n in enumerate(_in_flight(pool)) if n]
+        pool.asset_library.get_asset(1)
+        pool.license_search.start(pexae.LicenseSearchRequest(fingerprint)).get()
+        assert [i for i, n in enumerate(_in_flight(pool)) if n] == busy
+        assert pool._slots[1 - busy[0]].client is not None
+        pending.close()
@@ -0,0 +1,36 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+import concurrent.futures
+import time
+
+import pytest
+
+import pexae
+
+
+@pytest.fixture
+def two_bounded_calls(fake):
+    pexae.init(max_bounded_calls=2)
+    yield
+    pexae.init(max_bounded_calls=64)
+
+
+def test_queued_calls_are_dropped_on_timeout(fake, client, fingerprint,
+                                             two_bounded_calls):
+    fake.latency = 0.3
+    calls = fake.calls.get("AE_LicenseSearch_Start", 0)
+    req = pexae.LicenseSearchRequest(fingerprint)
+
+    def start():
+        with pytest.raises(pexae.AEError):
+            client.license_search.start(req, timeout=0.1)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: start(), range(8)))
+    time.sleep(1.4)
+    assert fake.calls["AE_LicenseSearch_Start"] - calls <= 4
+
+
+def test_max_bounded_calls_must_be_positive():
+    with pytest.raises(ValueError):
+        pexae.init(max_bounded_calls=0)
@@ -0,0 +1,22 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+import pexae
+
+
+def test_from_file_accepts_path_like(fake, tmp_path):
+    path = tmp_path / "content.mp4"
+    path.write_bytes(b"content")
+    ft = pexae.Fingerprint.from_file(path)
+    assert ft.digest() == pexae.Fingerprint.from_buffer(b"content").digest()
+
+
+def test_pool_captures_every_error(fake, tmp_path):
+    path = tmp_path / "content.mp4"
+    path.write_bytes(b"content")
+    paths = [path, str(tmp_path / "missing.mp4"), None]
+
+    results = pexae.Fingerprint.from_files(paths, workers=2)
+    assert [res.path for res in results] == paths
+    assert results[0].fingerprint is not None and results[0].error is None
+    assert isinstance(results[1].error, pexae.AEError)
+    assert isinstance(results[2].error, TypeError)
@@ -0,0 +1,48 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+import concurrent.futures
+
+import pytest
+
+import pexae
+
+
+def _start(client, ft):
+    return client.license_search.start(pexae.LicenseSearchRequest(ft))
+
+
+def test_cached_search_is_shared(fake, client, fingerprint):
+    client.license_search.enable_cache()
+    calls = fake.calls.get("AE_LicenseSearch_Start", 0)
+
+    first = _start(client, fingerprint)
+    second = _start(client, fingerprint)
+    assert first is not second
+    assert first.get() == second.get()
+    assert fake.calls["AE_LicenseSearch_Start"] == calls + 1
+
+
+def test_closing_cached_search_keeps_it_for_other_callers(fake, client, fingerprint):
+    client.license_search.enable_cache()
+    fake.latency = 0.05
+
+    first = _start(client, fingerprint)
+    second = _start(client, fingerprint)
+    first.close()
+    assert first.cancelled()
+    with pytest.raises(concurrent.futures.CancelledError):
+        first.get()
+
+    assert isinstance(second.get(), pexae.LicenseSearchResult)
+    assert isinstance(_start(client, fingerprint).get(), pexae.LicenseSearchResult)
+
+
+def test_cancelled_search_is_dropped_from_cache(fake, client, fingerprint):
+    cache = client.license_search.enable_cache()
+    first = _start(client, fingerprint)
+    shared = cache.get_or_load(fingerprint.digest(), None)
+    assert shared.cancel()
+
+    assert isinstance(_start(client, fingerprint).get(), pexae.LicenseSearchResult)
+    assert cache.get_or_load(fingerprint.digest(), None) is not shared
+    first.close()
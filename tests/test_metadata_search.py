@@ -0,0 +1,38 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+import pytest
+
+import pexae
+
+
+def _start(client, ft):
+    return client.metadata_search.start(pexae.MetadataSearchRequest(ft))
+
+
+def test_get_takes_timeout_positionally(fake, client, fingerprint):
+    fut = _start(client, fingerprint)
+    assert isinstance(fut.get(5), pexae.MetadataSearchResult)
+    assert isinstance(fut.get(5, compact=True), pexae.CompactMetadataSearchResult)
+    with pytest.raises(TypeError):
+        fut.get(5, None, True)
+
+
+def test_result_is_converted_once(fake, client, fingerprint):
+    fut = _start(client, fingerprint)
+    res = fut.get()
+    compact = fut.get(compact=True)
+    assert fut.get() is res
+    assert fut.get(compact=True) is compact
+    assert res == compact
+    assert [m.to_tuple() for m in res.matches] == \
+        [m.to_tuple() for m in compact.matches]
+
+
+def test_native_result_released_after_get(fake, client, fingerprint):
+    live = len(fake._objects)
+    fut = _start(client, fingerprint)
+    res = fut.get(compact=True)
+    assert len(fake._objects) == live
+    fut.close()
+    assert fut.get(compact=True) is res
+    assert isinstance(fut.get(), pexae.MetadataSearchResult)
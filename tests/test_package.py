@@ -0,0 +1,28 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+import pexae
+
+
+def _run(code):
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    return subprocess.run([sys.executable, "-c", code], cwd=root,
+                          capture_output=True, text=True)
+
+
+def test_submodules_are_accessible_without_import():
+    proc = _run("import pexae; print(pexae.fingerprint.Fingerprint is "
+                "pexae.Fingerprint, pexae.aio.AsyncClient.__name__)")
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.split() == ["True", "AsyncClient"]
+
+
+def test_unknown_attribute_raises():
+    with pytest.raises(AttributeError):
+        pexae.no_such_name
+    assert "fingerprint" in dir(pexae)
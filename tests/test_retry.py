@@ -0,0 +1,112 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+import pickle
+
+import pytest
+
+import pexae
+
+
+def _start_failing(client, fingerprint):
+    with pytest.raises(pexae.AEError) as exc_info:
+        client.license_search.start(pexae.LicenseSearchRequest(fingerprint))
+    assert exc_info.value.code == pexae.Code.CONNECTION_ERROR
+
+
+def test_backoff_bounds():
+    policy = pexae.RetryPolicy(initial_backoff=0.1, max_backoff=0.5,
+                               multiplier=2.0)
+    for attempt, cap in [(1, 0.1), (2, 0.2), (3, 0.4), (4, 0.5), (10, 0.5)]:
+        delays = [policy.backoff(attempt) for _ in range(200)]
+        assert all(0 <= delay <= cap for delay in delays)
+        assert max(delays) > cap / 2
+
+
+def test_failures_retried_up_to_max_attempts(fake, client, fingerprint):
+    client.retry_policy = pexae.RetryPolicy(max_attempts=3, initial_backoff=0,
+                                            max_tokens=100)
+    fake.error_rate = 1.0
+    calls = fake.calls.get("AE_LicenseSearch_Start", 0)
+
+    _start_failing(client, fingerprint)
+    assert fake.calls["AE_LicenseSearch_Start"] == calls + 3
+    assert client.retry_policy.retries == 2
+    assert not client.retry_policy.throttled
+
+
+def test_budget_stops_retries(fake, client, fingerprint):
+    client.retry_policy = pexae.RetryPolicy(max_attempts=3, initial_backoff=0,
+                                            budget=0.05, max_tokens=100)
+    fake.error_rate = 1.0
+    fake.latency = 0.1
+    calls = fake.calls.get("AE_LicenseSearch_Start", 0)
+
+    _start_failing(client, fingerprint)
+    assert fake.calls["AE_LicenseSearch_Start"] == calls + 1
+    assert client.retry_policy.retries == 0
+
+
+def test_token_bucket_throttles_retries(fake, client, fingerprint):
+    policy = pexae.RetryPolicy(max_attempts=10, initial_backoff=0,
+                               max_tokens=4, token_ratio=1)
+    client.retry_policy = policy
+    fake.error_rate = 1.0
+
+    # The second failure leaves the bucket half full, which stops retries.
+    _start_failing(client, fingerprint)
+    assert policy.retries == 1
+    assert policy.throttled
+    _start_failing(client, fingerprint)
+    assert policy.retries == 1
+
+    fake.error_rate = 0.0
+    req = pexae.LicenseSearchRequest(fingerprint)
+    client.license_search.start(req).close()
+    assert policy.throttled
+    client.license_search.start(req).close()
+    assert not policy.throttled
+
+
+def test_pickled_policy_starts_fresh(fake, client, fingerprint):
+    policy = pexae.RetryPolicy(max_attempts=5, initial_backoff=0, budget=2.0,
+                               retryable_codes=[pexae.Code.CONNECTION_ERROR],
+                               max_tokens=4)
+    client.retry_policy = policy
+    fake.error_rate = 1.0
+    _start_failing(client, fingerprint)
+    assert policy.throttled and policy.retries == 1
+
+    copy = pickle.loads(pickle.dumps(policy))
+    assert not copy.throttled and copy.retries == 0
+    assert copy.max_attempts == 5
+    assert copy.retryable_codes == {pexae.Code.CONNECTION_ERROR}
+    assert pickle.loads(pickle.dumps(client.config)).retry_policy.max_attempts == 5
+
+
+@pytest.mark.parametrize("start", [
+    lambda client, ft: client.license_search.start(pexae.LicenseSearchRequest(ft)),
+    lambda client, ft: client.metadata_search.start(pexae.MetadataSearchRequest(ft)),
+])
+def test_retry_after_fingerprint_closed(fake, client, fingerprint, start):
+    client.retry_policy = pexae.RetryPolicy(max_attempts=3, initial_backoff=0)
+    fut = start(client, fingerprint)
+    fingerprint.close()
+    fake.error_rate = 1.0
+
+    with pytest.raises(pexae.AEError) as exc_info:
+        fut.get()
+    assert exc_info.value.code == pexae.Code.INVALID_INPUT
+    assert client.retry_policy.retries == 1
+
+
+def test_abandoned_call_not_retried(fake, client, fingerprint):
+    client.retry_policy = pexae.RetryPolicy(max_attempts=3, initial_backoff=0)
+    client.default_timeout = 0.05
+    fake.latency = 0.2
+    calls = fake.calls.get("AE_LicenseSearch_Start", 0)
+
+    with pytest.raises(pexae.AEError) as exc_info:
+        client.license_search.start(pexae.LicenseSearchRequest(fingerprint))
+    assert exc_info.value.code == pexae.Code.DEADLINE_EXCEEDED
+    assert fake.calls["AE_LicenseSearch_Start"] == calls + 1
+    assert client.retry_policy.retries == 0
@@ -0,0 +1,58 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+import concurrent.futures
+
+import pytest
+
+import pexae
+
+
+def _start_searches(client, count, **kwargs):
+    fts = [pexae.Fingerprint.from_buffer(str(i).encode()) for i in range(count)]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
+        return list(executor.map(lambda ft: client.search(ft, **kwargs), fts))
+
+
+def test_more_searches_than_workers_with_default_timeout(fake, client):
+    fake.latency = 0.02
+    client.default_timeout = 3
+    futs = _start_searches(client, 100)
+
+    results = [fut.get() for fut in pexae.as_completed(futs)]
+    assert len(results) == 100
+    assert all(res.license is not None and res.metadata is not None
+               for res in results)
+
+
+def test_more_searches_than_workers_with_deadline(fake, client):
+    fake.latency = 0.02
+    fake.licensor_territories = 5
+    deadline = pexae.Deadline(5)
+    futs = _start_searches(client, 100, resolve_assets=True, deadline=deadline)
+
+    done, not_done = pexae.wait(futs, timeout=5)
+    assert not not_done
+    for fut in done:
+        res = fut.get()
+        assert all(isinstance(asset, pexae.Asset) for asset in res.assets.values())
+
+
+@pytest.mark.parametrize("failing,other", [("metadata_search", "license_search"),
+                                           ("license_search", "metadata_search")])
+def test_failed_start_closes_other_search(client, fingerprint, monkeypatch,
+                                          failing, other):
+    started = []
+    start = getattr(client, other).start
+
+    def record(req, timeout=None, deadline=None):
+        started.append(start(req, timeout, deadline))
+        return started[-1]
+
+    def fail(req, timeout=None, deadline=None):
+        raise RuntimeError("start failed")
+
+    monkeypatch.setattr(getattr(client, other), "start", record)
+    monkeypatch.setattr(getattr(client, failing), "start", fail)
+    with pytest.raises(RuntimeError, match="start failed"):
+        client.search(fingerprint)
+    assert started[0].cancelled()
@@ -0,0 +1,126 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+# Runs each feature of the SDK once end to end against the fake library.
+
+import os
+import pickle
+
+import pytest
+
+import pexae
+from pexae.lib import _lib
+
+
+def test_fingerprint(fake, tmp_path):
+    path = tmp_path / "content.mp4"
+    path.write_bytes(b"content")
+    ft = pexae.Fingerprint.from_file(str(path))
+    assert pexae.Fingerprint.load(ft.dump()).digest() == ft.digest()
+    assert pexae.Fingerprint.from_mmap(str(path)).digest() == ft.digest()
+
+    with pexae.FingerprintCache(str(tmp_path / "cache.db")) as cache:
+        cache.from_file(str(path))
+        assert cache.from_file(str(path)).digest() == ft.digest()
+        assert cache.hits == 1
+
+
+def test_search(fake, client, fingerprint):
+    res = client.search(fingerprint, resolve_assets=True).get()
+    assert isinstance(res.license, pexae.LicenseSearchResult)
+    assert isinstance(res.metadata, pexae.MetadataSearchResult)
+    assert set(res.assets) == {m.asset_id for m in res.metadata.matches}
+
+    results = list(pexae.SearchPipeline(client.license_search).run([b"a", b"b"]))
+    assert all(r.error is None for r in results)
+
+
+def test_pipeline_takes_path_objects(fake, client, tmp_path):
+    path = tmp_path / "media.mp4"
+    path.write_bytes(b"content")
+    results = list(pexae.SearchPipeline(client.license_search).run(
+        [path, str(path)]))
+    assert all(r.error is None for r in results)
+    assert results[0].result.policies == results[1].result.policies
+
+
+def test_cache(fake, client, fingerprint):
+    search = client.license_search
+    cache = search.enable_cache()
+    req = pexae.LicenseSearchRequest(fingerprint)
+    assert search.start(req).get() == search.start(req).get()
+    assert cache.hits == 1 and cache.misses == 1
+
+
+def test_retry(fake, client, fingerprint):
+    fake.error_rate = 0.5
+    client.retry_policy = pexae.RetryPolicy(max_attempts=10, initial_backoff=0,
+                                            max_tokens=100)
+    for _ in range(10):
+        client.license_search.start(pexae.LicenseSearchRequest(fingerprint)).get()
+    assert client.retry_policy.retries > 0
+
+
+def test_pool(fake, fingerprint):
+    factory = lambda: pexae.Mockserver.new_client("client01", "secret01")  # noqa: E731
+    with pexae.ClientPool(factory, size=2) as pool:
+        futs = [pool.license_search.start(pexae.LicenseSearchRequest(fingerprint))
+                for _ in range(4)]
+        done, not_done = pexae.wait(futs, timeout=5)
+        assert not not_done
+        assert all(slot.client is not None for slot in pool._slots)
+
+
+def test_instrumentation(fake, client, fingerprint):
+    events = []
+    pexae.add_listener(events.append)
+    try:
+        client.license_search.start(pexae.LicenseSearchRequest(fingerprint)).get()
+    finally:
+        pexae.remove_listener(events.append)
+    operations = {event.operation for event in events}
+    assert {"license_search.start", "license_search.get"} <= operations
+
+
+def test_territory(fake, client, fingerprint):
+    res = client.license_search.start(pexae.LicenseSearchRequest(fingerprint)).get()
+    blocked = res.blocked_territories()
+    assert res.is_blocked(blocked) == bool(blocked)
+    assert pickle.loads(pickle.dumps(blocked)) == blocked
+    assert (blocked | res.allowed_territories()) == pexae.TerritorySet(res.policies)
+
+
+def test_arena_and_close(fake, client):
+    live = len(fake._objects)
+    with pexae.Arena() as arena:
+        ft = arena.add(pexae.Fingerprint.from_buffer(b"content"))
+        fut = arena.add(client.metadata_search.start(pexae.MetadataSearchRequest(ft)))
+        asset = arena.add(client.asset_library.get_asset(1, lazy=True))
+        res = fut.get()
+    assert len(fake._objects) == live
+    assert isinstance(res, pexae.MetadataSearchResult)
+    with pytest.raises(ValueError):
+        asset.metadata.title
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+def test_fork(fake, fingerprint):
+    client = pexae.Client.with_credentials("client01", "secret01")
+    try:
+        client.license_search.start(pexae.LicenseSearchRequest(fingerprint)).get()
+        pexae.shutdown()
+        inherited = client._c_client
+        pid = os.fork()
+        if pid == 0:
+            try:
+                client.license_search.start(
+                    pexae.LicenseSearchRequest(fingerprint)).get(timeout=5)
+                # The parent's connection isn't deleted by the child.
+                deleted = _lib.calls.get("AE_Client_Delete", 0)
+                inherited.close()
+                os._exit(0 if _lib.calls.get("AE_Client_Delete", 0) == deleted else 2)
+            except BaseException:
+                os._exit(1)
+        _, status = os.waitpid(pid, 0)
+        assert os.WEXITSTATUS(status) == 0
+    finally:
+        client.close()
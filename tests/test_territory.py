@@ -0,0 +1,29 @@
+# Copyright 2020 Pexeso Inc. All rights reserved.
+
+import pickle
+
+import pytest
+
+import pexae
+
+
+def test_set_built_before_code_is_returned():
+    eu = pexae.TerritorySet(["DE", "XK"])
+    assert sorted(eu) == ["DE", "XK"]
+    res = pexae.LicenseSearchResult(1, {"XK": pexae.BasicPolicy.BLOCK})
+    assert res.is_blocked(eu)
+    assert res.blocked_territories() == pexae.TerritorySet(["XK"])
+
+
+@pytest.mark.parametrize("code", ["us", "USA", "", 1, None])
+def test_malformed_codes_are_rejected(code):
+    with pytest.raises(ValueError):
+        pexae.TerritorySet([code])
+
+
+def test_result_codes_are_registered():
+    res = pexae.LicenseSearchResult(1, {"QY": pexae.BasicPolicy.BLOCK})
+    assert res.is_blocked(["QY"])
+    assert "QY" in res.blocked_territories()
+    copy = pickle.loads(pickle.dumps(res.blocked_territories()))
+    assert list(copy) == ["QY"]